@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Measures cold import time of uonsx and the CLI entry point in fresh interpreters.
+
+    python benchmarks/import_time.py [--runs 20] [--budget-ms 100]
+
+Exits non-zero if the median time of any target, minus the bare interpreter
+startup, goes over the budget.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+TARGETS = {
+    "uonsx": "import uonsx",
+    "cli": "import uonsx.command_line.uonsx",
+}
+
+
+def time_statement(statement: str, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], check=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    baseline = time_statement("pass", args.runs)
+    print(f"{'interpreter':<12} {baseline:8.1f} ms")
+    over = False
+    for name, statement in TARGETS.items():
+        elapsed = time_statement(statement, args.runs) - baseline
+        flag = ""
+        if elapsed > args.budget_ms:
+            flag = f"  over budget ({args.budget_ms:.0f} ms)"
+            over = True
+        print(f"{name:<12} {elapsed:8.1f} ms{flag}")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
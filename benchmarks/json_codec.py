@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Compares the JSON codecs in uonsx.http on a realistic security policy payload.
+
+    PYTHONPATH=. python benchmarks/json_codec.py [--rules 500] [--runs 50]
+
+"str round-trip" is the old behaviour of decoding response bytes to a str
+before handing them to json.loads.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+
+from uonsx.error import NSXInvalidConfigurationError
+from uonsx.http import get_json_codec, json_codecs
+
+
+def policy_payload(rule_count: int) -> dict:
+    rules = []
+    for i in range(rule_count):
+        rules.append(
+            {
+                "resource_type": "Rule",
+                "id": f"rule-{i}",
+                "display_name": f"fn_app{i % 40}_web_to_db_{i}",
+                "path": f"/infra/domains/default/security-policies/fn_app/rules/rule-{i}",
+                "parent_path": "/infra/domains/default/security-policies/fn_app",
+                "sequence_number": (i + 1) * 10,
+                "source_groups": [f"/infra/domains/default/groups/fn_web{j}_DATA" for j in range(i % 5 + 1)],
+                "destination_groups": [f"/infra/domains/default/groups/fn_db{j}_DATA" for j in range(i % 3 + 1)],
+                "services": ["/infra/services/HTTPS", f"/infra/services/TCP_{8000 + i}"],
+                "scope": ["/infra/domains/default/groups/fn_app_DATA"],
+                "action": "ALLOW",
+                "direction": "IN_OUT",
+                "ip_protocol": "IPV4_IPV6",
+                "logged": False,
+                "disabled": False,
+                "notes": "",
+                "tag": "",
+                "_revision": i % 7,
+                "_create_time": 1631648143326 + i,
+                "_last_modified_time": 1631648143326 + i * 1000,
+                "_system_owned": False,
+            }
+        )
+    return {
+        "resource_type": "SecurityPolicy",
+        "id": "fn_app",
+        "display_name": "fn_app",
+        "path": "/infra/domains/default/security-policies/fn_app",
+        "category": "Application",
+        "sequence_number": 100,
+        "stateful": True,
+        "scope": ["ANY"],
+        "rules": rules,
+        "rule_count": len(rules),
+        "_revision": 12,
+    }
+
+
+def median_ms(f, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        f()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rules", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    payload = policy_payload(args.rules)
+    body = json.dumps(payload).encode("utf-8")
+    print(f"payload: {args.rules} rules, {len(body) / 1024:.0f} KiB")
+    print(f"{'codec':<16} {'loads':>10} {'dumps':>10}")
+
+    loads = median_ms(lambda: json.loads(body.decode("utf-8")), args.runs)
+    dumps = median_ms(lambda: json.dumps(payload), args.runs)
+    print(f"{'str round-trip':<16} {loads:8.2f}ms {dumps:8.2f}ms")
+
+    for name in json_codecs:
+        try:
+            codec = get_json_codec(name)
+        except NSXInvalidConfigurationError:
+            print(f"{name:<16} {'not installed':>21}")
+            continue
+        loads = median_ms(lambda: codec.loads(body), args.runs)
+        dumps = median_ms(lambda: codec.dumps(payload), args.runs)
+        print(f"{name:<16} {loads:8.2f}ms {dumps:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
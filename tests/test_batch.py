@@ -0,0 +1,158 @@
+import pytest
+
+from uonsx.batch import NSXBatch
+from uonsx.debug import Debug
+
+
+class FakeHTTP:
+    def __init__(self):
+        self.debug = Debug(0)
+        self.domain_id = "d"
+        self.requests = []
+        self.batch = None
+
+    def begin_batch(self, batch):
+        self.batch = batch
+
+    def end_batch(self, batch):
+        self.batch = None
+
+    def request(self, **kwargs):
+        self.requests.append(kwargs)
+        return {}
+
+
+class FakeUnit:
+    def __init__(self, data):
+        self.data = data
+
+    def id(self):
+        return self.data["id"]
+
+    def dump(self):
+        return self.data
+
+
+class FakeManager:
+    discarded = False
+
+    def __init__(self):
+        self._delta = self
+        self._snapshot = self
+
+    def invalidate(self):
+        self.discarded = True
+
+    def clear(self):
+        pass
+
+    def _set_refresh(self):
+        pass
+
+
+class FakeNSX:
+    def __init__(self):
+        self.group = FakeManager()
+
+
+def test_batch_body_nests_rules_under_policy():
+    batch = NSXBatch(FakeHTTP())
+    batch.add_group(FakeUnit({"id": "g"}))
+    batch.add_service(FakeUnit({"id": "s"}))
+    batch.add_policy(FakeUnit({"id": "p", "rule_count": 1, "rules": [{"id": "r1"}]}))
+    body = batch.body()
+
+    assert body["resource_type"] == "Infra"
+    service, domain = body["children"]
+    assert service["resource_type"] == "ChildService"
+    assert service["Service"]["path"] == "/infra/services/s"
+    assert domain["resource_type"] == "ChildResourceReference"
+    assert domain["id"] == "d"
+
+    group, policy = domain["children"]
+    assert group["Group"]["path"] == "/infra/domains/d/groups/g"
+    assert "rules" not in policy["SecurityPolicy"]
+    assert "rule_count" not in policy["SecurityPolicy"]
+    (rule,) = policy["SecurityPolicy"]["children"]
+    assert rule == {"resource_type": "ChildRule", "Rule": {"id": "r1", "resource_type": "Rule"}}
+
+
+def test_batch_restaging_replaces_pending_change():
+    batch = NSXBatch(FakeHTTP())
+    batch.add_group(FakeUnit({"id": "g", "display_name": "old"}))
+    batch.add_group(FakeUnit({"id": "g", "display_name": "new"}))
+    assert len(batch) == 1
+    (group,) = batch.body()["children"][0]["children"]
+    assert group["Group"]["display_name"] == "new"
+
+
+def test_batch_stages_copies_of_units():
+    batch = NSXBatch(FakeHTTP())
+    group = FakeUnit({"id": "g", "expression": []})
+    policy = FakeUnit({"id": "p", "description": "old"})
+    batch.add_group(group)
+    batch.add_policy(policy)
+    # staging doesn't write into the unit, later edits don't reach the batch
+    assert "path" not in group.data
+    group.data["expression"].append({"resource_type": "IPAddressExpression"})
+    policy.data["description"] = "new"
+    staged_group, staged_policy = batch.body()["children"][0]["children"]
+    assert staged_group["Group"]["expression"] == []
+    assert staged_policy["SecurityPolicy"]["description"] == "old"
+
+
+def test_batch_deleted_rules_and_deletes():
+    batch = NSXBatch(FakeHTTP())
+    batch.add_group(FakeUnit({"id": "g"}), delete=True)
+    batch.delete_rule(FakeUnit({"id": "p"}), FakeUnit({"id": "r1"}))
+    group, policy = batch.body()["children"][0]["children"]
+
+    assert group["marked_for_delete"] is True
+    assert policy["resource_type"] == "ChildResourceReference"
+    assert policy["target_type"] == "SecurityPolicy"
+    (rule,) = policy["children"]
+    assert rule["marked_for_delete"] is True
+
+
+def test_batch_staged_rules_override_policy_rules():
+    batch = NSXBatch(FakeHTTP())
+    policy = FakeUnit({"id": "p", "rules": [{"id": "r1", "sequence_number": 10}]})
+    batch.add_policy(policy)
+    batch.add_rule(policy, FakeUnit({"id": "r1", "sequence_number": 20}))
+    batch.add_rule(policy, FakeUnit({"id": "r2", "sequence_number": 30}))
+    (policy,) = batch.body()["children"][0]["children"]
+    rules = [c["Rule"] for c in policy["SecurityPolicy"]["children"]]
+    assert [(r["id"], r["sequence_number"]) for r in rules] == [("r1", 20), ("r2", 30)]
+
+
+def test_batch_not_sent_when_block_raises():
+    http = FakeHTTP()
+    nsx = FakeNSX()
+    with pytest.raises(ValueError):
+        with NSXBatch(http, nsx=nsx) as batch:
+            assert http.batch is batch
+            batch.add_group(FakeUnit({"id": "g"}))
+            raise ValueError
+    assert http.batch is None
+    assert http.requests == []
+    assert nsx.group.discarded
+
+
+def test_batch_raising_drops_cached_creates():
+    from uonsx import NSX
+
+    nsx = NSX(
+        server="mock_server",
+        username="mock_username",
+        password="mock_password",
+        domain_id="mock_domain_id",
+        mock=True,
+    )
+    with pytest.raises(ValueError):
+        with nsx.batch():
+            nsx.group.create(name="web")
+            assert nsx.group._index.name("web")
+            raise ValueError
+    assert nsx.group._needs_refresh
+    assert nsx.group.get_all() == []
+    NSX._current = None
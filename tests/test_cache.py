@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+from uonsx import NSX
+from uonsx.cache import NSXSnapshotCache
+from uonsx.config import NSXConfig
+from uonsx.unit.group import NSXGroup
+
+
+class FakeUnit:
+    def __init__(self, data):
+        self.data = data
+
+    def dump(self):
+        return self.data
+
+
+def make_cfg(tmp_path, **kwargs):
+    return NSXConfig(
+        server="mock_server",
+        username="mock_username",
+        password="mock_password",
+        domain_id="mock_domain_id",
+        cache=True,
+        cache_dir=str(tmp_path),
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    return NSXSnapshotCache(make_cfg(tmp_path), "group")
+
+
+def test_snapshot_round_trip(snapshot):
+    assert snapshot.load() is None
+    snapshot.save([FakeUnit({"id": "a", "_revision": 2})], 1234)
+    loaded = snapshot.load()
+    assert loaded["items"] == [{"id": "a", "_revision": 2}]
+    assert loaded["last_modified_time"] == 1234
+
+
+def test_snapshot_expired(tmp_path):
+    snapshot = NSXSnapshotCache(make_cfg(tmp_path, cache_ttl=-1), "group")
+    snapshot.save([FakeUnit({"id": "a"})], 1)
+    assert snapshot.load() is None
+
+
+def test_snapshot_other_server_ignored(snapshot):
+    snapshot.save([FakeUnit({"id": "a"})], 1)
+    with open(snapshot.path) as f:
+        data = json.load(f)
+    data["key"] = "other_server/mock_domain_id"
+    with open(snapshot.path, "w") as f:
+        json.dump(data, f)
+    assert snapshot.load() is None
+
+
+def test_snapshot_refresh_and_disabled(tmp_path):
+    NSXSnapshotCache(make_cfg(tmp_path), "group").save([FakeUnit({"id": "a"})], 1)
+    assert NSXSnapshotCache(make_cfg(tmp_path, cache_refresh=True), "group").load() is None
+    cfg = make_cfg(tmp_path)
+    cfg.cache = False
+    assert NSXSnapshotCache(cfg, "group").load() is None
+
+
+def test_projected_load_saves_compact_snapshot(tmp_path, monkeypatch):
+    nsx = NSX(
+        server="mock_server",
+        username="mock_username",
+        password="mock_password",
+        domain_id="mock_domain_id",
+        mock=True,
+        cache=True,
+        cache_dir=str(tmp_path),
+    )
+    groups = [
+        {"id": f"g{i}", "display_name": f"g{i}", "path": f"/g/g{i}", "tags": [], "_revision": 1, "_last_modified_time": i}
+        for i in range(3)
+    ]
+    fetched = []
+    monkeypatch.setattr(nsx.http, "paginate", lambda endpoint, *a, **kw: iter(groups))
+    monkeypatch.setattr(nsx.http, "request", lambda method, endpoint, data=None, **kw: fetched.append(endpoint))
+    nsx.group.project(["tags"])
+    nsx.group._refresh_data()
+    assert fetched == []
+    items = nsx.group._snapshot.load()["items"]
+    assert [sorted(i) for i in items] == [sorted(nsx.group._projection())] * 3
+    NSX._current = None
+
+
+def test_local_changes_write_the_snapshot_once_on_close(tmp_path, monkeypatch):
+    nsx = NSX(
+        server="mock_server",
+        username="mock_username",
+        password="mock_password",
+        domain_id="mock_domain_id",
+        mock=True,
+        cache=True,
+        cache_dir=str(tmp_path),
+    )
+    monkeypatch.setattr(nsx.http, "paginate", lambda endpoint, *a, **kw: iter([]))
+    monkeypatch.setattr(nsx.http, "close", lambda: None)
+    nsx.group._refresh_data()
+    saves = []
+    monkeypatch.setattr(nsx.group._snapshot, "save", lambda units, lmt: saves.append(len(units)))
+    for i in range(3):
+        nsx.group._cache_add(NSXGroup({"id": f"g{i}", "display_name": f"g{i}", "path": f"/g/g{i}"}, nsx=nsx))
+    assert saves == []
+    nsx.close()
+    assert saves == [3]
+    NSX._current = None
@@ -0,0 +1,47 @@
+import pytest
+from uonsx import NSX
+from uonsx.command_line.uonsx import setup
+from uonsx.config import NSXConfig
+from uonsx.http import HTTP
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    path = tmp_path / "config.yaml"
+    path.write_text(
+        "server: nsx.example.com\n"
+        "username: admin\n"
+        "password: secret\n"
+        "domain_id: default\n"
+        "auth_method: basic\n"
+        "page_size: 50\n"
+        "pool_size: 3\n"
+        "rate_limit: 20\n"
+        "max_concurrency: 2\n"
+        "json_codec: json\n"
+    )
+    monkeypatch.setattr(NSXConfig, "valid_config_paths", [str(path)])
+    yield path
+    NSX._current = None
+    HTTP._HTTP__instance = None
+
+
+def test_setup_forwards_config_file_settings(config_file):
+    nsx = setup(None, None, None, None, 0, None, None)
+    cfg = nsx.cfg
+    assert cfg.auth_method == "basic"
+    assert (cfg.page_size, cfg.pool_size) == (50, 3)
+    assert cfg.rate_limit == 20
+    assert cfg.max_concurrency == 2
+    assert cfg.json_codec == "json"
+
+
+def test_cli_closes_nsx_when_done(config_file, monkeypatch):
+    from click.testing import CliRunner
+    from uonsx.command_line.uonsx import cli
+
+    closed = []
+    monkeypatch.setattr(NSX, "close", lambda self: closed.append(self))
+    # `group` without a subcommand only prints its help, after the root set up NSX
+    CliRunner().invoke(cli, ["group"])
+    assert len(closed) == 1
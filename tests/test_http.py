@@ -0,0 +1,254 @@
+import pytest
+
+from uonsx.config import NSXConfig
+from uonsx.error import NSXHTTPError, NSXInvalidConfigurationError, NSXRateLimitError
+from uonsx.http import HTTP, JSONCodec, get_json_codec, json_codecs
+
+
+@pytest.fixture
+def http():
+    cfg = NSXConfig(
+        server="mock_server",
+        username="mock_username",
+        password="mock_password",
+        domain_id="mock_domain_id",
+        page_size=2,
+    )
+    h = HTTP(cfg)
+    yield h
+    HTTP._HTTP__instance = None
+
+
+@pytest.fixture
+def pages():
+    return {
+        None: {"results": [{"id": "a"}, {"id": "b"}], "cursor": "c1"},
+        "c1": {"results": [{"id": "c"}, {"id": "d"}], "cursor": "c2"},
+        "c2": {"results": [{"id": "e"}]},
+    }
+
+
+def fake_request(pages, seen):
+    def request(method, endpoint, data=None):
+        seen.append(endpoint)
+        cursor = None
+        if "cursor=" in endpoint:
+            cursor = endpoint.split("cursor=")[1].split("&")[0]
+        return pages[cursor]
+
+    return request
+
+
+def test_add_query(http):
+    assert http._add_query("/groups", {"page_size": 5}) == "/groups?page_size=5"
+    assert http._add_query("/a?x=1", {"page_size": 5}) == "/a?x=1&page_size=5"
+
+
+def test_paginate_follows_cursor(http, pages):
+    seen = []
+    http.request = fake_request(pages, seen)
+    ids = [i["id"] for i in http.paginate("/groups")]
+    assert ids == ["a", "b", "c", "d", "e"]
+    assert len(seen) == 3
+    assert all("page_size=2" in e for e in seen)
+
+
+def test_paginate_is_lazy(http, pages):
+    seen = []
+    http.request = fake_request(pages, seen)
+    it = http.paginate("/groups")
+    assert next(it)["id"] == "a"
+    assert len(seen) == 1
+
+
+def test_paginate_stops_on_repeated_cursor(http):
+    http.request = lambda method, endpoint, data=None: {
+        "results": [{"id": "a"}],
+        "cursor": "same",
+    }
+    assert len(list(http.paginate("/groups"))) == 2
+
+
+def test_paginate_empty_response(http):
+    http.request = lambda method, endpoint, data=None: {}
+    assert list(http.paginate("/groups")) == []
+
+
+def test_session_is_reused(http):
+    assert http._method_switch("GET").__self__ is http.session
+    assert http._method_switch("DELETE").__self__ is http.session
+
+
+def test_session_pool_size(http):
+    adapter = http.session.get_adapter("https://mock_server")
+    assert adapter._pool_maxsize == 10
+    assert adapter.max_retries.total == 3
+    assert http.session.headers["Connection"] == "keep-alive"
+
+
+def test_pool_stats_empty(http):
+    stats = http.pool_stats()
+    assert stats["requests"] == 0
+    assert stats["reuse_rate"] == 0.0
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode("utf-8")
+        self.headers = headers or {}
+
+
+def test_session_auth_logs_in_once(http):
+    logins = []
+    http.session.post = lambda url, data=None, headers=None: logins.append(url) or FakeResponse(
+        headers={"X-XSRF-TOKEN": f"token{len(logins)}"}
+    )
+    calls = []
+    http._make_request = lambda f, url, headers, auth, data=None: calls.append(auth) or FakeResponse(
+        text='{"ok": true}'
+    )
+    assert http.request("GET", "/groups") == {"ok": True}
+    assert http.request("GET", "/groups") == {"ok": True}
+    assert len(logins) == 1
+    assert logins[0].endswith("/api/session/create")
+    assert calls == [None, None]
+    assert http.session.headers["X-XSRF-TOKEN"] == "token1"
+
+
+def test_session_auth_relogin_on_expiry(http):
+    logins = []
+    http.session.post = lambda url, data=None, headers=None: logins.append(url) or FakeResponse(
+        headers={"X-XSRF-TOKEN": f"token{len(logins)}"}
+    )
+    responses = [
+        FakeResponse(text='{"ok": 1}'),
+        FakeResponse(status_code=401, text='{"error_message": "expired", "error_code": 1}'),
+        FakeResponse(text='{"ok": 2}'),
+    ]
+    http._make_request = lambda f, url, headers, auth, data=None: responses.pop(0)
+    assert http.request("GET", "/groups") == {"ok": 1}
+    assert http.request("GET", "/groups") == {"ok": 2}
+    assert len(logins) == 2
+    assert http.session.headers["X-XSRF-TOKEN"] == "token2"
+
+
+def test_basic_auth_fallback(http):
+    http.auth_method = "basic"
+    calls = []
+    http._make_request = lambda f, url, headers, auth, data=None: calls.append(auth) or FakeResponse(
+        text="{}"
+    )
+    http.request("GET", "/groups")
+    assert calls == [("mock_username", "mock_password")]
+    assert http._xsrf_token is None
+
+
+def test_search_encodes_query(http):
+    seen = []
+    http.request = fake_request({None: {"results": [{"id": "a"}]}}, seen)
+    assert [i["id"] for i in http.search("resource_type:Group")] == ["a"]
+    assert seen[0].startswith("/policy/api/v1/search/query?query=resource_type%3AGroup")
+
+
+@pytest.mark.parametrize("name", ["auto"] + list(json_codecs))
+def test_json_codec_round_trip(name):
+    try:
+        codec = get_json_codec(name)
+    except NSXInvalidConfigurationError:
+        pytest.skip(f"{name} not installed")
+    data = {"display_name": "caf\u00e9", "rules": [{"sequence_number": 10, "disabled": False}]}
+    encoded = codec.dumps(data)
+    assert isinstance(encoded, bytes)
+    assert codec.loads(encoded) == data
+
+
+def test_json_codec_invalid_name():
+    with pytest.raises(NSXInvalidConfigurationError):
+        get_json_codec("yaml")
+
+
+def test_parse_response_uses_content_bytes(http):
+    http.codec = JSONCodec()
+    assert http._parse_response(FakeResponse(text='{"id": "a"}')) == {"id": "a"}
+    assert http._parse_response(FakeResponse(text="")) == {"status": "success"}
+
+
+def test_request_retries_throttled_responses(http):
+    http.auth_method = "basic"
+    sleeps = []
+    http._sleep = sleeps.append
+    responses = [
+        FakeResponse(status_code=429, headers={"Retry-After": "1"}),
+        FakeResponse(status_code=503),
+        FakeResponse(text='{"ok": true}'),
+    ]
+    http._make_request = lambda f, url, headers, auth, data=None: responses.pop(0)
+    assert http.request("GET", "/groups") == {"ok": True}
+    assert sleeps[0] == 1.0
+    assert len(sleeps) == 2
+
+
+def test_request_does_not_retry_post_on_503(http):
+    http.auth_method = "basic"
+    http._sleep = lambda s: pytest.fail("should not retry")
+    http._make_request = lambda f, url, headers, auth, data=None: FakeResponse(status_code=503)
+    with pytest.raises(NSXHTTPError):
+        http.request("POST", "/api/v1/fabric/virtual-machines?action=add_tags", {})
+
+
+def test_request_gives_up_after_max_retries(http):
+    http.auth_method = "basic"
+    sleeps = []
+    http._sleep = sleeps.append
+    http._make_request = lambda f, url, headers, auth, data=None: FakeResponse(
+        status_code=429, headers={"Retry-After": "0"}
+    )
+    with pytest.raises(NSXRateLimitError):
+        http.request("GET", "/groups")
+    assert len(sleeps) == 3
+
+
+def test_request_releases_concurrency_slot(http):
+    http.auth_method = "basic"
+    http._make_request = lambda f, url, headers, auth, data=None: FakeResponse(text="{}")
+    http.request("GET", "/groups")
+    stats = http.concurrency_stats()
+    assert stats["in_flight"] == 0
+    assert stats["requests"] == 1
+
+
+def test_async_paginate_follows_cursor(http, pages):
+    import asyncio
+
+    seen = []
+    http.request = fake_request(pages, seen)
+
+    async def collect():
+        return [i["id"] async for i in http.async_client().paginate("/groups")]
+
+    assert asyncio.run(collect()) == ["a", "b", "c", "d", "e"]
+    assert len(seen) == 3
+    http.async_client().close()
+
+
+def test_async_requests_run_concurrently(http):
+    import asyncio
+    import threading
+
+    barrier = threading.Barrier(3, timeout=2)
+
+    def request(method, endpoint, data=None):
+        barrier.wait()
+        return {"ok": True}
+
+    http.request = request
+
+    async def fan_out():
+        aio = http.async_client()
+        return await asyncio.gather(*(aio.request("GET", f"/groups/{i}") for i in range(3)))
+
+    # all three must be in flight at once to get past the barrier
+    assert asyncio.run(fan_out()) == [{"ok": True}] * 3
+    http.async_client().close()
@@ -0,0 +1,31 @@
+import subprocess
+import sys
+
+# modules that should only be imported by the code paths that need them
+DEFERRED = [
+    "requests",
+    "yaml",
+    "columnar",
+    "colorama",
+    "pprint",
+    "uonsx.manager.group",
+    "uonsx.unit.group",
+]
+
+
+def loaded_after(statement: str) -> list[str]:
+    code = f"import sys; {statement}; print(','.join(m for m in {DEFERRED!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return [m for m in out.stdout.strip().split(",") if m]
+
+
+def test_import_defers_heavy_modules():
+    assert loaded_after("import uonsx") == []
+
+
+def test_nsx_builds_managers_on_first_use():
+    statement = (
+        "import uonsx; nsx = uonsx.NSX(server='s', username='u', password='p', domain_id='d', mock=True)"
+    )
+    assert "uonsx.manager.group" not in loaded_after(statement)
+    assert "uonsx.manager.group" in loaded_after(statement + "; nsx.group")
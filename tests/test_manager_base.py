@@ -0,0 +1,255 @@
+import pytest
+
+from uonsx.config import NSXConfig
+from uonsx.http import HTTP
+from uonsx.manager.base import BaseManager
+
+
+class FakeUnit:
+    def __init__(self, data, nsx=None):
+        self.data = data
+        self.nsx = nsx
+
+    def name(self):
+        return self.data["display_name"]
+
+    def id(self):
+        return self.data["id"]
+
+    def path(self):
+        return self.data.get("path")
+
+    def dump(self):
+        return self.data
+
+
+class FakeManager(BaseManager[FakeUnit]):
+    kind = "fake"
+    unit = FakeUnit
+
+    def iter_all(self):
+        yield from self._paginate("/fake")
+
+
+@pytest.fixture
+def manager():
+    cfg = NSXConfig(
+        server="mock_server",
+        username="mock_username",
+        password="mock_password",
+        domain_id="mock_domain_id",
+    )
+    http = HTTP(cfg)
+    loads = []
+
+    def paginate(endpoint):
+        loads.append(endpoint)
+        return iter([{"id": "a", "display_name": "A"}])
+
+    http.paginate = paginate
+    m = FakeManager(cfg)
+    m.loads = loads
+    yield m
+    HTTP._HTTP__instance = None
+
+
+def test_base_manager_loads_once(manager):
+    manager._refresh_data()
+    manager._refresh_data()
+    assert manager.loads == ["/fake"]
+    assert manager._index.name("A").id() == "a"
+    assert manager.cache_stats()["hits"] == 1
+    assert manager.cache_stats()["misses"] == 1
+
+
+def test_base_manager_invalidate_reloads(manager):
+    manager._refresh_data()
+    manager.invalidate()
+    manager._refresh_data()
+    assert len(manager.loads) == 2
+
+
+def test_base_manager_ttl_expires(manager):
+    manager.ttl = 0.01
+    manager._refresh_data()
+    manager._loaded_at -= 1
+    manager._refresh_data()
+    assert len(manager.loads) == 2
+
+
+def test_base_manager_single_flight_refresh(manager):
+    import threading
+    import time
+
+    paginate = manager.http.paginate
+
+    def slow_paginate(endpoint):
+        time.sleep(0.05)
+        return paginate(endpoint)
+
+    manager.http.paginate = slow_paginate
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        manager._refresh_data()
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert manager.loads == ["/fake"]
+    assert manager.cache_stats()["misses"] == 1
+
+
+def test_base_manager_readers_keep_their_inventory(manager):
+    manager._refresh_data()
+    before = manager._inventory
+    manager.invalidate()
+    manager._refresh_data()
+    assert manager._inventory is not before
+    assert [u.id() for u in before.data] == ["a"]
+    assert before.index.id("a") is before.data[0]
+
+
+def test_base_manager_cold_lookup_searches(manager):
+    queries = []
+
+    def search(query):
+        queries.append(query)
+        return iter([{"id": "b", "display_name": "A b"}, {"id": "a", "display_name": "A"}])
+
+    manager.http.search = search
+    manager.resource_type = "Fake"
+    assert manager._lookup_name("A").id() == "a"
+    assert queries == ['resource_type:Fake AND display_name:"A"']
+    assert manager.loads == []
+
+
+def test_base_manager_lookup_falls_back_to_inventory(manager):
+    manager.http.search = lambda query: iter([])
+    manager.resource_type = "Fake"
+    assert manager._lookup_name("A").id() == "a"
+    assert manager.loads == ["/fake"]
+    # warm caches answer from the index
+    manager.http.search = None
+    assert manager._lookup_name("A").id() == "a"
+
+
+def test_base_manager_cold_id_lookup_fetches_once(manager):
+    gets = []
+
+    def request(method, endpoint, data=None):
+        gets.append(endpoint)
+        return {"id": "a", "display_name": "A"}
+
+    manager.http.request = request
+    assert manager._lookup_id("a", "/fake/a").id() == "a"
+    assert manager._lookup_id("a", "/fake/a").id() == "a"
+    assert gets == ["/fake/a"]
+    assert manager.loads == []
+    # a full load replaces what was fetched
+    manager._refresh_data()
+    assert manager._fetched == {}
+    assert manager._lookup_path("/missing", "/fake/missing") is None
+    assert gets == ["/fake/a"]
+
+
+def test_base_manager_cold_id_lookup_missing(manager):
+    from uonsx.error import NSXObjectNotFoundError
+
+    def request(method, endpoint, data=None):
+        raise NSXObjectNotFoundError(endpoint)
+
+    manager.http.request = request
+    assert manager._lookup_id("b", "/fake/b") is None
+    assert manager.loads == []
+
+
+def test_base_manager_projection(manager):
+    endpoints = []
+    fetched = []
+
+    def paginate(endpoint):
+        endpoints.append(endpoint)
+        return iter([{"id": "a", "display_name": "A", "path": "/a", "tags": [], "extra": 1}])
+
+    def request(method, endpoint, data=None):
+        fetched.append(endpoint)
+        return {"id": "a", "display_name": "A", "path": "/a", "tags": [], "extra": 1, "big": 2}
+
+    manager.http.paginate = paginate
+    manager.http.request = request
+    manager.project(["tags"])
+    manager._refresh_data()
+    assert endpoints == ["/fake?included_fields=id%2Cdisplay_name%2Cpath%2Ctags"]
+    unit = manager._index.id("a")
+    assert not unit.data.is_complete()
+    assert len(unit.data) == 4
+    assert unit.data["tags"] == []
+    # other fields come from the full document, fetched once
+    assert unit.data["big"] == 2
+    assert unit.data.get("extra") == 1
+    assert fetched == ["/policy/api/v1/a"]
+
+
+def test_record_completes_before_changes():
+    from uonsx.manager.record import NSXRecord
+
+    loads = []
+
+    def loader(record):
+        loads.append(record["id"])
+        return {"id": "a", "tags": ["t"], "expression": []}
+
+    record = NSXRecord.compact({"id": "a", "tags": ["t"], "big": 1}, ["id", "tags"], loader)
+    assert record.get("tags") == ["t"]
+    assert not record.is_complete()
+    record["tags"] = []
+    assert record == {"id": "a", "tags": [], "expression": []}
+    assert loads == ["a"]
+    with pytest.raises(KeyError):
+        record["missing"]
+
+
+def test_record_completes_for_membership_and_iteration():
+    import json
+    import threading
+    import time
+
+    from uonsx.manager.record import NSXRecord
+
+    loads = []
+
+    def loader(record):
+        loads.append(dict.__getitem__(record, "id"))
+        time.sleep(0.02)
+        return {"id": "a", "big": 1}
+
+    record = NSXRecord.compact({"id": "a", "big": 1}, ["id"], loader)
+    threads = [threading.Thread(target=lambda: "big" in record) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert loads == ["a"]
+    assert json.loads(json.dumps(record)) == {"id": "a", "big": 1}
+
+    record = NSXRecord.compact({"id": "b", "big": 1}, ["id"], lambda r: {"big": 1})
+    assert sorted(record.keys()) == ["big", "id"]
+
+
+def test_base_manager_replace_publishes_a_copy_in_place(manager):
+    manager.http.paginate = lambda endpoint: iter(
+        [{"id": i, "display_name": i.upper(), "tags": []} for i in "abc"]
+    )
+    manager._refresh_data()
+    old = manager.data
+    changed = manager._copy(manager._index.id("b"), tags=["t"])
+    assert manager._index.id("b").data["tags"] == []
+    manager._cache_replace(changed)
+    assert [u.id() for u in manager.data] == ["a", "b", "c"]
+    assert manager._index.id("b") is changed
+    # readers of the old inventory don't see the change
+    assert old[1].data["tags"] == []
@@ -0,0 +1,88 @@
+from uonsx import NSX
+from uonsx.manager.delta import NSXDeltaTracker
+from uonsx.unit.group import NSXGroup
+
+
+class FakeHTTP:
+    def __init__(self, results):
+        self.results = results
+        self.queries = []
+
+    def search(self, query):
+        self.queries.append(query)
+        return iter(self.results)
+
+
+class FakeUnit:
+    def __init__(self, data):
+        self.data = data
+
+    def dump(self):
+        return self.data
+
+
+def test_delta_full_reload_due_until_loaded():
+    tracker = NSXDeltaTracker(FakeHTTP([]), "Group", "/infra/domains/d/groups/", 300)
+    assert tracker.full_reload_due()
+    tracker.mark_full_load([FakeUnit({"_last_modified_time": 5}), FakeUnit({})])
+    assert not tracker.full_reload_due()
+    assert tracker.last_modified_time == 5
+
+
+def test_delta_full_reload_due_after_interval():
+    tracker = NSXDeltaTracker(FakeHTTP([]), "Group", "/infra/domains/d/groups/", 0)
+    tracker.mark_full_load([FakeUnit({"_last_modified_time": 5})])
+    assert tracker.full_reload_due()
+
+
+def test_delta_changed_filters_by_path():
+    http = FakeHTTP(
+        [
+            {"id": "a", "path": "/infra/domains/d/groups/a"},
+            {"id": "b", "path": "/infra/domains/other/groups/b"},
+        ]
+    )
+    tracker = NSXDeltaTracker(http, "Group", "/infra/domains/d/groups/", 300)
+    tracker.mark_full_load([FakeUnit({"_last_modified_time": 10})])
+    tracker.observe([FakeUnit({"_last_modified_time": 7})])
+    assert [i["id"] for i in tracker.changed()] == ["a"]
+    assert http.queries == ["resource_type:Group AND _last_modified_time:[10 TO *]"]
+
+
+def test_local_writes_do_not_move_the_mark(monkeypatch):
+    nsx = NSX(
+        server="mock_server",
+        username="mock_username",
+        password="mock_password",
+        domain_id="mock_domain_id",
+        mock=True,
+    )
+    groups = [{"id": "a", "display_name": "a", "path": "/g/a", "expression": [], "_last_modified_time": 5}]
+    monkeypatch.setattr(nsx.http, "paginate", lambda endpoint, *a, **kw: iter(groups))
+    nsx.group._refresh_data()
+    assert nsx.group._delta.last_modified_time == 5
+    created = {"id": "b", "display_name": "b", "path": "/g/b", "expression": [], "_last_modified_time": 9}
+    nsx.group._cache_add(NSXGroup(created, nsx=nsx))
+    assert nsx.group._index.id("b")
+    assert nsx.group._delta.last_modified_time == 5
+    NSX._current = None
+
+
+def test_created_units_are_not_the_cached_ones(monkeypatch):
+    nsx = NSX(
+        server="mock_server",
+        username="mock_username",
+        password="mock_password",
+        domain_id="mock_domain_id",
+        mock=True,
+    )
+    monkeypatch.setattr(nsx.http, "paginate", lambda endpoint, *a, **kw: iter([]))
+    monkeypatch.setattr(
+        nsx.http, "request", lambda method, endpoint, data=None, **kw: dict(data, path=endpoint)
+    )
+    group = nsx.group.create("web")
+    cached = nsx.group._index.name("web")
+    assert cached is not group
+    group.data["description"] = "changed"
+    assert "description" not in cached.data
+    NSX._current = None
@@ -0,0 +1,64 @@
+import pytest
+
+from uonsx.error import NSXDuplicateNameError
+from uonsx.manager.index import NSXIndex
+
+
+class FakeUnit:
+    def __init__(self, name, id):
+        self.data = {"display_name": name, "id": id, "path": f"/infra/things/{id}"}
+
+    def __bool__(self):
+        return True if self.data else False
+
+    def name(self):
+        return self.data["display_name"]
+
+    def id(self):
+        return self.data["id"]
+
+    def path(self):
+        return self.data["path"]
+
+
+@pytest.fixture
+def index():
+    return NSXIndex([FakeUnit("web", "web-id"), FakeUnit("db", "db-id")])
+
+
+def test_index_lookups(index):
+    assert index.name("web").id() == "web-id"
+    assert index.id("db-id").name() == "db"
+    assert index.path("/infra/things/web-id").name() == "web"
+    assert index.name("missing") is None
+    assert "web" in index
+    assert len(index) == 2
+
+
+def test_index_duplicate_names_raise(index):
+    index.add(FakeUnit("web", "web-id-2"))
+    with pytest.raises(NSXDuplicateNameError):
+        index.name("web")
+    assert list(index.duplicates()) == ["web"]
+
+
+def test_index_add_replaces_same_id(index):
+    index.add(FakeUnit("web-renamed", "web-id"))
+    assert index.name("web") is None
+    assert index.name("web-renamed").id() == "web-id"
+    assert len(index) == 2
+
+
+def test_index_remove(index):
+    index.remove(index.id("web-id"))
+    assert index.name("web") is None
+    assert index.path("/infra/things/web-id") is None
+    assert len(index) == 1
+
+
+def test_index_copy_is_independent():
+    index = NSXIndex([FakeUnit("web", "a")])
+    copy = index.copy()
+    copy.add(FakeUnit("web", "b"))
+    assert len(index.by_name["web"]) == 1
+    assert len(copy.by_name["web"]) == 2
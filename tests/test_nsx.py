@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+from uonsx import NSX
+from uonsx.error import NSXGenericError
+from uonsx.manager.group import NSXGroupManager
+from uonsx.unit.group import NSXGroup
+
+
+def make_nsx(server: str) -> NSX:
+    return NSX(
+        server=server,
+        username="mock_username",
+        password="mock_password",
+        domain_id="mock_domain_id",
+        mock=True,
+    )
+
+
+@pytest.fixture
+def two():
+    first, second = make_nsx("first"), make_nsx("second")
+    yield first, second
+    NSX._current = None
+
+
+def test_nsx_instances_do_not_share_managers(two):
+    first, second = two
+    assert first.http is not second.http
+    assert first.group is not second.group
+    assert first.group.http is first.http
+    assert second.group.http is second.http
+    assert first.group._expression_manager is first.expression
+
+
+def test_units_bind_to_their_nsx(two):
+    first, second = two
+    group = NSXGroup({"id": "g", "display_name": "g", "expression": []}, nsx=first)
+    assert group.nsx is first
+    assert group._group_mgr is first.group
+    # without one, units use the current NSX
+    assert NSXGroup({"id": "g"}).nsx is second
+
+
+def test_nsx_use_selects_current(two):
+    first, second = two
+    assert NSX.current() is second
+    with first.use():
+        assert NSX.current() is first
+        assert NSXGroupManager.get_instance() is first.group
+    assert NSX.current() is second
+
+
+def test_nsx_context_manager_closes_http(monkeypatch):
+    closed = []
+    with make_nsx("first") as nsx:
+        monkeypatch.setattr(nsx.http, "close", lambda: closed.append(True))
+    assert closed == [True]
+    NSX._current = None
+
+
+class FakeManager:
+    def __init__(self, barrier):
+        self.barrier = barrier
+        self.refreshed = False
+
+    def _refresh_data(self):
+        # both managers have to be loading at once to get past the barrier
+        self.barrier.wait()
+        self.refreshed = True
+
+
+def test_prefetch_rejects_managers_it_cannot_load(two):
+    first, _ = two
+    with pytest.raises(NSXGenericError):
+        first.prefetch(["group", "expression"])
+    assert "group" not in first.__dict__
+
+
+def test_prefetch_loads_named_managers_concurrently(two):
+    first, _ = two
+    barrier = threading.Barrier(2, timeout=5)
+    fakes = {"group": FakeManager(barrier), "service": FakeManager(barrier)}
+    first.__dict__.update(fakes)
+    first.prefetch(["group", "service"], max_workers=2)
+    assert all(fake.refreshed for fake in fakes.values())
+    # no other manager was built
+    assert {name for name in NSX.managers if name in first.__dict__} == {"group", "service"}
@@ -0,0 +1,119 @@
+import asyncio
+
+from uonsx.tools.rule_scope import arule_scope
+
+
+class FakeClient:
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def run(self, func, *args):
+        self.calls.append(func.__name__)
+        return func(*args)
+
+
+class FakeHTTP:
+    def __init__(self, calls):
+        self.client = FakeClient(calls)
+
+    def async_client(self):
+        return self.client
+
+
+class FakeDebug:
+    def print(self, level, message):
+        pass
+
+
+class FakeGroup:
+    def __init__(self, native):
+        self.native = native
+
+    async def acheck_native(self):
+        return self.native
+
+
+class FakeGroupManager:
+    debug = FakeDebug()
+
+    def __init__(self, calls, native):
+        self.calls = calls
+        self.native = native
+
+    def get_all(self):
+        self.calls.append("group.get_all")
+        return []
+
+    def get_by_path(self, path):
+        self.calls.append(path)
+        return FakeGroup(path in self.native)
+
+
+class FakeRule:
+    def __init__(self, name, source, destination):
+        self.data = {"display_name": name, "source_groups": source, "destination_groups": destination}
+
+    def name(self):
+        return self.data["display_name"]
+
+    def source_group_paths(self):
+        return self.data["source_groups"]
+
+    def destination_group_paths(self):
+        return self.data["destination_groups"]
+
+    def scope(self):
+        return self.data.get("scope", [])
+
+
+class FakePolicy:
+    def __init__(self, rules):
+        self._rules = rules
+        self.saved = []
+
+    def name(self):
+        return "p"
+
+    def rules(self):
+        return self._rules
+
+    def save(self):
+        raise AssertionError("the whole policy should not be saved")
+
+    def _save_rules(self, rules):
+        self.saved.append(rules)
+        return True
+
+
+class FakePolicyManager:
+    def __init__(self, policy):
+        self.policy = policy
+
+    def get_all(self):
+        return [self.policy]
+
+    async def aget(self, name):
+        return self.policy
+
+
+class FakeNSX:
+    def __init__(self, policy, native):
+        self.calls = []
+        self.http = FakeHTTP(self.calls)
+        self.group = FakeGroupManager(self.calls, native)
+        self.policy = FakePolicyManager(policy)
+
+
+def test_rule_scope_loads_groups_and_saves_changed_rules():
+    native = FakeRule("native", ["/g/a"], ["/g/b"])
+    other = FakeRule("other", ["/g/a"], ["/g/c"])
+    policy = FakePolicy([native, other])
+    nsx = FakeNSX(policy, native={"/g/a", "/g/b"})
+
+    found = asyncio.run(arule_scope(nsx, fix=True))
+
+    assert [rule for _, rule in found] == [native]
+    # groups are loaded once on the request pool before any path lookup
+    assert nsx.calls.index("group.get_all") < min(nsx.calls.index(p) for p in ["/g/a", "/g/b", "/g/c"])
+    assert native.scope() == ["/g/a", "/g/b"]
+    assert policy.saved == [[native]]
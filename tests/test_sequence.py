@@ -0,0 +1,84 @@
+import pytest
+
+from uonsx import NSX
+from uonsx.error import NSXPolicySequenceNumberInUseError
+from uonsx.sequence import NSXSequenceAllocator
+
+
+def test_sequence_next_appends_with_padding():
+    assert NSXSequenceAllocator([]).next() == 10
+    assert NSXSequenceAllocator([30, 10], padding=20).next() == 50
+
+
+def test_sequence_before_and_after_use_midpoints():
+    allocator = NSXSequenceAllocator([10, 20])
+    assert allocator.before(10) == 4
+    assert allocator.before(20) == 15
+    assert allocator.after(10) == 15
+    assert allocator.after(20) == 30
+
+
+def test_sequence_detects_exhausted_gap():
+    allocator = NSXSequenceAllocator([10, 11])
+    assert allocator.before(11) is None
+    assert allocator.after(10) is None
+    assert NSXSequenceAllocator([0]).before(0) is None
+
+
+def test_sequence_add_remove_keep_order():
+    allocator = NSXSequenceAllocator([10, 30])
+    allocator.add(20)
+    allocator.remove(10)
+    allocator.remove(99)
+    assert allocator.numbers == [20, 30]
+    assert 20 in allocator and 10 not in allocator
+
+
+def test_sequence_make_room_uses_free_gap():
+    assert NSXSequenceAllocator([10, 20]).make_room(1) == (15, {})
+
+
+def test_sequence_make_room_moves_packed_run_only():
+    allocator = NSXSequenceAllocator([10, 11, 12, 50, 51])
+    number, plan = allocator.make_room(1)
+    assert number == 20
+    assert plan == {1: 30, 2: 40}
+
+
+def test_sequence_make_room_at_tail_spreads_with_padding():
+    allocator = NSXSequenceAllocator([10, 11, 12])
+    number, plan = allocator.make_room(1)
+    assert number == 20
+    assert plan == {1: 30, 2: 40}
+
+
+@pytest.fixture
+def nsx(monkeypatch):
+    nsx = NSX(
+        server="mock_server",
+        username="mock_username",
+        password="mock_password",
+        domain_id="mock_domain_id",
+        mock=True,
+    )
+    policies = [
+        {"id": "a", "display_name": "a", "category": "Application", "sequence_number": 10},
+        {"id": "b", "display_name": "b", "category": "Application", "sequence_number": 20},
+    ]
+    monkeypatch.setattr(nsx.http, "paginate", lambda endpoint, *a, **kw: iter(policies))
+    monkeypatch.setattr(nsx.http, "request", lambda method, endpoint, data=None, **kw: data)
+    yield nsx
+    NSX._current = None
+
+
+def test_policy_allocator_is_built_once_per_inventory(nsx):
+    first = nsx.policy._sequence_allocator("Application")
+    assert nsx.policy._sequence_allocator("Application") is first
+    assert first.numbers == [10, 20]
+    nsx.policy.create("c", destination_group=None)
+    assert nsx.policy._sequence_allocator("Application").numbers == [10, 20, 40]
+
+
+def test_policy_create_rejects_a_sequence_number_in_use(nsx):
+    with pytest.raises(NSXPolicySequenceNumberInUseError):
+        nsx.policy.create("c", destination_group=None, sequence_number=20)
@@ -0,0 +1,106 @@
+import threading
+
+import pytest
+
+from uonsx.throttle import NSXConcurrencyLimiter, NSXRetryPolicy, NSXTokenBucket
+
+
+@pytest.fixture
+def policy():
+    return NSXRetryPolicy(max_retries=3, backoff_base=1.0, backoff_max=4.0)
+
+
+def test_retry_idempotency(policy):
+    assert policy.can_retry("GET", 503)
+    assert policy.can_retry("DELETE", 502)
+    assert not policy.can_retry("POST", 503)
+    # 429 is rejected before NSX does anything, so even POST is safe
+    assert policy.can_retry("POST", 429)
+    assert not policy.can_retry("GET", 500)
+    assert NSXRetryPolicy(retry_post=True).can_retry("POST", 503)
+
+
+def test_retry_after_header(policy):
+    assert policy.delay("GET", 429, {"Retry-After": "2"}, 0) == 2.0
+    assert policy.delay("GET", 429, {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}, 0) == 0.0
+    assert policy.delay("GET", 429, {"Retry-After": "soon"}, 0) <= 1.0
+
+
+def test_retry_backoff_is_capped(policy):
+    for attempt in range(3):
+        assert 0 <= policy.delay("GET", 503, {}, attempt) <= min(4.0, 2**attempt)
+    assert policy.delay("GET", 503, {}, 3) is None
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_bursts_then_waits():
+    clock = FakeClock()
+    bucket = NSXTokenBucket(rate=10, burst=2, clock=clock, sleep=clock.sleep)
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == pytest.approx(0.1)
+    clock.now += 1
+    assert bucket.acquire() == 0
+
+
+def test_token_bucket_disabled():
+    bucket = NSXTokenBucket(rate=0)
+    assert all(bucket.acquire() == 0 for _ in range(100))
+
+
+@pytest.fixture
+def limiter():
+    return NSXConcurrencyLimiter(max_limit=8, initial_limit=4, clock=FakeClock())
+
+
+def test_limiter_grows_additively(limiter):
+    for _ in range(8):
+        limiter.acquire()
+        limiter.release(0.1, 200)
+    assert int(limiter.limit) == 5
+
+
+def test_limiter_halves_once_per_round_trip(limiter):
+    limiter.acquire()
+    limiter.release(0.1, 200)
+    limiter.acquire()
+    limiter.release(0.1, 429)
+    assert int(limiter.limit) == 2
+    # a second 429 from the same overload doesn't shrink it again
+    limiter.acquire()
+    limiter.release(0.1, 429)
+    assert int(limiter.limit) == 2
+    assert limiter.stats()["throttled"] == 2
+
+
+def test_limiter_treats_latency_spike_as_congestion(limiter):
+    limiter.acquire()
+    limiter.release(0.1, 200)
+    limiter._clock.now += 1
+    limiter.acquire()
+    limiter.release(5.0, 200)
+    assert int(limiter.limit) == 2
+
+
+def test_limiter_blocks_when_window_full():
+    limiter = NSXConcurrencyLimiter(max_limit=1)
+    limiter.acquire()
+    acquired = threading.Event()
+    t = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+    t.start()
+    assert not acquired.wait(0.05)
+    limiter.release(0.01, 200)
+    assert acquired.wait(1)
+    t.join()
@@ -156,3 +156,54 @@ def test_group_set_ipaddress_expression(sample_group, sample_ipaddress_expressio
     sample_group._set_ipaddress_expression(sample_ipaddress_expression2)
     assert "1.1.1.2" not in sample_group._get_ipaddress_expression().ip_addresses()
     assert "1.1.1.89" in sample_group._get_ipaddress_expression().ip_addresses()
+
+
+def test_group_ipset(sample_group, sample_ipaddress_expression):
+    assert not sample_group.ipset()
+    sample_group._add_expression(sample_ipaddress_expression, "OR")
+    assert "1.1.200.3" in sample_group.ipset()
+    assert "1.2.0.1" not in sample_group.ipset()
+
+
+def test_group_has_ip_address_covers_cidrs(nsx, sample_group, monkeypatch):
+    monkeypatch.setattr(sample_group, "ip_addresses", lambda: ["10.0.0.0/16", "192.168.1.5"])
+    assert sample_group.has_ip_address("192.168.1.5")
+    # a CIDR inside a larger range of the group is covered
+    assert sample_group.has_ip_address("10.0.4.0/24")
+    assert not sample_group.has_ip_address("10.1.0.0/24")
+    assert not sample_group.has_ip_address("192.168.1.6")
+
+
+def test_group_has_ip_address_non_ip_input(nsx, sample_group, monkeypatch):
+    monkeypatch.setattr(sample_group, "ip_addresses", lambda: ["10.0.0.0/16"])
+    assert not sample_group.has_ip_address("web.example.com")
+    assert not sample_group.has_ip_address("10.0.0.256")
+
+
+class FakeVM:
+    def __init__(self, *ip_addresses):
+        self._ip_addresses = list(ip_addresses)
+
+    def ip_addresses(self):
+        return self._ip_addresses
+
+
+@pytest.mark.parametrize(
+    "group_ipaddrs, vms, native",
+    [
+        (["10.0.0.1"], [FakeVM("10.0.0.1")], True),
+        # a vm with two addresses in a group of two addresses
+        (["10.0.0.1", "10.0.0.2"], [FakeVM("10.0.0.2", "10.0.0.1")], False),
+        # two vms sharing the group's one address
+        (["10.0.0.1"], [FakeVM("10.0.0.1"), FakeVM("10.0.0.1")], False),
+        # every vm has to hold all of the group's addresses, not just its share
+        (["10.0.0.1", "10.0.0.2"], [FakeVM("10.0.0.1"), FakeVM("10.0.0.2")], False),
+        (
+            ["10.0.0.1", "10.0.0.2"],
+            [FakeVM("10.0.0.1", "10.0.0.2"), FakeVM("10.0.0.2", "10.0.0.1")],
+            True,
+        ),
+    ],
+)
+def test_group_matches_vms(nsx, sample_group, group_ipaddrs, vms, native):
+    assert sample_group._matches_vms(group_ipaddrs, vms) is native
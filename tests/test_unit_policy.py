@@ -0,0 +1,186 @@
+import json
+
+import pytest
+
+from uonsx.debug import Debug
+from uonsx.unit.policy import NSXPolicy
+from uonsx.unit.rule import NSXRule
+
+
+class FakeHTTP:
+    domain_id = "d"
+
+    def __init__(self):
+        self.requests = []
+
+    def active_batch(self):
+        return None
+
+    def request(self, method, endpoint, data=None):
+        self.requests.append((method, endpoint, data))
+        return {"status": "success"}
+
+
+class FakePolicyManager:
+    def __init__(self):
+        self.refreshes = 0
+
+    def _set_refresh(self, flag=True):
+        self.refreshes += 1
+
+
+def make_policy(sequence_numbers):
+    # skip __init__, it wires the policy up to the live managers
+    policy = NSXPolicy.__new__(NSXPolicy)
+    policy.data = {
+        "id": "p",
+        "display_name": "p",
+        "rules": [
+            {"id": f"r{n}", "display_name": f"r{n}", "rule_id": 1000 + n, "sequence_number": n}
+            for n in sequence_numbers
+        ],
+    }
+    policy.nsx = None
+    policy.http = FakeHTTP()
+    policy.debug = Debug(0)
+    policy._policy_manager = FakePolicyManager()
+    return policy
+
+
+def test_policy_save_rule_patches_only_the_rule():
+    policy = make_policy([10, 20])
+    rule = NSXRule({"id": "new", "display_name": "new", "sequence_number": 15})
+    policy._add_rule(rule)
+    policy._save_rule(rule)
+    ((method, endpoint, data),) = policy.http.requests
+    assert method == "PATCH"
+    assert endpoint.endswith("/security-policies/p/rules/new")
+    assert data["id"] == "new"
+    assert policy.rule_count() == 3
+
+
+def test_policy_make_room_moves_only_packed_rules():
+    policy = make_policy([10, 11, 12, 50])
+    rule = NSXRule({"id": "new", "sequence_number": 11})
+    moved = policy._make_room(rule)
+    policy._add_rule(rule)
+    assert [r.id() for r in moved] == ["r11", "r12"]
+    assert [r.id() for r in policy.rules()] == ["r10", "new", "r11", "r12", "r50"]
+    assert [r.sequence_number() for r in policy.rules()] == [10, 20, 30, 40, 50]
+
+
+def test_policy_remove_rule_deletes_only_the_rule():
+    policy = make_policy([10, 20])
+    assert policy.remove_rule(1010)
+    ((method, endpoint, _),) = policy.http.requests
+    assert method == "DELETE"
+    assert endpoint.endswith("/rules/r10")
+    assert [r.sequence_number() for r in policy.rules()] == [20]
+
+
+def test_policy_rules_are_memoized_until_changed():
+    policy = make_policy([20, 10])
+    first = policy.rules()
+    assert [r.sequence_number() for r in first] == [10, 20]
+    assert policy.rules()[0] is first[0]
+    assert policy.get_rule(1020).id() == "r20"
+
+    policy._add_rule(NSXRule({"id": "r30", "rule_id": 1030, "sequence_number": 30}))
+    assert [r.id() for r in policy.rules()] == ["r10", "r20", "r30"]
+    assert policy.get_rule(1030).id() == "r30"
+
+
+class FakeGroup:
+    def __init__(self, path):
+        self.path = path
+
+    def name(self):
+        return self.path.rsplit("/", 1)[-1]
+
+
+class FakeLookupManager:
+    def __init__(self, calls, unit=str):
+        self.calls = calls
+        self.unit = unit
+
+    def get_all(self):
+        self.calls.append("get_all")
+        return []
+
+    def get_by_path(self, path):
+        self.calls.append(path)
+        return self.unit(path)
+
+
+def test_policy_rules_outdata_loads_groups_once():
+    policy = make_policy([10, 20])
+    for rule in policy.data["rules"]:
+        rule["source_groups"] = ["/infra/domains/d/groups/a", "/infra/domains/d/groups/b"]
+        rule["destination_groups"] = ["/infra/domains/d/groups/c"]
+        rule["services"] = []
+    groups, services = [], []
+    policy._group_manager = FakeLookupManager(groups, FakeGroup)
+    policy._service_manager = FakeLookupManager(services)
+    out = json.loads(policy.rules_outdata(format="json"))
+    assert out["rules"][0]["source_groups"] == ["a", "b"]
+    assert groups[0] == "get_all" and groups.count("get_all") == 1
+    assert services == ["get_all"]
+
+
+class FakeServiceManager:
+    def _service_handler(self, service):
+        return ["ANY"], None
+
+
+def add_any_rule(policy, name, **kwargs):
+    policy._service_manager = FakeServiceManager()
+    policy.add_rule(name=name, source_group="ANY", destination_group="ANY", action="ALLOW", service="ANY", **kwargs)
+
+
+def test_policy_add_rule_before_handle_between_tied_rules():
+    policy = make_policy([10, 20])
+    # two rules sharing a sequence number, only the handle tells them apart
+    policy.data["rules"][1]["sequence_number"] = 10
+    saved = []
+    policy._save_rules = saved.extend
+    add_any_rule(policy, "new", before=1020)
+    assert [r.id() for r in saved] == ["r20", "new"]
+    assert [r.id() for r in policy.rules()] == ["r10", "new", "r20"]
+    assert [r.sequence_number() for r in policy.rules()] == [10, 20, 30]
+
+
+def test_policy_add_rule_uses_gap_after_handle():
+    policy = make_policy([10, 20])
+    add_any_rule(policy, "new", after=1010)
+    assert [r.id() for r in policy.rules()] == ["r10", "new", "r20"]
+    assert policy.rules()[1].sequence_number() == 15
+    assert len(policy.http.requests) == 1
+
+
+def test_policy_sequence_allocator_is_built_once_per_rule_change():
+    policy = make_policy([10, 20])
+    first = policy._sequence_allocator()
+    assert policy._sequence_allocator() is first
+    policy._add_rule(NSXRule({"id": "new", "display_name": "new", "sequence_number": 15}))
+    assert policy._sequence_allocator() is not first
+    assert policy._sequence_allocator().numbers == [10, 15, 20]
+
+
+@pytest.mark.parametrize(
+    "placement, sequence_number",
+    [({"before": 1020}, 15), ({"before": 1010}, 4), ({"after": 1020}, 30)],
+)
+def test_policy_add_rule_uses_gap_at_handle(placement, sequence_number):
+    policy = make_policy([10, 20])
+    add_any_rule(policy, "new", **placement)
+    new = [r for r in policy.rules() if r.id() == "new"][0]
+    assert new.sequence_number() == sequence_number
+
+
+def test_policy_add_rule_makes_room_when_gap_exhausted():
+    policy = make_policy([10, 11])
+    saved = []
+    policy._save_rules = saved.extend
+    add_any_rule(policy, "new", after=1010)
+    assert [r.id() for r in policy.rules()] == ["r10", "new", "r11"]
+    assert [r.id() for r in saved] == ["r11", "new"]
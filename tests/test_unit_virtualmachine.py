@@ -0,0 +1,128 @@
+import pytest
+
+from uonsx import NSX
+from uonsx.unit.tag import NSXTag
+from uonsx.unit.virtualmachine import NSXVirtualInterface
+
+
+@pytest.fixture
+def sample_vif():
+    return NSXVirtualInterface(
+        {
+            "resource_type": "VirtualNetworkInterface",
+            "device_key": "4000",
+            "device_name": "Network adapter 1",
+            "ip_address_info": [
+                {"ip_addresses": ["172.16.20.10", "fe80::250:56ff:fe86:f2b2"], "source": "VM_TOOLS"},
+                {"ip_addresses": ["172.16.20.11"], "source": "SPOOFGUARD"},
+            ],
+            "owner_vm_id": "5006d98a-352f-134f-df6b-33e7f8d5de65",
+            "external_id": "5006d98a-352f-134f-df6b-33e7f8d5de65-4000",
+        }
+    )
+
+
+def test_vif_ip_addresses(sample_vif):
+    assert sample_vif.ip_addresses() == [
+        "172.16.20.10",
+        "fe80::250:56ff:fe86:f2b2",
+        "172.16.20.11",
+    ]
+
+
+def test_vif_without_ip_address_info(sample_vif):
+    del sample_vif.data["ip_address_info"]
+    assert sample_vif.ip_addresses() == []
+
+
+def test_vif_owner(sample_vif):
+    assert sample_vif.owner_vm_id() == "5006d98a-352f-134f-df6b-33e7f8d5de65"
+
+
+@pytest.fixture
+def nsx(monkeypatch):
+    nsx = NSX(
+        server="mock_server",
+        username="mock_username",
+        password="mock_password",
+        domain_id="mock_domain_id",
+        mock=True,
+    )
+    nsx.loads = []
+    vms = [
+        {"external_id": "vm-1", "display_name": "vm1", "tags": []},
+        {"external_id": "vm-2", "display_name": "vm2", "tags": []},
+    ]
+    vifs = [{"owner_vm_id": "vm-1", "ip_address_info": [{"ip_addresses": ["10.0.0.1"]}]}]
+
+    def paginate(endpoint, *args, **kwargs):
+        nsx.loads.append(endpoint)
+        if endpoint.startswith("/api/v1/fabric/virtual-machines"):
+            return iter(vms)
+        if endpoint.startswith("/api/v1/fabric/vifs"):
+            return iter(vifs)
+        external_id = endpoint.rsplit("=", 1)[-1]
+        return iter([{"target_display_name": f"group-of-{external_id}"}])
+
+    monkeypatch.setattr(nsx.http, "paginate", paginate)
+    monkeypatch.setattr(nsx.http, "request", lambda *a, **kw: {})
+    yield nsx
+    NSX._current = None
+
+
+def loads(nsx, kind):
+    return [e for e in nsx.loads if kind in e]
+
+
+def test_tag_change_publishes_a_copy(nsx):
+    old = nsx.vm.get_all()
+    vm = nsx.vm.get("vm1")
+    assert vm is not old[0]
+    nsx.vm.add_tag(vm, NSXTag(name="systems", scope="owner"))
+    assert vm.data["tags"] == [{"scope": "owner", "tag": "systems"}]
+    assert nsx.vm.get("vm1").data["tags"] == [{"scope": "owner", "tag": "systems"}]
+    assert old[0].data["tags"] == []
+
+
+def test_vifs_follow_the_vm_inventory_load(nsx):
+    vm = nsx.vm.get("vm1")
+    assert [v.owner_vm_id() for v in nsx.vm.vifs(vm)] == ["vm-1"]
+    nsx.vm.add_tag(vm, NSXTag(name="systems", scope="owner"))
+    nsx.vm.vifs_by_ip_address("10.0.0.1")
+    # a tag change publishes a copy of one vm, the vifs stay loaded
+    assert len(loads(nsx, "vifs")) == 1
+    nsx.vm._set_refresh()
+    nsx.vm.all_vifs()
+    assert len(loads(nsx, "vifs")) == 2
+
+
+def test_group_names_are_memoized_per_vm(nsx):
+    vm = nsx.vm.get("vm1")
+    assert nsx.vm.group_name_list(vm) == ["group-of-vm-1"]
+    assert nsx.vm.group_name_list(vm) == ["group-of-vm-1"]
+    assert loads(nsx, "group-associations") == [
+        "/policy/api/v1/infra/virtual-machine-group-associations?vm_external_id=vm-1"
+    ]
+
+
+def test_warm_group_associations_skips_cached_vms(nsx):
+    nsx.vm.group_name_list(nsx.vm.get("vm1"))
+    nsx.vm.warm_group_associations()
+    assert len(loads(nsx, "group-associations")) == 2
+    assert loads(nsx, "group-associations")[-1].endswith("vm_external_id=vm-2")
+    assert nsx.vm.group_name_list(nsx.vm.get("vm2")) == ["group-of-vm-2"]
+    assert len(loads(nsx, "group-associations")) == 2
+
+
+def test_tag_changes_drop_that_vms_group_names(nsx):
+    nsx.vm.warm_group_associations()
+    vm = nsx.vm.get("vm1")
+    nsx.vm.add_tag(vm, NSXTag(name="systems", scope="owner"))
+    nsx.vm.group_name_list(vm)
+    nsx.vm.group_name_list(nsx.vm.get("vm2"))
+    assert loads(nsx, "group-associations")[2:] == [
+        "/policy/api/v1/infra/virtual-machine-group-associations?vm_external_id=vm-1"
+    ]
+    nsx.vm.remove_tag(vm, NSXTag(name="systems", scope="owner"))
+    nsx.vm.group_name_list(vm)
+    assert len(loads(nsx, "group-associations")) == 4
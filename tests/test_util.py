@@ -1,6 +1,18 @@
 import pytest
 
-from uonsx.util import strfmt, colorize
+from uonsx.error import NSXInvalidIPAddressError
+from uonsx.util import (
+    IP6Address,
+    IP6Network,
+    IPAddress,
+    IPIntervalIndex,
+    IPNetwork,
+    IPParser,
+    IPRange,
+    IPSet,
+    colorize,
+    strfmt,
+)
 
 
 def test_strfmt(capfd):
@@ -19,3 +31,109 @@ def test_colorize_valid_color():
 def test_colorize_invalid_color():
     message = colorize("test_message", "cat")
     assert message.startswith("test_")
+
+
+def test_ipparser_types():
+    assert isinstance(IPParser.parse("10.0.0.1"), IPAddress)
+    assert isinstance(IPParser.parse("10.0.0.0/24"), IPNetwork)
+    assert isinstance(IPParser.parse("fe80::1"), IP6Address)
+    assert isinstance(IPParser.parse("fe80::/64"), IP6Network)
+    assert isinstance(IPParser.parse("10.0.0.1-10.0.0.9"), IPRange)
+
+
+def test_ipparser_interns():
+    assert IPParser.parse("10.0.0.1") is IPParser.parse("10.0.0.1")
+
+
+def test_ipparser_invalid():
+    assert not IPParser.is_ip("web-group")
+    assert not IPParser.is_ip("10.0.0.300")
+    with pytest.raises(NSXInvalidIPAddressError):
+        IPParser.parse("10.0.0.300")
+
+
+def test_ipparser_version():
+    assert IPParser.version("172.16.20.10") == 4
+    assert IPParser.version("fe80::250:56ff:fe86:f2b2") == 6
+    assert IPParser.version("nope") is None
+
+
+def test_ip_object_containment():
+    assert "10.0.0.5" in IPParser.parse("10.0.0.0/24")
+    assert "10.0.1.5" not in IPParser.parse("10.0.0.0/24")
+    assert "fe80::1" not in IPParser.parse("10.0.0.0/24")
+    assert IPParser.parse("10.0.0.0/24").overlaps("10.0.0.200-10.0.1.4")
+
+
+def test_ipset_merges_intervals():
+    s = IPSet(["10.0.0.0/25", "10.0.0.128/25", "10.0.0.5"])
+    assert s.intervals(4) == [(167772160, 167772415)]
+    assert s.size() == 256
+
+
+def test_ipset_containment():
+    s = IPSet(["10.0.0.0/24", "192.168.1.1", "2001:db8::/32"])
+    assert "10.0.0.77" in s
+    assert "10.0.0.0/25" in s
+    assert "10.0.0.0/23" not in s
+    assert "192.168.1.1" in s
+    assert "192.168.1.2" not in s
+    assert "2001:db8::1" in s
+    assert "2001:db9::1" not in s
+
+
+def test_ipset_union_and_overlap():
+    a = IPSet(["10.0.0.0/24"])
+    b = IPSet(["10.0.1.0/24"])
+    assert not a.overlaps(b)
+    assert (a | b).intervals(4) == [(167772160, 167772671)]
+    assert a.overlaps("10.0.0.0/16")
+    assert not a.overlaps("fe80::1")
+    assert IPSet(["10.0.0.1", "10.0.0.2"]) == IPSet(["10.0.0.2", "10.0.0.1"])
+
+
+def test_ip_interval_index_containing():
+    index = IPIntervalIndex(
+        [
+            (IPSet(["10.0.0.0/16"]), "campus"),
+            (IPSet(["10.0.1.0/24", "10.0.9.9"]), "vlan1"),
+            (IPSet(["192.168.0.0/24"]), "lab"),
+            (IPSet(["2001:db8::/64"]), "v6"),
+        ]
+    )
+    assert sorted(index.containing("10.0.1.7")) == ["campus", "vlan1"]
+    assert sorted(index.containing("10.0.1.0/24")) == ["campus", "vlan1"]
+    assert index.containing("10.0.0.0/15") == []
+    assert sorted(index.containing("10.0.9.9")) == ["campus", "vlan1"]
+    assert index.containing("2001:db8::5") == ["v6"]
+    assert index.containing("172.16.0.1") == []
+
+
+def test_ip_interval_index_overlapping():
+    index = IPIntervalIndex(
+        [
+            (IPSet(["10.0.0.0/24"]), "a"),
+            (IPSet(["10.0.0.128/25"]), "b"),
+            (IPSet(["10.0.5.0/24"]), "c"),
+        ]
+    )
+    assert sorted(index.overlapping("10.0.0.0/16")) == ["a", "b", "c"]
+    assert sorted(index.overlapping("10.0.0.200-10.0.5.1")) == ["a", "b", "c"]
+    assert index.overlapping("10.0.6.0/24") == []
+    assert [sorted(p) for p in index.overlapping_pairs()] == [["a", "b"]]
+
+
+def test_ip_interval_index_matches_linear_scan():
+    import random
+
+    rng = random.Random(4)
+    entries = []
+    for n in range(200):
+        base = rng.randrange(0, 2**16)
+        prefix = rng.randrange(20, 33)
+        entries.append((IPSet([f"10.{base >> 8}.{base & 255}.0/{prefix}"]), n))
+    index = IPIntervalIndex(entries)
+    for _ in range(200):
+        ip = f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}"
+        expected = sorted(v for s, v in entries if ip in s)
+        assert sorted(index.containing(ip)) == expected
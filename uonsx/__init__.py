@@ -1,3 +1,3 @@
 from uonsx.config import NSXConfig
 from uonsx.nsx import NSX
-from uonsx.util import IPParser, IPAddress, IPNetwork, IP6Address, IP6Network
+from uonsx.util import IPParser, IPAddress, IPNetwork, IP6Address, IP6Network, IPRange, IPSet
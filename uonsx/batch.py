@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import copy
+from typing import TYPE_CHECKING
+
+from uonsx.http import HTTP
+
+if TYPE_CHECKING:
+    from uonsx.nsx import NSX
+    from uonsx.unit.group import NSXGroup
+    from uonsx.unit.policy import NSXPolicy
+    from uonsx.unit.rule import NSXRule
+    from uonsx.unit.service import NSXService
+
+
+class NSXBatch:
+    """
+    Collects group, service, policy and rule changes and submits them as one
+    hierarchical `PATCH /policy/api/v1/infra` request
+
+    While the batch is active (`with nsx.batch():`), `save()` on units and
+    `create()`/`delete()` on the group, service and policy managers stage their
+    change here instead of calling the API. Staging the same object again just
+    replaces its pending state, so adding 200 rules to a policy still sends
+    the policy once. Nothing is sent if the block raises.
+
+    The manager caches pick up staged creates and deletes right away, so later
+    steps in the block can find them, but their snapshots are only written once
+    the batch is committed. If the block raises or the commit fails, the caches
+    of every manager the batch touched are thrown away and reloaded.
+
+    Staged objects are copies, changes made to a unit after staging it only
+    reach the batch by staging it again.
+    """
+
+    def __init__(self, http: HTTP, nsx: NSX = None):
+        self.http = http
+        self.nsx = nsx
+        self.debug = http.debug
+        # keyed by id, later changes to the same object replace earlier ones
+        self._groups = {}
+        self._policies = {}
+        self._services = {}
+        self._rules = {}  # policy id -> {rule id: rule data}
+        self._deleted_rules = {}  # policy id -> {rule id: rule data}
+
+    def __enter__(self) -> NSXBatch:
+        self.http.begin_batch(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.http.end_batch(self)
+        if exc_type is None:
+            self.commit()
+        else:
+            self._discard(self._touched_managers())
+            self._clear()
+        return False
+
+    def __len__(self) -> int:
+        return (
+            len(self._groups)
+            + len(self._policies)
+            + len(self._services)
+            + sum(len(r) for r in self._rules.values())
+            + sum(len(r) for r in self._deleted_rules.values())
+        )
+
+    def _group_path(self, id: str) -> str:
+        return f"/infra/domains/{self.http.domain_id}/groups/{id}"
+
+    def _policy_path(self, id: str) -> str:
+        return f"/infra/domains/{self.http.domain_id}/security-policies/{id}"
+
+    def _staged(self, data: dict, path: str = None) -> dict:
+        # the unit may be a cached one, copy it instead of writing into it
+        data = copy.deepcopy(dict(data))
+        if path is not None:
+            data.setdefault("path", path)
+        return data
+
+    def add_group(self, group: NSXGroup, delete: bool = False) -> None:
+        data = self._staged(group.dump(), self._group_path(group.id()))
+        self._groups[group.id()] = (data, delete)
+
+    def add_service(self, service: NSXService, delete: bool = False) -> None:
+        data = self._staged(service.dump(), f"/infra/services/{service.id()}")
+        self._services[service.id()] = (data, delete)
+
+    def add_policy(self, policy: NSXPolicy, delete: bool = False) -> None:
+        data = self._staged(policy.dump(), self._policy_path(policy.id()))
+        self._policies[policy.id()] = (data, delete)
+
+    def add_rule(self, policy: NSXPolicy, rule: NSXRule) -> None:
+        """Stages one rule without sending the rest of its policy"""
+        self._rules.setdefault(policy.id(), {})[rule.id()] = self._staged(rule.dump())
+
+    def delete_rule(self, policy: NSXPolicy, rule: NSXRule) -> None:
+        self._rules.get(policy.id(), {}).pop(rule.id(), None)
+        self._deleted_rules.setdefault(policy.id(), {})[rule.id()] = self._staged(rule.dump())
+
+    def _child(self, resource_type: str, data: dict, delete: bool) -> dict:
+        data = dict(data, resource_type=resource_type)
+        child = {"resource_type": f"Child{resource_type}", resource_type: data}
+        if delete:
+            child["marked_for_delete"] = True
+        return child
+
+    def _rule_children(self, policy_id: str) -> list[dict]:
+        rules = {r["id"]: r for r in self._rules_of(policy_id)}
+        rules.update(self._rules.get(policy_id, {}))
+        children = [self._child("Rule", r, False) for r in rules.values()]
+        children += [
+            self._child("Rule", r, True)
+            for r in self._deleted_rules.get(policy_id, {}).values()
+        ]
+        return children
+
+    def _policy_child(self, policy_id: str) -> dict:
+        children = self._rule_children(policy_id)
+        if policy_id not in self._policies:
+            # only rules changed, reference the policy without touching it
+            return {
+                "resource_type": "ChildResourceReference",
+                "id": policy_id,
+                "target_type": "SecurityPolicy",
+                "children": children,
+            }
+        data, delete = self._policies[policy_id]
+        data = {k: v for k, v in data.items() if k not in ["rules", "rule_count"]}
+        if children:
+            data["children"] = children
+        return self._child("SecurityPolicy", data, delete)
+
+    def _rules_of(self, policy_id: str) -> list[dict]:
+        staged = self._policies.get(policy_id)
+        if not staged:
+            return []
+        return staged[0].get("rules") or []
+
+    def body(self) -> dict:
+        """Returns the hierarchical Infra object for everything staged"""
+        domain_children = [self._child("Group", d, delete) for d, delete in self._groups.values()]
+        policy_ids = list(self._policies)
+        for p in list(self._rules) + list(self._deleted_rules):
+            if p not in policy_ids:
+                policy_ids.append(p)
+        for policy_id in policy_ids:
+            domain_children.append(self._policy_child(policy_id))
+
+        children = [self._child("Service", d, delete) for d, delete in self._services.values()]
+        if domain_children:
+            children.append(
+                {
+                    "resource_type": "ChildResourceReference",
+                    "id": self.http.domain_id,
+                    "target_type": "Domain",
+                    "children": domain_children,
+                }
+            )
+        return {"resource_type": "Infra", "children": children}
+
+    def commit(self) -> dict:
+        """Sends every staged change in one request and clears the batch"""
+        if not len(self):
+            return {}
+        self.debug.print(1, f"committing batch of {len(self)} changes")
+        body = self.body()
+        touched = self._touched_managers()
+        self._clear()
+        try:
+            resp = self.http.request(method="PATCH", endpoint="/policy/api/v1/infra", data=body)
+        except Exception:
+            self._discard(touched)
+            raise
+        for manager in touched:
+            manager.flush_snapshot()
+            # pick up the new revisions on the next delta refresh
+            manager._set_refresh()
+        return resp
+
+    def _clear(self) -> None:
+        self._groups, self._policies, self._services = {}, {}, {}
+        self._rules, self._deleted_rules = {}, {}
+
+    def _discard(self, managers: list) -> None:
+        """Creates and deletes were already applied to these caches, reload them in full"""
+        for manager in managers:
+            manager._delta.invalidate()
+            manager._snapshot_dirty = False
+            manager._snapshot.clear()
+            manager._set_refresh()
+
+    def _touched_managers(self) -> list:
+        from uonsx.nsx import NSX
+
+        nsx = self.nsx or NSX.current()
+        touched = []
+        if self._groups:
+            touched.append(nsx.group)
+        if self._policies or self._rules or self._deleted_rules:
+            touched.append(nsx.policy)
+        if self._services:
+            touched.append(nsx.service)
+        return touched
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import time
+from typing import Union
+
+from uonsx.config import NSXConfig
+from uonsx.manager.record import NSXRecord
+
+SNAPSHOT_VERSION = 1
+
+
+def _safe_name(s: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", s)
+
+
+def _loaded(data: dict) -> dict:
+    # serializing a compact record would fetch every full document
+    return data.loaded() if isinstance(data, NSXRecord) else data
+
+
+class NSXSnapshotCache:
+    """
+    Compact on-disk copy of one manager's inventory, keyed by server and domain
+
+    Snapshots older than `cache_ttl` seconds are ignored, anything younger is
+    loaded as-is and revalidated against NSX by the owning manager.
+    """
+
+    def __init__(self, cfg: NSXConfig, kind: str):
+        self.debug = cfg.debug
+        self.enabled = cfg.cache
+        self.refresh = cfg.cache_refresh
+        self.ttl = cfg.cache_ttl
+        self.kind = kind
+        self.key = f"{cfg.server}/{cfg.domain_id}"
+        self.directory = os.path.join(
+            cfg.cache_dir, f"{_safe_name(cfg.server)}_{_safe_name(cfg.domain_id)}"
+        )
+        self.path = os.path.join(self.directory, f"{kind}.json")
+
+    def available(self) -> bool:
+        """True if load() may find a snapshot, without reading it"""
+        return self.enabled and not self.refresh and os.path.exists(self.path)
+
+    def load(self) -> Union[dict, None]:
+        """Returns the snapshot if it exists, belongs to this server and is fresh enough"""
+        if not self.enabled or self.refresh:
+            return None
+        try:
+            with open(self.path, "r") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if snapshot.get("version") != SNAPSHOT_VERSION or snapshot.get("key") != self.key:
+            return None
+        age = time.time() - snapshot.get("saved_at", 0)
+        if age > self.ttl:
+            self.debug.print(2, f"snapshot expired: {self.kind}")
+            return None
+        self.debug.print(1, f"loaded snapshot: {self.kind} ({int(age)}s old)")
+        return snapshot
+
+    def save(self, units: list, last_modified_time: Union[int, None]) -> None:
+        if not self.enabled:
+            return
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "key": self.key,
+            "saved_at": time.time(),
+            "last_modified_time": last_modified_time,
+            "items": [_loaded(u.dump()) for u in units],
+        }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+            # readers never see a half-written snapshot
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self.debug.print(1, f"failed to save snapshot: {self.kind}: {e}")
+            return
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
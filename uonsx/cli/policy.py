@@ -205,24 +205,25 @@ def clone(ctx, policy_name, description, source_policy):
         click.echo(f"Destination group not found: '{policy_name}'")
         exit()
 
-    np = nsx.policy.create(
-        name=policy_name,
-        description=description,
-        destination_group=policy_name,
-        category=sp.category(),
-    )
-    click.echo(f"Successfully created policy: '{policy_name}'")
-
-    for rule in sp.rules():
-        np.add_rule(
-            name=rule.name(),
-            source_group=rule.source_groups(),
-            destination_group=dg,
-            action=rule.action(),
-            service=rule.services_str(),
+    # the new policy and all of its rules go to NSX in one request
+    with nsx.batch():
+        np = nsx.policy.create(
+            name=policy_name,
+            description=description,
+            destination_group=policy_name,
+            category=sp.category(),
         )
-        click.echo(f"Successfully added rule: '{rule.name()}'")
 
+        for rule in sp.rules():
+            np.add_rule(
+                name=rule.name(),
+                source_group=rule.source_groups(),
+                destination_group=dg,
+                action=rule.action(),
+                service=rule.services_str(),
+            )
+    click.echo(f"Successfully created policy: '{policy_name}'")
+    click.echo(f"Successfully added {len(sp.rules())} rules")
     click.echo(f"Successfully cloned policy: '{policy_name}'")
 
 
@@ -305,14 +306,9 @@ def add_rule(
         exit()
 
     # Validate before/after
-    sequence_number = None
     if before and after:
         click.echo(f"use only one of: --before, --after")
         exit()
-    if before:
-        sequence_number = policy._get_sequence_number_before_handle(before)
-    if after:
-        sequence_number = policy._get_sequence_number_after_handle(after)
 
     # Validate Source Group
     try:
@@ -359,8 +355,9 @@ def add_rule(
             destination_group=v_destination_groups,
             action=v_action,
             service=v_services,
-            sequence_number=sequence_number,
             logged=logged,
+            before=before,
+            after=after,
         )
         click.echo(f"Successfully added rule: '{rule_name}'")
 
@@ -24,6 +24,9 @@ def setup(
     cli_debug_level,
     cli_enforce_convention,
     cli_require_ipaddress_for_groups,
+    cli_prefetch=False,
+    cli_no_cache=False,
+    cli_refresh=False,
 ) -> uonsx.NSX:
     cfg = uonsx.NSXConfig(
         server=cli_server,
@@ -42,6 +45,22 @@ def setup(
         debug_level=cfg.debug_level,
         enforce_convention=cfg.rules.enforce_convention,
         require_ipaddress_for_groups=cfg.rules.require_ipaddress_for_groups,
+        page_size=cfg.page_size,
+        pool_size=cfg.pool_size,
+        max_retries=cfg.max_retries,
+        keep_alive=cfg.keep_alive,
+        auth_method=cfg.auth_method,
+        full_reload_interval=cfg.full_reload_interval,
+        cache=cfg.cache and not cli_no_cache,
+        cache_ttl=cfg.cache_ttl,
+        cache_dir=cfg.cache_dir,
+        cache_refresh=cli_refresh,
+        json_codec=cfg.json_codec,
+        retry_post=cfg.retry_post,
+        rate_limit=cfg.rate_limit,
+        rate_burst=cfg.rate_burst,
+        max_concurrency=cfg.max_concurrency,
+        prefetch=cli_prefetch,
     )
     return nsx
 
@@ -65,6 +84,25 @@ def setup(
     is_flag=True,
     help="Require an IP address when creating groups",
 )
+@click.option(
+    "--prefetch",
+    is_flag=True,
+    default=False,
+    help="Load all NSX inventories in parallel before running the command",
+)
+@click.option(
+    "--no-cache",
+    "no_cache",
+    is_flag=True,
+    default=False,
+    help="Don't read or write the on-disk inventory snapshots",
+)
+@click.option(
+    "--refresh",
+    is_flag=True,
+    default=False,
+    help="Ignore the on-disk inventory snapshots and rebuild them from NSX",
+)
 @click.pass_context
 def cli(
     ctx,
@@ -76,13 +114,16 @@ def cli(
     debug_level,
     enforce_convention,
     require_ipaddress_for_groups,
+    prefetch,
+    no_cache,
+    refresh,
 ):
     ctx.ensure_object(dict)
     ctx.allow_extra_args = True
     ctx.ignore_unknown_options = True
     if password_prompt:
         password = getpass.getpass("nsx password: ")
-    ctx.obj["nsx"] = setup(
+    nsx = setup(
         cli_server=server,
         cli_username=username,
         cli_password=password,
@@ -90,7 +131,13 @@ def cli(
         cli_debug_level=debug_level,
         cli_enforce_convention=enforce_convention,
         cli_require_ipaddress_for_groups=require_ipaddress_for_groups,
+        cli_prefetch=prefetch,
+        cli_no_cache=no_cache,
+        cli_refresh=refresh,
     )
+    ctx.obj["nsx"] = nsx
+    # end the API session when the command is done, even if it failed
+    ctx.call_on_close(nsx.close)
 
 
 @cli.group()
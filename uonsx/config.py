@@ -2,13 +2,15 @@ from __future__ import annotations
 
 import configparser
 import json
-import yaml
 import os
 from typing import Union
 import getpass
 
 from uonsx.debug import Debug
-from uonsx.error import NSXMissingConfigurationItemError
+from uonsx.error import (
+    NSXInvalidConfigurationError,
+    NSXMissingConfigurationItemError,
+)
 from uonsx.util import strfmt
 
 
@@ -58,8 +60,38 @@ class NSXConfig:
         enforce_convention: bool = None,
         require_ipaddress_for_groups: bool = None,
         mock: bool = False,
+        page_size: int = None,
+        pool_size: int = None,
+        max_retries: int = None,
+        keep_alive: bool = None,
+        auth_method: str = None,
+        full_reload_interval: int = None,
+        cache: bool = None,
+        cache_ttl: int = None,
+        cache_dir: str = None,
+        cache_refresh: bool = False,
+        json_codec: str = None,
+        retry_post: bool = None,
+        rate_limit: float = None,
+        rate_burst: int = None,
+        max_concurrency: int = None,
     ):
         self.mock = mock
+        self.page_size = page_size
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.keep_alive = keep_alive
+        self.auth_method = auth_method
+        self.full_reload_interval = full_reload_interval
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self.cache_dir = cache_dir
+        self.cache_refresh = cache_refresh
+        self.json_codec = json_codec
+        self.retry_post = retry_post
+        self.rate_limit = rate_limit
+        self.rate_burst = rate_burst
+        self.max_concurrency = max_concurrency
         self.debug_level = debug_level
         self.enforce_convention = enforce_convention
         self.require_ipaddress_for_groups = require_ipaddress_for_groups
@@ -102,6 +134,8 @@ class NSXConfig:
         env_username = os.getenv("NSX_USERNAME")
         env_password = os.getenv("NSX_PASSWORD")
 
+        import yaml
+
         with open(config_path, "r") as f:
             config = yaml.safe_load(f)
 
@@ -164,6 +198,75 @@ class NSXConfig:
             )
         )
 
+        # HTTP settings
+        self.page_size = int(
+            _merge_arg("page_size", [self.page_size, config.get("page_size"), 1000])
+        )
+        self.pool_size = int(
+            _merge_arg("pool_size", [self.pool_size, config.get("pool_size"), 10])
+        )
+        self.max_retries = int(
+            _merge_arg("max_retries", [self.max_retries, config.get("max_retries"), 3])
+        )
+        self.keep_alive = bool(
+            _merge_arg("keep_alive", [self.keep_alive, config.get("keep_alive"), True])
+        )
+        self.auth_method = str(
+            _merge_arg(
+                "auth_method", [self.auth_method, config.get("auth_method"), "session"]
+            )
+        )
+        self.full_reload_interval = int(
+            _merge_arg(
+                "full_reload_interval",
+                [self.full_reload_interval, config.get("full_reload_interval"), 300],
+            )
+        )
+        # Snapshot cache settings
+        self.cache = bool(_merge_arg("cache", [self.cache, config.get("cache"), False]))
+        self.cache_ttl = int(
+            _merge_arg("cache_ttl", [self.cache_ttl, config.get("cache_ttl"), 3600])
+        )
+        self.cache_dir = os.path.expanduser(
+            str(
+                _merge_arg(
+                    "cache_dir",
+                    [
+                        self.cache_dir,
+                        config.get("cache_dir"),
+                        os.path.join(os.path.expanduser("~"), ".uonsx", "cache"),
+                    ],
+                )
+            )
+        )
+
+        self.json_codec = str(
+            _merge_arg("json_codec", [self.json_codec, config.get("json_codec"), "auto"])
+        )
+        self.retry_post = bool(
+            _merge_arg("retry_post", [self.retry_post, config.get("retry_post"), False])
+        )
+        # NSX Manager's default per-user limit is 100 requests per second, 0 disables
+        self.rate_limit = float(
+            _merge_arg("rate_limit", [self.rate_limit, config.get("rate_limit"), 90])
+        )
+        # 0 lets the bucket burst up to one second's worth of requests
+        self.rate_burst = int(
+            _merge_arg("rate_burst", [self.rate_burst, config.get("rate_burst"), 0])
+        )
+        # more requests in flight than pooled connections would only open throwaway ones
+        self.max_concurrency = int(
+            _merge_arg(
+                "max_concurrency",
+                [self.max_concurrency, config.get("max_concurrency"), self.pool_size],
+            )
+        )
+        valid_auth_methods = ["session", "basic"]
+        if self.auth_method not in valid_auth_methods:
+            raise NSXInvalidConfigurationError(
+                f"auth_method '{self.auth_method}' not in valid auth methods: {valid_auth_methods}"
+            )
+
         self.base_url = f"https://{self.server}"
         self.debug = Debug(int(self.debug_level))
         self.auth = (self.username, self.password)
@@ -209,6 +312,8 @@ class NSXConfig:
         return None
 
     def generate_new_config(self) -> None:
+        import yaml
+
         path = self.valid_config_paths[0]
 
         config = {}
@@ -254,6 +359,18 @@ class NSXConfig:
 
         config["enforce_convention"] = True
         config["debug_level"] = 0
+        config["page_size"] = 1000
+        config["pool_size"] = 10
+        config["max_retries"] = 3
+        config["keep_alive"] = True
+        config["auth_method"] = "session"
+        config["full_reload_interval"] = 300
+        config["json_codec"] = "auto"
+        config["retry_post"] = False
+        config["rate_limit"] = 90
+        config["max_concurrency"] = 10
+        config["cache"] = True
+        config["cache_ttl"] = 3600
 
         config["audit"] = {
             "prefixes": default_valid_prefixes,
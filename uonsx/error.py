@@ -1,6 +1,9 @@
 from __future__ import annotations
 
-import requests
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import requests
 
 
 class NSXGenericError(Exception):
@@ -13,6 +16,11 @@ class NSXGenericError(Exception):
 #         super().__init__(msg)
 
 
+class NSXAuthenticationError(Exception):
+    def __init__(self, msg: str = "failed to authenticate to nsx"):
+        super().__init__(msg)
+
+
 class NSXInvalidConfigurationError(Exception):
     def __init__(
         self,
@@ -26,6 +34,11 @@ class NSXGroupNotFoundError(Exception):
         msg = f"group not found: {name}"
         super().__init__(msg)
 
+class NSXDuplicateNameError(Exception):
+    def __init__(self, name: str, ids: list[str]):
+        msg = f"multiple objects found with display name '{name}': {ids}"
+        super().__init__(msg)
+
 class NSXTagNotFoundError(Exception):
     def __init__(self, key: str, value: str):
         msg = f"tag not found: {key}:{value}"
@@ -247,6 +260,18 @@ class NSXPolicyAlreadyExistsError(Exception):
         super().__init__(message)
 
 
+class NSXPolicySequenceNumberInUseError(Exception):
+    """Raised when the user tries to create a policy with a sequence number another policy holds"""
+
+    def __init__(
+        self,
+        sequence_number: int,
+        category: str,
+    ):
+        message = f"sequence number {sequence_number} is already used by a policy in category '{category}'"
+        super().__init__(message)
+
+
 class NSXGroupAlreadyExistsError(Exception):
     """Raised when the user tries to create a group that already exists"""
 
@@ -314,6 +339,18 @@ class NSXHTTPError(Exception):
         response text:
         {response.text}
         """
+        self.status_code = response.status_code
+        super().__init__(message)
+
+
+class NSXRateLimitError(Exception):
+    """Raised when NSX keeps answering 429 Too Many Requests after all retries"""
+
+    def __init__(
+        self,
+        response: requests.Response,
+    ):
+        message = f"rate limited by nsx: retry_after={response.headers.get('Retry-After')}, response.text={response.text}"
         super().__init__(message)
 
 
@@ -1,25 +1,104 @@
 from __future__ import annotations
 
 import json
-from typing import Union
-
-import requests
-import urllib3
-
-urllib3.disable_warnings()
+import threading
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Iterator, Union
+from urllib.parse import urlencode
 
 from uonsx.config import NSXConfig
 from uonsx.error import (
+    NSXAuthenticationError,
+    NSXGenericError,
     NSXHTTPError,
+    NSXInvalidConfigurationError,
     NSXHTTPUnhandledResponseError,
     NSXObjectAlreadyExistsError,
     NSXObjectHasDependenciesError,
     NSXObjectNotFoundError,
+    NSXRateLimitError,
 )
+from uonsx.throttle import NSXConcurrencyLimiter, NSXRetryPolicy, NSXTokenBucket
+
+if TYPE_CHECKING:
+    import requests
+
+
+class JSONCodec:
+    """
+    Encodes request bodies and decodes response bodies using the stdlib json module
+
+    Bodies stay as bytes on both sides, so responses are never decoded to a str first.
+    """
+
+    name = "json"
+
+    def dumps(self, obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data: Union[bytes, str]):
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+
+    def dumps(self, obj) -> bytes:
+        return self._orjson.dumps(obj)
+
+    def loads(self, data: Union[bytes, str]):
+        return self._orjson.loads(data)
+
+
+class UjsonCodec(JSONCodec):
+    name = "ujson"
+
+    def __init__(self):
+        import ujson
+
+        self._ujson = ujson
+
+    def dumps(self, obj) -> bytes:
+        return self._ujson.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+    def loads(self, data: Union[bytes, str]):
+        return self._ujson.loads(data)
+
+
+# fastest first, "auto" picks the first one that imports
+json_codecs = {
+    "orjson": OrjsonCodec,
+    "ujson": UjsonCodec,
+    "json": JSONCodec,
+}
+
+
+def get_json_codec(name: str = "auto") -> JSONCodec:
+    """Returns the named codec, or the fastest one installed for `auto`"""
+    if name == "auto":
+        for codec in json_codecs.values():
+            try:
+                return codec()
+            except ImportError:
+                continue
+    if name not in json_codecs:
+        raise NSXInvalidConfigurationError(
+            f"json_codec '{name}' not in valid codecs: {['auto'] + list(json_codecs)}"
+        )
+    try:
+        return json_codecs[name]()
+    except ImportError:
+        raise NSXInvalidConfigurationError(f"json_codec '{name}' is not installed")
 
 
 class HTTP:
 
+    # the most recently created handler, each NSX object owns its own
     __instance = None
 
     @staticmethod
@@ -29,17 +108,176 @@ class HTTP:
         return HTTP.__instance
 
     def __init__(self, cfg: NSXConfig):
-        if HTTP.__instance != None:
-            raise Exception("use the get_instance() method to use the HTTP handler")
         self.base_url = cfg.base_url
         self.headers = {"Content-Type": "application/json"}
         self.auth = cfg.auth
+        self.auth_method = cfg.auth_method
+        self._xsrf_token = None
+        self._login_lock = threading.Lock()
         self.domain_id = cfg.domain_id
         self.debug = cfg.debug
         self.base_endpoint = self._base_endpoint()
         self.mock = cfg.mock
+        self.page_size = cfg.page_size
+        self.retry = NSXRetryPolicy(
+            max_retries=cfg.max_retries, retry_post=cfg.retry_post
+        )
+        self.rate_limiter = NSXTokenBucket(rate=cfg.rate_limit, burst=cfg.rate_burst)
+        # shared by every manager and tool, so fanning out work in threads
+        # can't push more requests at NSX than it is currently handling well
+        self.concurrency = NSXConcurrencyLimiter(max_limit=cfg.max_concurrency)
+        self._sleep = time.sleep
+        self._async_client = None
+        self._async_lock = threading.Lock()
+        # batches are per thread, so a worker thread's writes never end up in
+        # a batch opened by another
+        self._batch = threading.local()
+        self.codec = get_json_codec(cfg.json_codec)
+        self.debug.print(2, f"using json codec: {self.codec.name}")
+        self.session = self._build_session(cfg)
         HTTP.__instance = self
 
+    def _build_session(self, cfg: NSXConfig) -> requests.Session:
+        """
+        Returns a long-lived session so connections (and their TLS handshakes)
+        are reused across requests instead of being rebuilt for every call
+        """
+        self.debug.print(
+            2,
+            f"building session: pool_size={cfg.pool_size}, max_retries={cfg.max_retries}, keep_alive={cfg.keep_alive}",
+        )
+        # requests is only imported once we actually talk to NSX
+        import requests
+        import urllib3
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        urllib3.disable_warnings()
+
+        session = requests.Session()
+        session.verify = False
+        session.headers.update(self.headers)
+        if not cfg.keep_alive:
+            session.headers["Connection"] = "close"
+        # only connection-level failures are retried here, the NSX responses
+        # themselves are always handed back to _parse_response
+        retries = Retry(
+            total=cfg.max_retries,
+            backoff_factor=0.5,
+            status=0,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=cfg.pool_size,
+            pool_maxsize=cfg.pool_size,
+            max_retries=retries,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def pool_stats(self) -> dict:
+        """
+        Returns connection pool statistics for the session
+
+        `reuse_rate` is the fraction of requests that were sent over an
+        already-open connection instead of a new one.
+        """
+        connections = 0
+        requests_sent = 0
+        pools = 0
+        for adapter in self.session.adapters.values():
+            container = adapter.poolmanager.pools
+            for key in container.keys():
+                pool = container[key]
+                pools += 1
+                connections += pool.num_connections
+                requests_sent += pool.num_requests
+        reused = max(requests_sent - connections, 0)
+        return {
+            "pools": pools,
+            "connections": connections,
+            "requests": requests_sent,
+            "reused": reused,
+            "reuse_rate": reused / requests_sent if requests_sent else 0.0,
+        }
+
+    def concurrency_stats(self) -> dict:
+        """Returns the current concurrency window, in-flight count, latency and 429 rate"""
+        return self.concurrency.stats()
+
+    def begin_batch(self, batch) -> None:
+        if self.active_batch() is not None:
+            raise NSXGenericError("a batch is already active on this thread")
+        self._batch.active = batch
+
+    def end_batch(self, batch) -> None:
+        if self.active_batch() is batch:
+            self._batch.active = None
+
+    def active_batch(self):
+        """Returns the NSXBatch collecting writes on this thread, if there is one"""
+        return getattr(self._batch, "active", None)
+
+    def async_client(self) -> AsyncHTTP:
+        """Returns the AsyncHTTP that shares this client's session, retries and limiters"""
+        with self._async_lock:
+            if self._async_client is None:
+                self._async_client = AsyncHTTP(self)
+            return self._async_client
+
+    def close(self) -> None:
+        """Closes every pooled connection held by the session"""
+        if self._async_client is not None:
+            self._async_client.close()
+        self.logout()
+        self.session.close()
+
+    def _uses_session_auth(self) -> bool:
+        return self.auth_method == "session"
+
+    def login(self, stale_token: str = None) -> None:
+        """
+        Create an NSX API session and store its cookie and XSRF token on the session
+
+        If `stale_token` is given and another thread already replaced it,
+        the existing session is reused instead of logging in again.
+        """
+        with self._login_lock:
+            if self._xsrf_token and self._xsrf_token != stale_token:
+                return
+            self.debug.print(1, "creating api session")
+            url = self._build_url("api/session/create")
+            resp = self.session.post(
+                url,
+                data={"j_username": self.auth[0], "j_password": self.auth[1]},
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+            )
+            token = resp.headers.get("X-XSRF-TOKEN")
+            if resp.status_code != 200 or not token:
+                raise NSXAuthenticationError(
+                    f"failed to create api session: response.status_code={resp.status_code}"
+                )
+            self.session.headers["X-XSRF-TOKEN"] = token
+            self._xsrf_token = token
+            self.debug.print(2, "api session created")
+
+    def logout(self) -> None:
+        """Destroy the NSX API session, if one was created"""
+        with self._login_lock:
+            if not self._xsrf_token:
+                return
+            self.debug.print(1, "destroying api session")
+            from requests import RequestException
+
+            try:
+                self.session.post(self._build_url("api/session/destroy"))
+            except RequestException:
+                pass
+            self.session.headers.pop("X-XSRF-TOKEN", None)
+            self.session.cookies.clear()
+            self._xsrf_token = None
+
     def _validate_method(self, method: str):
         valid_methods = ["GET", "POST", "PUT", "PATCH", "DELETE"]
         if method.upper() not in valid_methods:
@@ -56,16 +294,27 @@ class HTTP:
         self.debug.print(2, f"url={url}")
         return url
 
-    def _cleanse_data(self, data: Union[str, dict] = None) -> Union[str, None]:
-        if isinstance(data, dict):
-            return json.dumps(data)
+    def _add_query(self, endpoint: str, params: dict) -> str:
+        """Appends query parameters to an endpoint that may already have some"""
+        separator = "&" if "?" in endpoint else "?"
+        return f"{endpoint}{separator}{urlencode(params)}"
+
+    def _cleanse_data(
+        self, data: Union[str, bytes, dict, list] = None
+    ) -> Union[str, bytes, None]:
+        if isinstance(data, (dict, list)):
+            return self.codec.dumps(data)
         self.debug.print(3, f"data={data}")
         return data
 
     def _parse_response(self, response: requests.Response) -> dict:
         self.debug.print(1, f"response.status_code={response.status_code}")
+        if response.status_code == 429:
+            raise NSXRateLimitError(response)
+        if str(response.status_code).startswith("5"):
+            raise NSXHTTPError(response)
         if str(response.status_code).startswith("4"):
-            r = json.loads(response.text)
+            r = self.codec.loads(response.content)
             if "may not have been realized on enforcement point" in r["error_message"]:
                 raise NSXObjectNotFoundError(r["error_message"])
             if "as it already exists" in r["error_message"]:
@@ -85,10 +334,11 @@ class HTTP:
                 ):
                     raise NSXObjectNotFoundError(r["error_message"])
             raise NSXHTTPError(response)
-        if response.text:
-            self.debug.print(4, f"{response.text}")
-            return json.loads(response.text)
-        if str(response.status_code).startswith("2") and not response.text:
+        if response.content:
+            if self.debug.debug_level >= 4:
+                self.debug.print(4, f"{response.text}")
+            return self.codec.loads(response.content)
+        if str(response.status_code).startswith("2") and not response.content:
             return {"status": "success"}
         raise NSXHTTPUnhandledResponseError(response)
 
@@ -110,20 +360,20 @@ class HTTP:
     def _method_switch(self, method: str):
         self.debug.print(1, f"http method: {method}")
         if method == "GET":
-            return requests.get
+            return self.session.get
         if method == "POST":
-            return requests.post
+            return self.session.post
         if method == "PUT":
-            return requests.put
+            return self.session.put
         if method == "PATCH":
-            return requests.patch
+            return self.session.patch
         if method == "DELETE":
-            return requests.delete
+            return self.session.delete
 
     def _make_request(
         self, f, url: str, headers: dict, auth: tuple[str, str], data: str = None
     ):
-        return f(url, headers=headers, auth=auth, data=data, verify=False)
+        return f(url, headers=headers, auth=auth, data=data)
 
     def request(
         self, method: str, endpoint: str, data: Union[dict, str, None] = None
@@ -144,8 +394,166 @@ class HTTP:
         if self.mock:
             return {}
 
+        attempt = 0
+        while True:
+            resp = self._send_limited(func, url=url, data=data)
+            delay = self.retry.delay(method, resp.status_code, resp.headers, attempt)
+            if delay is None:
+                break
+            attempt += 1
+            self.debug.print(
+                1,
+                f"{method} {endpoint} returned {resp.status_code}, retry {attempt}/{self.retry.max_retries} in {delay:.2f}s",
+            )
+            self._sleep(delay)
+
+        return self._parse_response(resp)
+
+    def _send_limited(self, func, url: str, data: Union[str, bytes, None] = None):
+        """Sends one request inside a slot of the concurrency window"""
+        self.concurrency.acquire()
+        start = time.monotonic()
+        status_code = None
+        try:
+            resp = self._send(func, url=url, data=data)
+            status_code = resp.status_code
+            return resp
+        finally:
+            self.concurrency.release(time.monotonic() - start, status_code)
+
+    def _send(self, func, url: str, data: Union[str, bytes, None] = None):
+        """Sends one request through the rate limiter, handling authentication"""
+        self.rate_limiter.acquire()
+
+        if not self._uses_session_auth():
+            return self._make_request(
+                func, url=url, headers=self.headers, auth=self.auth, data=data
+            )
+
+        if not self._xsrf_token:
+            self.login()
+        token = self._xsrf_token
         resp = self._make_request(
-            func, url=url, headers=self.headers, auth=self.auth, data=data
+            func, url=url, headers=self.headers, auth=None, data=data
         )
+        if resp.status_code in [401, 403]:
+            # the session expired or was invalidated by the manager, log in again
+            # and replay the request once before treating it as a real error
+            self.debug.print(1, f"api session rejected ({resp.status_code}), logging in again")
+            self.login(stale_token=token)
+            self.rate_limiter.acquire()
+            resp = self._make_request(
+                func, url=url, headers=self.headers, auth=None, data=data
+            )
+        return resp
 
-        return self._parse_response(resp)
+    def paginate(self, endpoint: str, page_size: int = None) -> Iterator[dict]:
+        """
+        Perform GET requests against a list endpoint, following the `cursor` returned
+        by NSX, and yield each item of `results` as its page arrives
+        """
+        if not page_size:
+            page_size = self.page_size
+        cursor = None
+        while True:
+            params = {"page_size": page_size}
+            if cursor:
+                params["cursor"] = cursor
+            self.debug.print(2, f"requesting page: endpoint={endpoint}, cursor={cursor}")
+            resp = self.request(method="GET", endpoint=self._add_query(endpoint, params))
+            results = resp.get("results", [])
+            yield from results
+            next_cursor = resp.get("cursor")
+            # NSX omits the cursor on the last page, but guard against servers
+            # that echo the same cursor back or return an empty page with one
+            if not next_cursor or next_cursor == cursor or not results:
+                return
+            cursor = next_cursor
+
+    def search(self, query: str, page_size: int = None) -> Iterator[dict]:
+        """
+        Run a query against the Policy search API and yield each result as its page arrives
+        """
+        endpoint = self._add_query("/policy/api/v1/search/query", {"query": query})
+        self.debug.print(2, f"searching: query={query}")
+        yield from self.paginate(endpoint, page_size=page_size)
+
+
+class AsyncHTTP:
+    """
+    asyncio front end for HTTP with the same `request()` contract
+
+    Requests run on the blocking HTTP client in a thread pool sized to the
+    concurrency limit, so they share its pooled session, authentication,
+    retries and limiters. Callers can fan out thousands of calls with
+    `asyncio.gather` on one event loop without the loop ever blocking.
+    """
+
+    def __init__(self, http: HTTP, max_workers: int = None):
+        self.http = http
+        self.debug = http.debug
+        self.max_workers = max_workers or http.concurrency.max_limit
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="uonsx-http"
+                )
+            return self._executor
+
+    async def run(self, func: Callable, *args):
+        """Runs a blocking uonsx call on the request pool without blocking the event loop"""
+        import asyncio
+        import functools
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(), functools.partial(func, *args)
+        )
+
+    async def request(
+        self, method: str, endpoint: str, data: Union[dict, str, None] = None
+    ) -> dict:
+        """
+        Perform an http request of type `method` against a given endpoint and return a JSON dict
+        """
+        return await self.run(self.http.request, method, endpoint, data)
+
+    async def paginate(
+        self, endpoint: str, page_size: int = None
+    ) -> AsyncIterator[dict]:
+        """Async version of `HTTP.paginate`, yields each item of `results` as its page arrives"""
+        if not page_size:
+            page_size = self.http.page_size
+        cursor = None
+        while True:
+            params = {"page_size": page_size}
+            if cursor:
+                params["cursor"] = cursor
+            resp = await self.request(
+                method="GET", endpoint=self.http._add_query(endpoint, params)
+            )
+            results = resp.get("results", [])
+            for item in results:
+                yield item
+            next_cursor = resp.get("cursor")
+            if not next_cursor or next_cursor == cursor or not results:
+                return
+            cursor = next_cursor
+
+    async def search(self, query: str, page_size: int = None) -> AsyncIterator[dict]:
+        """Async version of `HTTP.search`"""
+        endpoint = self.http._add_query("/policy/api/v1/search/query", {"query": query})
+        async for item in self.paginate(endpoint, page_size=page_size):
+            yield item
+
+    def close(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
@@ -0,0 +1,511 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Generic, Iterable, Iterator, TypeVar, Union
+
+from uonsx.cache import NSXSnapshotCache
+from uonsx.config import NSXConfig
+from uonsx.error import NSXHTTPError, NSXObjectNotFoundError
+from uonsx.http import HTTP
+from uonsx.manager.delta import NSXDeltaTracker
+from uonsx.manager.index import NSXIndex
+from uonsx.manager.record import NSXRecord
+
+if TYPE_CHECKING:
+    from uonsx.nsx import NSX
+
+T = TypeVar("T")
+
+
+class NSXInventory(Generic[T]):
+    """
+    One published state of a manager's cache, the unit list and its index
+
+    It is never changed once published. Changes build a new inventory and
+    replace the manager's reference to it in one assignment, so a reader
+    holding an inventory always sees a list and index that agree.
+    """
+
+    __slots__ = ("data", "index")
+
+    def __init__(self, data: list[T], index: NSXIndex):
+        self.data = data
+        self.index = index
+
+
+class BaseManager(Generic[T]):
+    """
+    Cached inventory shared by the managers
+
+    Owns the unit list (`data`) and its indexes, when they are reloaded and the
+    hit/miss counters. Subclasses say what a unit is and how to load them all,
+    usually by setting `kind` and `unit` and implementing `iter_all()`.
+
+    The cache is reloaded when it was invalidated with `_set_refresh()` (or
+    `invalidate()`), or once it is older than `ttl` seconds.
+
+    While the cache is cold, `_lookup_name()` answers single-object lookups with
+    one search API query instead of loading the whole inventory, for managers
+    that set `resource_type`, and `_lookup_id()`/`_lookup_path()` GET the object
+    straight from its endpoint. Objects fetched that way are kept for `ttl`
+    seconds or until the inventory is loaded.
+
+    `project()` limits the inventory to some fields of each object, see there.
+
+    A manager belongs to one NSX object, `nsx`. It talks to NSX through that
+    object's HTTP handler and the units it builds are bound to it, so several
+    NSX objects in one process never share a cache or a connection.
+
+    It is safe to use from several threads. Readers never wait, `data` and
+    `_index` come from the current NSXInventory. Refreshes are single-flight:
+    when many threads find the cache stale, one reloads it and the others wait
+    for that reload instead of starting their own.
+    """
+
+    # name used in debug output and snapshot files
+    kind: str = ""
+    # class wrapping each raw object from the API
+    unit: Callable[..., T] = None
+    # search API resource_type of the units, empty if they can't be searched for
+    resource_type: str = ""
+    # fields the cache itself reads from every unit, always part of a projection
+    index_fields: list[str] = ["id", "display_name", "path"]
+
+    def __init__(self, cfg: NSXConfig, nsx: NSX = None):
+        self.cfg = cfg
+        self.debug = cfg.debug
+        self.nsx = nsx
+        self.http = nsx.http if nsx is not None else HTTP.get_instance()
+        self.ttl = cfg.full_reload_interval
+        self._inventory = NSXInventory([], self._new_index())
+        # id or path -> (unit, fetched at), objects fetched while the cache is cold
+        self._fetched = {}
+        self.fields = None
+        # reentrant, a failed snapshot check reloads from inside a refresh
+        self._lock = threading.RLock()
+        self._generation = 0
+        self._needs_refresh = True
+        self._loaded_at = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def data(self) -> list[T]:
+        """The cached units, treat the list and the units in it as read-only"""
+        return self._inventory.data
+
+    @property
+    def _index(self) -> NSXIndex:
+        return self._inventory.index
+
+    def _new_index(self, units: Iterable[T] = None) -> NSXIndex:
+        return NSXIndex(units)
+
+    def _unit(self, data: dict) -> T:
+        """
+        Wraps a raw object in this manager's unit class, bound to our NSX, keeping
+        only the projected fields if there is a projection
+        """
+        if self.fields is not None and not isinstance(data, NSXRecord):
+            data = NSXRecord.compact(data, self._projection(), self._full_document)
+        return self.unit(data, nsx=self.nsx)
+
+    def _projection(self) -> list[str]:
+        return list(dict.fromkeys(self.index_fields + list(self.fields)))
+
+    def project(self, fields: Union[list[str], None]) -> None:
+        """
+        Loads only `fields` of every object from now on, plus what the cache
+        needs to index them
+
+        NSX sends just those fields (`included_fields`), which cuts the size
+        of large inventories a lot. Units keep a compact record and fetch
+        their full document the first time another field is read or the unit
+        is changed. That is one request per unit, so project every field that
+        is read across the whole inventory. `None` loads full documents again.
+        """
+        self.fields = None if fields is None else list(fields)
+        self.invalidate()
+
+    def _full_document(self, record: NSXRecord) -> dict:
+        """Fetches the whole object a compact record was made from"""
+        return self.http.request(method="GET", endpoint=self._path_endpoint(dict.__getitem__(record, "path")))
+
+    def _path_endpoint(self, path: str) -> str:
+        return f"/policy/api/v1{path}"
+
+    def _manager(self, name: str):
+        """Returns another manager of the same NSX"""
+        if self.nsx is not None:
+            return getattr(self.nsx, name)
+        from uonsx.nsx import NSX
+
+        return NSX._build_manager(name)
+
+    def _paginate(self, endpoint: str) -> Iterator[T]:
+        if self.fields is not None:
+            endpoint = self.http._add_query(
+                endpoint, {"included_fields": ",".join(self._projection())}
+            )
+        for i in self.http.paginate(endpoint):
+            yield self._unit(i)
+
+    def iter_all(self) -> Iterator[T]:
+        raise NotImplementedError
+
+    def load_all(self) -> list[T]:
+        return list(self.iter_all())
+
+    def _load(self) -> list[T]:
+        """Fetches the whole inventory, managers with other loaders override this"""
+        return self.load_all()
+
+    def _set_refresh(self, flag: bool = True) -> None:
+        self._needs_refresh = flag
+
+    def invalidate(self) -> None:
+        """Reloads the cache the next time it is used"""
+        self._fetched = {}
+        self._set_refresh(True)
+
+    def _is_cold(self) -> bool:
+        """True until the inventory is first loaded"""
+        return self._loaded_at is None
+
+    def _accept(self, raw: dict) -> bool:
+        """Filters objects from the API the same way iter_all() does"""
+        return True
+
+    def _search_match(self, raw: dict) -> bool:
+        """Filters search API results down to what iter_all() would load"""
+        return self._accept(raw)
+
+    def _search_name(self, name: str) -> Union[T, None]:
+        """Finds the unit with the display name through the search API"""
+        escaped = name.replace("\\", "\\\\").replace('"', '\\"')
+        query = f'resource_type:{self.resource_type} AND display_name:"{escaped}"'
+        self.debug.print(1, f"searching: {self.kind}: {name}")
+        # the query is tokenized, so keep exact matches only
+        units = [
+            self._unit(i)
+            for i in self.http.search(query)
+            if i.get("display_name") == name and self._search_match(i)
+        ]
+        return self._new_index(units).name(name)
+
+    def _lookup_name(self, name: str) -> Union[T, None]:
+        """
+        Returns the unit with the display name, or None
+
+        A cold cache is not loaded for this, the unit is searched for instead.
+        Nothing found falls back to the full inventory, the search index can
+        lag behind objects that were just created.
+        """
+        if self.resource_type and self._is_cold():
+            unit = self._search_name(name)
+            if unit:
+                return unit
+        self._refresh_data()
+        return self._index.name(name)
+
+    def _fetch(self, endpoint: str) -> Union[T, None]:
+        """GETs a single object, None if NSX doesn't have it"""
+        try:
+            data = self.http.request(method="GET", endpoint=endpoint)
+        except NSXObjectNotFoundError:
+            return None
+        except NSXHTTPError as e:
+            if e.status_code == 404:
+                return None
+            raise
+        if not data or not self._accept(data):
+            return None
+        # a whole document, no need to make it compact
+        return self.unit(data, nsx=self.nsx)
+
+    def _fetch_cold(self, key: str, endpoint: str) -> Union[T, None]:
+        cached = self._fetched.get(key)
+        if cached and not (self.ttl and time.monotonic() - cached[1] >= self.ttl):
+            self.hits += 1
+            return cached[0]
+        self.debug.print(1, f"fetching: {self.kind}: {key}")
+        unit = self._fetch(endpoint)
+        if unit:
+            self._fetched[key] = (unit, time.monotonic())
+        return unit
+
+    def _lookup_id(self, id: str, endpoint: str) -> Union[T, None]:
+        """
+        Returns the unit with the id, or None
+
+        A cold cache is not loaded for this, the object is fetched from `endpoint`.
+        """
+        if self._is_cold():
+            return self._fetch_cold(id, endpoint)
+        self._refresh_data()
+        return self._index.id(id)
+
+    def _lookup_path(self, path: str, endpoint: str) -> Union[T, None]:
+        """Same as `_lookup_id()` for a policy path"""
+        if self._is_cold():
+            return self._fetch_cold(path, endpoint)
+        self._refresh_data()
+        return self._index.path(path)
+
+    def _is_stale(self) -> bool:
+        if self._needs_refresh or self._loaded_at is None:
+            return True
+        if not self.ttl:
+            return False
+        return time.monotonic() - self._loaded_at >= self.ttl
+
+    def _refresh_data(self, force: bool = False) -> None:
+        if not (force or self._is_stale()):
+            self.hits += 1
+            return
+        generation = self._generation
+        with self._lock:
+            if self._generation != generation:
+                # another thread refreshed while we waited for the lock
+                self.hits += 1
+                return
+            if not (force or self._is_stale()):
+                self.hits += 1
+                return
+            self.misses += 1
+            self._needs_refresh = False
+            try:
+                self._reload(force)
+            except Exception:
+                self._needs_refresh = True
+                raise
+            self._loaded_at = time.monotonic()
+            self._generation += 1
+
+    def _reload(self, force: bool = False) -> None:
+        self._set_data(self._load())
+
+    def _set_data(self, units: list[T]) -> None:
+        self._inventory = NSXInventory(units, self._new_index(units))
+        self._fetched = {}
+        self._on_change()
+
+    def _publish(self, index: NSXIndex) -> None:
+        """
+        Replaces the inventory with a changed copy of the index, units keep their
+        place in `data` and new ones go at the end
+        """
+        data, seen = [], set()
+        for unit in self.data:
+            id = index._id_of(unit)
+            if id in index.by_id and id not in seen:
+                data.append(index.by_id[id])
+                seen.add(id)
+        data.extend(u for id, u in index.by_id.items() if id not in seen)
+        self._inventory = NSXInventory(data, index)
+        self._fetched = {}
+        self._on_change()
+
+    def _copy(self, unit: T, **fields) -> T:
+        """
+        Returns a private copy of a unit with `fields` set. Cached units are shared
+        by everyone reading the inventory, so they are copied before being changed.
+        """
+        data = unit.data
+        data = data.clone() if isinstance(data, NSXRecord) else copy.deepcopy(data)
+        for key, value in fields.items():
+            dict.__setitem__(data, key, value)
+        return self._unit(data)
+
+    def _cache_replace(self, unit: T) -> None:
+        """Publishes a changed copy of a cached object, the old inventory keeps the old one"""
+        if not unit or self._loaded_at is None:
+            return
+        with self._lock:
+            index = self._index.copy()
+            index.add(unit)
+            self._publish(index)
+
+    def _on_change(self) -> None:
+        """Called whenever the cached units change, for managers with derived state"""
+
+    def cache_stats(self) -> dict:
+        age = None if self._loaded_at is None else time.monotonic() - self._loaded_at
+        return {
+            "size": len(self.data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "age": age,
+        }
+
+
+class DeltaManager(BaseManager[T]):
+    """
+    BaseManager for Policy API objects that can be refreshed incrementally
+
+    Between full reloads only the objects the search API reports as changed
+    are fetched, and the inventory can be seeded from a snapshot on disk that
+    is checked against NSX in the background.
+    """
+
+    index_fields = BaseManager.index_fields + ["_revision", "_last_modified_time"]
+
+    def __init__(self, cfg: NSXConfig, nsx: NSX = None):
+        super().__init__(cfg, nsx)
+        self._delta = NSXDeltaTracker(
+            self.http,
+            resource_type=self.resource_type,
+            path_prefix=self._path_prefix(),
+            full_reload_interval=cfg.full_reload_interval,
+        )
+        self._snapshot = NSXSnapshotCache(cfg, self._snapshot_kind())
+        # local creates, deletes and saves are written out by flush_snapshot()
+        self._snapshot_dirty = False
+        self._revalidation = None
+
+    def _path_prefix(self) -> str:
+        raise NotImplementedError
+
+    def _snapshot_kind(self) -> str:
+        if self.fields is None:
+            return self.kind
+        # compact and full inventories never share a snapshot
+        digest = hashlib.sha1(",".join(self._projection()).encode()).hexdigest()
+        return f"{self.kind}-{digest[:8]}"
+
+    def project(self, fields: Union[list[str], None]) -> None:
+        super().project(fields)
+        self._snapshot = NSXSnapshotCache(self.cfg, self._snapshot_kind())
+        # the units already cached have the old fields, replace them all
+        self._delta.invalidate()
+
+    def _is_cold(self) -> bool:
+        # a snapshot on disk is cheaper than any request
+        return super()._is_cold() and not self._snapshot.available()
+
+    def _search_match(self, raw: dict) -> bool:
+        # search covers every domain
+        return raw.get("path", "").startswith(self._path_prefix()) and self._accept(raw)
+
+    def _refresh_data(self, force: bool = False) -> None:
+        self._apply_revalidation()
+        super()._refresh_data(force)
+
+    def _reload(self, force: bool = False) -> None:
+        if not force and not self._delta.loaded() and self._load_snapshot():
+            self.debug.print(2, f"using snapshot: {self.kind}")
+        elif force or self._delta.full_reload_due():
+            units = self._load()
+            self._set_data(units)
+            self._delta.mark_full_load(units)
+            self._write_snapshot()
+        else:
+            self._apply_delta(self._delta.changed())
+
+    def _load_snapshot(self) -> bool:
+        """Seeds the cache from disk and starts checking it against NSX in the background"""
+        snapshot = self._snapshot.load()
+        if not snapshot or snapshot.get("last_modified_time") is None:
+            return False
+        self._set_data([self._unit(i) for i in snapshot["items"]])
+        self._delta.mark_snapshot_load(
+            snapshot["last_modified_time"], snapshot["saved_at"]
+        )
+        self._revalidation = self._delta.revalidate()
+        return True
+
+    def _apply_revalidation(self, wait: bool = False) -> None:
+        """Applies the background snapshot check once it is done, or blocks for it with wait"""
+        if self._revalidation is None:
+            return
+        if not (wait or self._revalidation.done()):
+            return
+        with self._lock:
+            future, self._revalidation = self._revalidation, None
+            if future is None:
+                # applied by another thread while we waited
+                return
+            try:
+                changes = future.result()
+            except Exception as e:
+                self.debug.print(1, f"snapshot revalidation failed, reloading: {self.kind}: {e}")
+                self._snapshot.clear()
+                self._refresh_data(force=True)
+                return
+            self._apply_delta(changes)
+
+    def _apply_delta(self, changes: Iterable[dict]) -> None:
+        """Patches the cache with the objects changed since the last refresh"""
+        self.debug.print(1, f"loading changes: {self.kind}")
+        changes = list(changes)
+        with self._lock:
+            index = self._index.copy()
+            changed = []
+            removed = False
+            for i in changes:
+                if not self._accept(i):
+                    continue
+                unit = self._unit(i)
+                if i.get("marked_for_delete"):
+                    index.remove(unit)
+                    removed = True
+                    continue
+                cached = index.id(unit.id())
+                if cached and cached.dump().get("_revision") == i.get("_revision"):
+                    continue
+                index.add(unit)
+                changed.append(unit)
+            self._delta.observe(changed)
+            if changed or removed:
+                self._publish(index)
+                self._write_snapshot()
+
+    def _cache_add(self, unit: T) -> None:
+        """
+        Keeps data and indexes in step with an object we just created. The cache
+        gets its own copy, the caller is free to change theirs.
+        """
+        if not unit:
+            return
+        unit = self._copy(unit)
+        with self._lock:
+            index = self._index.copy()
+            index.add(unit)
+            self._publish(index)
+            # only search results move the mark, our own write can be newer than
+            # changes made elsewhere that the search index hasn't shown us yet
+            self._snapshot_dirty = True
+
+    def _cache_remove(self, unit: T) -> None:
+        """Keeps data and indexes in step with an object we just deleted"""
+        with self._lock:
+            index = self._index.copy()
+            index.remove(unit)
+            self._publish(index)
+            self._snapshot_dirty = True
+
+    def _cache_replace(self, unit: T) -> None:
+        with self._lock:
+            super()._cache_replace(unit)
+            if unit and self._loaded_at is not None:
+                self._snapshot_dirty = True
+
+    def _write_snapshot(self) -> None:
+        self._snapshot_dirty = False
+        self._snapshot.save(self.data, self._delta.last_modified_time)
+
+    def flush_snapshot(self) -> None:
+        """
+        Writes the snapshot if creates, deletes or saves made here changed the
+        cache since it was last written. Writing it on every change would
+        serialize the whole inventory each time.
+        """
+        if not self._snapshot_dirty or self.http.active_batch() is not None:
+            # the batch may still be thrown away, it flushes once committed
+            return
+        with self._lock:
+            if self._snapshot_dirty:
+                self._write_snapshot()
@@ -1,74 +1,64 @@
 from __future__ import annotations
 
-from typing import Union
+from typing import TYPE_CHECKING, Iterator, Union
 
 from uonsx.config import NSXConfig
 from uonsx.error import NSXBridgeProfileNotFoundError
-from uonsx.http import HTTP
+from uonsx.manager.base import BaseManager
 from uonsx.unit.bridge_profile import NSXBridgeProfile
 from uonsx.util import format_table
 
-class NSXBridgeProfileManager:
+if TYPE_CHECKING:
+    from uonsx.nsx import NSX
+
+
+class NSXBridgeProfileManager(BaseManager[NSXBridgeProfile]):
     """Manager class for NSX Bridge Profiles"""
 
-    __instance = None
-    __data_needs_refreshed = True
+    kind = "bridge_profile"
+    unit = NSXBridgeProfile
 
     @staticmethod
     def get_instance():
-        if NSXBridgeProfileManager.__instance == None:
-            raise Exception("NSXBridgeProfileManager is not inititalized")
-        return NSXBridgeProfileManager.__instance
-
-    def __init__(self, cfg: NSXConfig):
-        if NSXBridgeProfileManager.__instance != None:
-            raise Exception("Use the get_instance() method to use the NSX BridgeProfileManager")
-        self.debug = cfg.debug
-        self.debug.print(2, "Initializing bridge profile manager")
-        self.http = HTTP.get_instance()
-        self.data = []
-        NSXBridgeProfileManager.__instance = self
-        self.debug.print(2, "Bridge Profile Manager initialized")
+        # the manager of the current NSX, see NSX.current()
+        from uonsx.nsx import NSX
 
-    def _set_refresh(self, flag: bool = True) -> None:
-        self.__data_needs_refreshed = flag
+        return NSX._build_manager("bridge_profile")
+
+    def __init__(self, cfg: NSXConfig, nsx: NSX = None):
+        cfg.debug.print(2, "Initializing bridge profile manager")
+        super().__init__(cfg, nsx)
+        self.debug.print(2, "Bridge Profile Manager initialized")
 
-    def _refresh_data(self, force: bool = False):
-        if self.__data_needs_refreshed or force:
-            all_bridge_profiles = self.load_all_bridge_profiles()
-            self.data = all_bridge_profiles
-            self.__data_needs_refreshed = False
+    def iter_all(self) -> Iterator[NSXBridgeProfile]:
+        return self.iter_all_bridge_profiles()
 
     def get_by_path(self, path: str) -> Union[NSXBridgeProfile,str]:
         self._refresh_data()
-        for item in self.data:
-            if item.path() == path:
-                return item
+        bridge_profile = self._index.path(path)
+        if bridge_profile:
+            return bridge_profile
         return path
 
 
-    def load_all_bridge_profiles(self) -> list[NSXBridgeProfile]:
-        """Query the API and return a list of all instances of NSXBridgeProfile"""
+    def iter_all_bridge_profiles(self) -> Iterator[NSXBridgeProfile]:
+        """Query the API and yield instances of NSXBridgeProfile as each page arrives"""
         self.debug.print(1,"loading all: bridge profiles")
 
         endpoint = "policy/api/v1/infra/sites/default/enforcement-points/default/edge-bridge-profiles"
 
-        resp = self.http.request(method="GET", endpoint=endpoint)
-        resp_items = resp["results"]
-
-        all_bridge_profiles = [NSXBridgeProfile(bp) for bp in resp_items]
+        yield from self._paginate(endpoint)
 
-        return all_bridge_profiles
+    def load_all_bridge_profiles(self) -> list[NSXBridgeProfile]:
+        """Query the API and return a list of all instances of NSXBridgeProfile"""
+        return list(self.iter_all_bridge_profiles())
 
 
     def get(self, name: str) -> Union[NSXBridgeProfile, None]:
         """Query the API and return as instance of NSXBridgeProfile"""
         self._refresh_data()
 
-        bridge_profile = None
-        for bp in self.data:
-            if bp.name() == name:
-                bridge_profile = bp
+        bridge_profile = self._index.name(name)
 
         if not bridge_profile:
             raise NSXBridgeProfileNotFoundError(name)
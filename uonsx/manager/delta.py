@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterator
+
+from uonsx.http import HTTP
+
+
+class NSXDeltaTracker:
+    """
+    Remembers the newest `_last_modified_time` seen in a manager's inventory so a
+    refresh can ask the search API for objects changed since then instead of
+    downloading everything again.
+
+    The search API can't report deletions made by other clients, so a full
+    reload is still done once `full_reload_interval` seconds have passed.
+    """
+
+    def __init__(
+        self,
+        http: HTTP,
+        resource_type: str,
+        path_prefix: str,
+        full_reload_interval: int,
+    ):
+        self.http = http
+        self.resource_type = resource_type
+        self.path_prefix = path_prefix
+        self.full_reload_interval = full_reload_interval
+        self.last_modified_time = None
+        self._last_full_load = None
+
+    def invalidate(self) -> None:
+        """Makes the next refresh a full reload"""
+        self._last_full_load = None
+
+    def loaded(self) -> bool:
+        return self._last_full_load is not None
+
+    def full_reload_due(self) -> bool:
+        if self._last_full_load is None or self.last_modified_time is None:
+            return True
+        return time.monotonic() - self._last_full_load >= self.full_reload_interval
+
+    def observe(self, units: list) -> None:
+        """Moves the high-water mark forward to the newest change in `units`"""
+        for unit in units:
+            lmt = unit.dump().get("_last_modified_time")
+            if lmt is None:
+                continue
+            if self.last_modified_time is None or lmt > self.last_modified_time:
+                self.last_modified_time = lmt
+
+    def mark_full_load(self, units: list) -> None:
+        self._last_full_load = time.monotonic()
+        self.last_modified_time = None
+        self.observe(units)
+
+    def mark_snapshot_load(self, last_modified_time: int, saved_at: float) -> None:
+        """Treats a snapshot from disk as the last full load, backdated to when it was saved"""
+        age = max(0.0, time.time() - saved_at)
+        self._last_full_load = time.monotonic() - age
+        self.last_modified_time = last_modified_time
+
+    def changed(self) -> Iterator[dict]:
+        """Yields the raw objects modified at or after the high-water mark"""
+        query = f"resource_type:{self.resource_type} AND _last_modified_time:[{self.last_modified_time} TO *]"
+        for item in self.http.search(query):
+            # search covers every domain, keep only what this manager holds
+            if item.get("path", "").startswith(self.path_prefix):
+                yield item
+
+    def revalidate(self) -> Future:
+        """
+        Starts fetching the objects changed since the high-water mark on a background
+        thread, the future resolves to the list of raw objects
+        """
+        pool = ThreadPoolExecutor(max_workers=1)
+        future = pool.submit(lambda: list(self.changed()))
+        pool.shutdown(wait=False)
+        return future
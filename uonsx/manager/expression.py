@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import json
+from typing import TYPE_CHECKING
 
 from uonsx.config import NSXConfig
 from uonsx.error import (
@@ -10,27 +11,27 @@ from uonsx.error import (
 )
 from uonsx.http import HTTP
 from uonsx.unit.expression import NSXExpression
+from uonsx.util import IPParser
+
+if TYPE_CHECKING:
+    from uonsx.nsx import NSX
 
 
 class NSXExpressionManager:
     """Manager class for NSX Expressions"""
 
-    __instance = None
-
     @staticmethod
     def get_instance():
-        if NSXExpressionManager.__instance == None:
-            raise Exception("NSXExpressionManager is not initialized")
-        return NSXExpressionManager.__instance
-
-    def __init__(self, cfg: NSXConfig):
-        if NSXExpressionManager.__instance != None:
-            raise Exception(
-                "use the get_instance() method to use the NSXExpressionManager"
-            )
+        # the manager of the current NSX, see NSX.current()
+        from uonsx.nsx import NSX
+
+        return NSX._build_manager("expression")
+
+    def __init__(self, cfg: NSXConfig, nsx: NSX = None):
         self.debug = cfg.debug
         self.debug.print(2, "initializing expression manager")
-        self.http = HTTP.get_instance()
+        self.nsx = nsx
+        self.http = nsx.http if nsx is not None else HTTP.get_instance()
         self.valid_member_types = [
             "IPSet",
             "VirtualMachine",
@@ -47,19 +48,20 @@ class NSXExpressionManager:
             "ENDSWITH",
             "NOTEQUALS",
         ]
-        NSXExpressionManager.__instance = self
         self.AND = self.and_conjunction()
         self.OR = self.or_conjunction()
         self.debug.print(2, "expression manager initialized")
 
     def and_conjunction(self) -> NSXExpression:
         return NSXExpression(
-            {"conjunction_operator": "AND", "resource_type": "ConjunctionOperator"}
+            {"conjunction_operator": "AND", "resource_type": "ConjunctionOperator"},
+            nsx=self.nsx,
         )
 
     def or_conjunction(self) -> NSXExpression:
         return NSXExpression(
-            {"conjunction_operator": "OR", "resource_type": "ConjunctionOperator"}
+            {"conjunction_operator": "OR", "resource_type": "ConjunctionOperator"},
+            nsx=self.nsx,
         )
 
     def _ignore_case_get(self, value: str, valid: list[str]):
@@ -95,11 +97,9 @@ class NSXExpressionManager:
 
         Raises NSXInvalidIPAddressError if invalid data provided
         """
-        # TODO(lcrown): validate ip address data
-        valid = True
-        if not valid:
+        if not IPParser.is_ip(ipaddress):
             raise NSXInvalidIPAddressError(ipaddress)
-        return ipaddress
+        return ipaddress.strip()
 
     def tag(self, name: str, scope: str = None) -> NSXExpression:
         """
@@ -160,7 +160,7 @@ class NSXExpressionManager:
         data["operator"] = self._validate_component(operator, self.valid_operators)
         data["value"] = self._validate_value(value)
         data["resource_type"] = "Condition"
-        expression = NSXExpression(data)
+        expression = NSXExpression(data, nsx=self.nsx)
         return expression
 
     def new_ipaddress_expression(self, ip_address_list: list[str] = []):
@@ -185,5 +185,5 @@ class NSXExpressionManager:
         data["ip_addresses"] = []
         for ip in ip_address_list:
             data["ip_addresses"].append(self._validate_ipaddress(ip))
-        expression = NSXExpression(data)
+        expression = NSXExpression(data, nsx=self.nsx)
         return expression
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import json
 from pprint import pformat
-from typing import Union
+from typing import TYPE_CHECKING, Iterator, Union
 
 from typing_extensions import Literal
 from uonsx.config import NSXConfig
@@ -14,56 +14,70 @@ from uonsx.error import (
     NSXInvalidGroupError,
     NSXInvalidOutputFormatError,
 )
-from uonsx.http import HTTP
-from uonsx.manager.expression import NSXExpressionManager
+from uonsx.manager.base import DeltaManager
 from uonsx.unit.expression import NSXExpression
 from uonsx.unit.group import NSXGroup
-from uonsx.util import cleanse_display_name, format_table
+from uonsx.util import IPIntervalIndex, IPParser, cleanse_display_name, format_table
 
+if TYPE_CHECKING:
+    from uonsx.nsx import NSX
 
-class NSXGroupManager:
+
+class NSXGroupManager(DeltaManager[NSXGroup]):
     """Manager class for NSX Security Groups"""
 
-    __instance = None
-    __data_needs_refresh = True
+    kind = "group"
+    unit = NSXGroup
+    resource_type = "Group"
 
     @staticmethod
     def get_instance():
-        if NSXGroupManager.__instance == None:
-            raise Exception("NSXGroupManager is not initialized")
-        return NSXGroupManager.__instance
-
-    def __init__(self, cfg: NSXConfig):
-        if NSXGroupManager.__instance != None:
-            raise Exception("use the get_instance() method to use the NSXGroupManager")
-        self.debug = cfg.debug
-        self.cfg = cfg
-        self.debug.print(2, "initializing group manager")
-        self.http = HTTP.get_instance()
-        self.data = []
-        self._expression_manager = NSXExpressionManager.get_instance()
-        NSXGroupManager.__instance = self
+        # the manager of the current NSX, see NSX.current()
+        from uonsx.nsx import NSX
+
+        return NSX._build_manager("group")
+
+    def __init__(self, cfg: NSXConfig, nsx: NSX = None):
+        cfg.debug.print(2, "initializing group manager")
+        super().__init__(cfg, nsx)
+        self._ip_index = None
+        self._expression_manager = self._manager("expression")
         self.debug.print(2, "group manager initialized")
 
-    def _set_refresh(self, flag: bool = True) -> None:
-        self.__data_needs_refresh = flag
+    def _path_prefix(self) -> str:
+        return f"/infra/domains/{self.http.domain_id}/groups/"
+
+    def _on_change(self) -> None:
+        self._ip_index = None
 
-    def _refresh_data(self, force: bool = False):
-        if self.__data_needs_refresh or force:
-            all_groups = self.load_all()
-            self.data = all_groups
-            self.__data_needs_refresh = False
+    def _invalidate_ip_index(self) -> None:
+        """Called when a group's ip addresses change in place"""
+        self._ip_index = None
+
+    def _get_ip_index(self) -> IPIntervalIndex:
+        self._refresh_data()
+        inventory = self._inventory
+        cached = self._ip_index
+        # built from the inventory it was made for, so a refresh racing the
+        # build can't leave an index of the old groups behind
+        if cached is None or cached[0] is not inventory:
+            self.debug.print(2, "building ip address index for groups")
+            cached = (inventory, IPIntervalIndex((g.ipset(), g) for g in inventory.data))
+            self._ip_index = cached
+        return cached[1]
 
     def _looks_like_ip(self, source: str) -> bool:
-        if source[0].isdigit() and "." in source:
-            return True
-        return False
+        return IPParser.is_ip(source)
 
     def get_by_path(self, path: str) -> NSXGroup:
-        self._refresh_data()
-        for item in self.data:
-            if item.path() == path:
-                return item
+        """Returns the cached group with the path, treat it as read-only"""
+        if path.startswith(self._path_prefix()):
+            group = self._lookup_path(path, self._path_endpoint(path))
+        else:
+            self._refresh_data()
+            group = self._index.path(path)
+        if group:
+            return group
         # Path is a /group/path but not found in known groups
         if path.startswith("/"):
             raise NSXGroupPathNotFoundError(path)
@@ -71,33 +85,33 @@ class NSXGroupManager:
         raise NSXInvalidGroupError(path)
 
     def _get_id(self, name: str) -> str:
-        for item in self.data:
-            if item.name() == name:
-                return item.id()
-        raise NSXGroupNotFoundError(name)
+        group = self._index.name(name)
+        if not group:
+            raise NSXGroupNotFoundError(name)
+        return group.id()
 
     def _validate_group_not_exists(self, name: str) -> None:
         self._refresh_data()
-        for g in self.data:
-            if g.name() == name:
-                raise NSXGroupAlreadyExistsError(name)
+        # a snapshot may predate objects created elsewhere
+        self._apply_revalidation(wait=True)
+        if name in self._index:
+            raise NSXGroupAlreadyExistsError(name)
 
-    def load_all(self) -> list[NSXGroup]:
-        """Query the API and return a list of all instances of NSXGroup"""
+    def iter_all(self) -> Iterator[NSXGroup]:
+        """Query the API and yield instances of NSXGroup as each page arrives"""
         self.debug.print(1, f"loading all: group")
 
         endpoint = f"{self.http.base_endpoint}/groups"
 
-        resp = self.http.request(method="GET", endpoint=endpoint)
-        resp_items = resp["results"]
+        yield from self._paginate(endpoint)
 
-        all_groups = [NSXGroup(i) for i in resp_items]
-
-        return all_groups
+    async def aload_all(self) -> list[NSXGroup]:
+        """Async version of `load_all`"""
+        endpoint = f"{self.http.base_endpoint}/groups"
+        return [NSXGroup(i, nsx=self.nsx) async for i in self.http.async_client().paginate(endpoint)]
 
     def get(self, name: str) -> NSXGroup:
         """Query the API and return an instance of NSXGroup"""
-        self._refresh_data()
         self.debug.print(1, f"getting group: {name}")
 
         if self._looks_like_ip(name):
@@ -105,15 +119,39 @@ class NSXGroupManager:
             return name
 
         # unlike policies, groups are fully-loaded when using `get_all()`
-        group = None
-        for g in self.data:
-            if g.name() == name:
-                group = g
+        group = self._lookup_name(name)
 
         if not group:
             raise NSXGroupNotFoundError(name)
 
-        return group
+        # a copy, changing it doesn't touch the cached group until it is saved
+        return self._copy(group)
+
+    async def aget(self, name: str) -> NSXGroup:
+        """Async version of `get`, a cold cache is loaded on the request pool"""
+        if self._is_stale():
+            await self.http.async_client().run(self._refresh_data)
+        return self.get(name)
+
+    def find_by_ip(self, ip_address: str) -> list[NSXGroup]:
+        """
+        Returns the groups whose IPAddressExpressions contain the given address, CIDR or range
+
+        Answered from the cached group data, no API calls are made for the lookup.
+        Effective membership (VMs matched by tag) is not considered.
+        """
+        self.debug.print(1, f"finding groups containing: {ip_address}")
+        return self._get_ip_index().containing(ip_address)
+
+    def find_overlapping(self, ip_address: str) -> list[NSXGroup]:
+        """Returns the groups whose IPAddressExpressions share any address with the given one"""
+        self.debug.print(1, f"finding groups overlapping: {ip_address}")
+        return self._get_ip_index().overlapping(ip_address)
+
+    def overlaps(self) -> list[tuple[NSXGroup, NSXGroup]]:
+        """Returns every pair of groups whose IPAddressExpressions overlap"""
+        self.debug.print(1, f"finding overlapping groups")
+        return self._get_ip_index().overlapping_pairs()
 
     def get_all(self) -> list[NSXGroup]:
         """the API and return a list of all instances of NSXGroup"""
@@ -159,9 +197,9 @@ class NSXGroupManager:
             data["expression"] = [self._expression_manager.tag(name=name).dump()]
         else:
             data["expression"] = self._expand_expression(expression)
-        group = NSXGroup(data)
+        group = NSXGroup(data, nsx=self.nsx)
         group = self._api_create(group)
-        self._set_refresh()
+        self._cache_add(group)
         return group
 
     def delete(self, name: str) -> bool:
@@ -172,7 +210,7 @@ class NSXGroupManager:
         group = self.get(name=name)
 
         self._api_delete(group)
-        self._set_refresh()
+        self._cache_remove(group)
         return True
 
     def _validate_expression_list(self, expression_list: list[NSXExpression]) -> None:
@@ -190,17 +228,29 @@ class NSXGroupManager:
 
     def _api_create(self, group: NSXGroup) -> NSXGroup:
         """Private method to create the group using the API"""
-        self.debug.print(3, pformat(group.dump()))
+        if self.debug.debug_level >= 3:
+            self.debug.print(3, pformat(group.dump()))
+        batch = self.http.active_batch()
+        if batch is not None:
+            # no path until NSX sees it, but rules staged alongside it reference it
+            group.data.setdefault("path", self._path_prefix() + group.id())
+            batch.add_group(group)
+            return group
         endpoint = f"{self.http.base_endpoint}/groups/{group.id()}"
         try:
             data = self.http.request(method="PUT", endpoint=endpoint, data=group.dump())
         except NSXGroupAlreadyExistsError as e:
             raise
-        return NSXGroup(data)
+        return NSXGroup(data, nsx=self.nsx)
 
     def _api_delete(self, group: NSXGroup) -> None:
         """Private method to delete the group using the API"""
-        self.debug.print(3, pformat(group.dump()))
+        if self.debug.debug_level >= 3:
+            self.debug.print(3, pformat(group.dump()))
+        batch = self.http.active_batch()
+        if batch is not None:
+            batch.add_group(group, delete=True)
+            return
         endpoint = f"{self.http.base_endpoint}/groups/{group.id()}"
         # group exists:
         self.http.request(method="DELETE", endpoint=endpoint, data=group.dump())
@@ -239,24 +289,13 @@ class NSXGroupManager:
         """Returns a list of group names with duplicate display names"""
         self._refresh_data()
         self.debug.print(1, f"auditing duplicate groups")
-        # compare the list of group names against the unique list of group names
-        # and return empty list if length is the same
-        if len([g.name() for g in self.data]) == len(
-            list(set([g.name() for g in self.data]))
-        ):
-            return []
         issues = []
-        seen = []
-        for group in self.data:
-            if group.name() in self.cfg.audit.ignored_groups:
-                self.debug.print(
-                    1, f"ignoring group due to configuration: {group.name()}"
-                )
-                continue
-            if group.name() not in seen:
-                seen.append(group.name())
+        for name, groups in self._index.duplicates().items():
+            if name in self.cfg.audit.ignored_groups:
+                self.debug.print(1, f"ignoring group due to configuration: {name}")
                 continue
-            issues.append(group.name())
+            # one entry per extra copy of the name
+            issues.extend([name] * (len(groups) - 1))
         return issues
 
     def _has_valid_suffix(self, group_name: str) -> bool:
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Union
+
+from uonsx.error import NSXDuplicateNameError
+
+
+def _unit_id(unit) -> str:
+    return unit.id()
+
+
+def _unit_path(unit) -> Union[str, None]:
+    return unit.path()
+
+
+class NSXIndex:
+    """
+    Name, id and path lookup tables for the units held by a manager
+
+    Display names are not unique in NSX, so every name maps to a list of units
+    and ambiguous lookups raise instead of silently picking one of them.
+    """
+
+    def __init__(
+        self,
+        units: list = None,
+        id_of: Callable[[Any], str] = _unit_id,
+        path_of: Callable[[Any], Union[str, None]] = _unit_path,
+    ):
+        self._id_of = id_of
+        self._path_of = path_of
+        self.by_name = {}
+        self.by_id = {}
+        self.by_path = {}
+        for unit in units or []:
+            self.add(unit)
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.by_name
+
+    def copy(self) -> NSXIndex:
+        """Returns an index that can be changed without affecting this one"""
+        index = NSXIndex(id_of=self._id_of, path_of=self._path_of)
+        index.by_name = {name: list(units) for name, units in self.by_name.items()}
+        index.by_id = dict(self.by_id)
+        index.by_path = dict(self.by_path)
+        return index
+
+    def add(self, unit) -> None:
+        """Adds a unit to the index, replacing any unit with the same id"""
+        if not unit:
+            return
+        existing = self.by_id.get(self._id_of(unit))
+        if existing is not None:
+            self.remove(existing)
+        self.by_name.setdefault(unit.name(), []).append(unit)
+        self.by_id[self._id_of(unit)] = unit
+        path = self._path_of(unit)
+        if path:
+            self.by_path[path] = unit
+
+    def remove(self, unit) -> None:
+        """Removes the unit with the same id as `unit` from the index"""
+        existing = self.by_id.pop(self._id_of(unit), None)
+        if existing is None:
+            return
+        named = self.by_name.get(existing.name(), [])
+        named = [u for u in named if self._id_of(u) != self._id_of(existing)]
+        if named:
+            self.by_name[existing.name()] = named
+        else:
+            self.by_name.pop(existing.name(), None)
+        path = self._path_of(existing)
+        if path:
+            self.by_path.pop(path, None)
+
+    def name(self, name: str):
+        """Returns the unit with the display name, None if missing, raises if ambiguous"""
+        units = self.by_name.get(name)
+        if not units:
+            return None
+        if len(units) > 1:
+            raise NSXDuplicateNameError(name, [self._id_of(u) for u in units])
+        return units[0]
+
+    def id(self, id: str):
+        return self.by_id.get(id)
+
+    def path(self, path: str):
+        return self.by_path.get(path)
+
+    def duplicates(self) -> dict[str, list]:
+        """Returns every display name shared by more than one unit"""
+        return {name: units for name, units in self.by_name.items() if len(units) > 1}
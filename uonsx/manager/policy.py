@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import json
-from typing import Union
+from typing import TYPE_CHECKING, Iterator, Union
 
 from typing_extensions import Literal
 from uonsx.config import NSXConfig
@@ -11,9 +11,11 @@ from uonsx.error import (
     NSXPolicyAlreadyExistsError,
     NSXPolicyCreationFailedError,
     NSXPolicyNotFoundError,
+    NSXPolicySequenceNumberInUseError,
     NSXInvalidPolicyCategoryError,
 )
-from uonsx.http import HTTP
+from uonsx.manager.base import DeltaManager
+from uonsx.sequence import NSXSequenceAllocator
 from uonsx.unit.group import NSXGroup
 from uonsx.unit.policy import NSXPolicy
 from uonsx.util import (
@@ -23,80 +25,96 @@ from uonsx.util import (
     get_rule_id_from_path,
 )
 
+if TYPE_CHECKING:
+    from uonsx.nsx import NSX
 
-class NSXPolicyManager:
 
-    __instance = None
-    __data_needs_refresh = True
+class NSXPolicyManager(DeltaManager[NSXPolicy]):
+
+    kind = "policy"
+    unit = NSXPolicy
+    resource_type = "SecurityPolicy"
+    # sequence numbers are allocated across every policy
+    index_fields = DeltaManager.index_fields + ["category", "sequence_number"]
+    _ignored_policies = ["Default Layer2 Section", "Default Layer3 Section"]
 
     @staticmethod
     def get_instance():
-        if NSXPolicyManager.__instance == None:
-            raise Exception("NSXPolicyManager is not initialized")
-        return NSXPolicyManager.__instance
-
-    def __init__(self, cfg: NSXConfig):
-        if NSXPolicyManager.__instance != None:
-            raise Exception("use the get_instance() method to use the NSXPolicyManager")
-        self.cfg = cfg
-        self.debug = cfg.debug
-        self.data = []
-        self._highest_sequence_number = None
-        self.debug.print(2, "initializing policy manager")
-        self.http = HTTP.get_instance()
-        NSXPolicyManager.__instance = self
+        # the manager of the current NSX, see NSX.current()
+        from uonsx.nsx import NSX
+
+        return NSX._build_manager("policy")
+
+    def __init__(self, cfg: NSXConfig, nsx: NSX = None):
+        cfg.debug.print(2, "initializing policy manager")
+        super().__init__(cfg, nsx)
+        self._allocators = None
         self.debug.print(2, "policy manager initialized")
 
-    def _set_refresh(self, flag: bool = True) -> None:
-        self.__data_needs_refresh = flag
+    def _path_prefix(self) -> str:
+        return f"/infra/domains/{self.http.domain_id}/security-policies/"
 
-    def _refresh_data(self, force: bool = False) -> None:
-        if self.__data_needs_refresh or force:
-            all_policies = self.load_all()
-            self.data = all_policies
-            self.__data_needs_refresh = False
+    def _accept(self, raw: dict) -> bool:
+        return raw["display_name"] not in self._ignored_policies
 
     def _get_id(self, name: str) -> str:
         self._refresh_data()
         self.debug.print(2, f"getting id for policy name: {name}")
-        for item in self.data:
-            if item.name() == name:
-                self.debug.print(2, f"found id for policy name: {name}")
-                return item.id()
+        policy = self._index.name(name)
+        if policy:
+            self.debug.print(2, f"found id for policy name: {name}")
+            return policy.id()
         self.debug.print(2, f"did not find id for policy name: {name}")
         raise NSXPolicyNotFoundError(name)
 
+    def _policy_endpoint(self, id: str) -> str:
+        return f"{self.http.base_endpoint}/security-policies/{id}"
+
     def _get_by_id(self, id: str) -> NSXPolicy:
-        self._refresh_data()
         self.debug.print(2, f"getting policy from id: {id}")
-        for policy in self.data:
-            if policy.id() == id:
-                return policy
+        policy = self._lookup_id(id, self._policy_endpoint(id))
+        if policy:
+            return self._copy(policy)
         self.debug.print(2, f"did not find policy for id: {id}")
         raise NSXPolicyNotFoundError(id)
 
-    def _get_highest_sequence_number(self) -> int:
-        """Returns the highest sequence number among all policies"""
-        if self._highest_sequence_number:
-            return self._highest_sequence_number
+    def _sequence_allocator(
+        self, category: Union[str, None] = None, padding: int = 20
+    ) -> NSXSequenceAllocator:
+        """
+        Returns an allocator over the sequence numbers of the policies in `category`
+        (or all policies). Allocators are built once per inventory, so they never
+        miss a policy created since and aren't re-sorted on every call.
+        """
         self._refresh_data()
-        highest = 0
-        for policy in self.data:
-            if policy.sequence_number() > highest:
-                highest = policy.sequence_number()
-        highest = highest
-        self._highest_sequence_number = highest
-        return highest
-
-    def next_sequence_number(self, padding: int = 20) -> int:
+        inventory = self._inventory
+        cached = self._allocators
+        if cached is None or cached[0] is not inventory:
+            cached = (inventory, {})
+            self._allocators = cached
+        allocator = cached[1].get((category, padding))
+        if allocator is None:
+            allocator = NSXSequenceAllocator(
+                [
+                    p.sequence_number()
+                    for p in inventory.data
+                    if category is None or p.category() == category
+                ],
+                padding=padding,
+            )
+            cached[1][(category, padding)] = allocator
+        return allocator
+
+    def next_sequence_number(self, padding: int = 20, category: Union[str, None] = None) -> int:
         """Returns the next sequence number if you want to append a policy to the list"""
-        return self._get_highest_sequence_number() + padding
+        return self._sequence_allocator(category, padding=padding).next()
 
     def _validate_policy_not_exists(self, name: str) -> None:
         self._refresh_data()
-        for p in self.data:
-            if p.name() == name:
-                raise NSXPolicyAlreadyExistsError(name)
+        # a snapshot may predate objects created elsewhere
+        self._apply_revalidation(wait=True)
+        if name in self._index:
+            raise NSXPolicyAlreadyExistsError(name)
 
     def _validate_valid_category(self, category: str) -> None:
         valid_categories = [
@@ -109,45 +127,64 @@ class NSXPolicyManager:
         if category not in valid_categories:
             raise NSXInvalidPolicyCategoryError(category, valid_categories)
 
-    def load_all(self) -> list[NSXPolicy]:
+    def iter_all(self) -> Iterator[NSXPolicy]:
         """
-        Query the API and return a list of all instances of NSXPolicy
+        Query the API and yield instances of NSXPolicy as each page arrives
         """
         self.debug.print(1, f"loading all: policy")
 
-        ignored_policies = ["Default Layer2 Section", "Default Layer3 Section"]
-
         endpoint = f"{self.http.base_endpoint}/security-policies"
 
-        resp = self.http.request(method="GET", endpoint=endpoint)
-        resp_items = resp["results"]
+        for policy in self._paginate(endpoint):
+            if self._accept(policy.dump()):
+                yield policy
 
-        policies = [
-            NSXPolicy(i)
-            for i in resp_items
-            if NSXPolicy(i).name() not in ignored_policies
+    async def aload_all(self) -> list[NSXPolicy]:
+        """Async version of `load_all`"""
+        endpoint = f"{self.http.base_endpoint}/security-policies"
+        return [
+            NSXPolicy(i, nsx=self.nsx)
+            async for i in self.http.async_client().paginate(endpoint)
+            if self._accept(i)
         ]
 
-        return policies
-
     def get(self, name: str) -> NSXPolicy:
         """
         Query the API and return an instance of NSXPolicy
         """
-        self._refresh_data()
         self.debug.print(1, f"getting policy: {name}")
 
-        id = self._get_id(name=name)
-        if not id:
+        if self._is_cold():
+            # policies created here get their id from the name, try it first
+            policy = self._fetch(self._policy_endpoint(cleanse_display_name(name)))
+            if policy and policy.name() == name:
+                return policy
+
+        # neither the inventory nor search results carry the rules
+        policy = self._lookup_name(name)
+        if not policy:
             self.debug.print(1, "policy not found")
             raise NSXPolicyNotFoundError(name)
 
-        endpoint = f"{self.http.base_endpoint}/security-policies/{id}"
+        policy_data = self.http.request(method="GET", endpoint=self._policy_endpoint(policy.id()))
 
-        policy_data = self.http.request(method="GET", endpoint=endpoint)
+        if policy_data:
+            return NSXPolicy(policy_data, nsx=self.nsx)
+
+        raise NSXPolicyNotFoundError(name)
+
+    async def aget(self, name: str) -> NSXPolicy:
+        """Async version of `get`, many policies (with their rules) can be fetched at once"""
+        if self._is_stale():
+            await self.http.async_client().run(self._refresh_data)
+        self.debug.print(1, f"getting policy: {name}")
+
+        id = self._get_id(name=name)
+        endpoint = f"{self.http.base_endpoint}/security-policies/{id}"
+        policy_data = await self.http.async_client().request(method="GET", endpoint=endpoint)
 
         if policy_data:
-            return NSXPolicy(policy_data)
+            return NSXPolicy(policy_data, nsx=self.nsx)
 
         raise NSXPolicyNotFoundError(name)
 
@@ -183,21 +220,31 @@ class NSXPolicyManager:
         data["id"] = safe_id
         data["category"] = category
         data["scope"] = ["ANY"]  # Policy Scope overrides Rule scope, always "ANY"
-        data["sequence_number"] = self.next_sequence_number()
+        allocator = self._sequence_allocator(category)
         if sequence_number:
+            if sequence_number in allocator:
+                raise NSXPolicySequenceNumberInUseError(sequence_number, category)
             data["sequence_number"] = sequence_number
+        else:
+            data["sequence_number"] = allocator.next()
         if description:
             data["description"] = description
 
-        endpoint = f"{self.http.base_endpoint}/security-policies/{safe_id}"
-        data = self.http.request(method="PUT", endpoint=endpoint, data=data)
-
-        self._set_refresh()
-
-        if not data:
-            raise NSXPolicyCreationFailedError(name)
-
-        policy = NSXPolicy(data)
+        batch = self.http.active_batch()
+        if batch is not None:
+            # no path until NSX sees it, but rules staged alongside it reference it
+            data["path"] = self._path_prefix() + safe_id
+            policy = NSXPolicy(data, nsx=self.nsx)
+            batch.add_policy(policy)
+        else:
+            endpoint = f"{self.http.base_endpoint}/security-policies/{safe_id}"
+            data = self.http.request(method="PUT", endpoint=endpoint, data=data)
+
+            if not data:
+                raise NSXPolicyCreationFailedError(name)
+
+            policy = NSXPolicy(data, nsx=self.nsx)
+        self._cache_add(policy)
         policy.set_destination_group(destination_group)
         return policy
 
@@ -209,18 +256,23 @@ class NSXPolicyManager:
 
         id = self._get_id(name=name)
 
-        endpoint = f"{self.http.base_endpoint}/security-policies/{id}"
-
-        self.http.request(method="DELETE", endpoint=endpoint)
+        batch = self.http.active_batch()
+        if batch is not None:
+            batch.add_policy(self._index.id(id), delete=True)
+        else:
+            endpoint = f"{self.http.base_endpoint}/security-policies/{id}"
+            self.http.request(method="DELETE", endpoint=endpoint)
 
-        self._set_refresh()
+        self._cache_remove(self._index.id(id))
         return True
 
     def remove_rule_by_path(self, path: str) -> bool:
         """Removes a rule from a policy, given a valid NSX object path"""
         policy_id = get_policy_id_from_path(path)
-        policy = self._get_by_id(policy_id)
-        policy._reload()  # loads the rules
+        # GET the policy itself, the cached one has no rules
+        policy = self._fetch(self._policy_endpoint(policy_id))
+        if not policy:
+            raise NSXPolicyNotFoundError(policy_id)
         rule_id = get_rule_id_from_path(path)
         rule = policy._get_rule_by_id(rule_id)
         policy.remove_rule(handle=rule.handle())
@@ -260,24 +312,13 @@ class NSXPolicyManager:
         """Returns a list of policy names with duplicate display names"""
         self._refresh_data()
         self.debug.print(1, f"auditing duplicate policies")
-        # compare the list of policy names against the unique list of policy names
-        # and return empty list if length is the same
-        if len([p.name() for p in self.data]) == len(
-            list(set([p.name() for p in self.data]))
-        ):
-            return []
         issues = []
-        seen = []
-        for policy in self.data:
-            if policy.name() in self.cfg.audit.ignored_policies:
-                self.debug.print(
-                    1, f"ignoring policy due to configuration: {policy.name()}"
-                )
-                continue
-            if policy.name() not in seen:
-                seen.append(policy.name())
+        for name, policies in self._index.duplicates().items():
+            if name in self.cfg.audit.ignored_policies:
+                self.debug.print(1, f"ignoring policy due to configuration: {name}")
                 continue
-            issues.append(policy.name())
+            # one entry per extra copy of the name
+            issues.extend([name] * (len(policies) - 1))
         return issues
 
     def _has_valid_suffix(self, policy_name: str) -> bool:
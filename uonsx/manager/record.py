@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import copy
+import threading
+from typing import Callable, Iterable
+
+
+class NSXRecord(dict):
+    """
+    Compact copy of an object loaded with `included_fields`
+
+    Reading a field that wasn't loaded fetches the full document once, through
+    `loader`, and fills the record in. So do `in`, iterating, `keys()`,
+    `values()`, `items()` and anything built on them (`dict(record)`,
+    `json.dumps`), and changing the record, so a save never sends the compact
+    copy as if it were the whole object. `len()`, `==` and serializers that read
+    the dict directly (orjson) only see the loaded fields, call `complete()`
+    first when that matters.
+
+    Loaders must read the record with `dict.__getitem__`, a missing field would
+    otherwise try to complete the record again.
+    """
+
+    def __init__(self, data: dict = None, loader: Callable[[NSXRecord], dict] = None):
+        super().__init__(data or {})
+        self._loader = loader
+        self._lock = threading.Lock()
+
+    @classmethod
+    def compact(
+        cls, data: dict, fields: Iterable[str], loader: Callable[[NSXRecord], dict]
+    ) -> NSXRecord:
+        return cls({k: data[k] for k in fields if k in data}, loader)
+
+    def is_complete(self) -> bool:
+        return self._loader is None
+
+    def loaded(self) -> dict:
+        """The fields loaded so far, as a plain dict, without completing the record"""
+        return dict(dict.items(self))
+
+    def clone(self) -> NSXRecord:
+        """Deep copy of the loaded fields, completed the same way as this record"""
+        return NSXRecord(copy.deepcopy(self.loaded()), self._loader)
+
+    def complete(self) -> NSXRecord:
+        """Fetches the full document if it wasn't yet"""
+        if self._loader is None:
+            return self
+        # one fetch per record, other readers wait for it instead of racing it
+        with self._lock:
+            loader = self._loader
+            if loader is not None:
+                dict.update(self, loader(self))
+                self._loader = None
+        return self
+
+    def __reduce__(self):
+        # copies and pickles are whole documents without a loader
+        return (NSXRecord, (dict(self.complete().items()),))
+
+    def __missing__(self, key):
+        if self._loader is None:
+            raise KeyError(key)
+        return dict.__getitem__(self.complete(), key)
+
+    def get(self, key, default=None):
+        if self._loader is not None and not dict.__contains__(self, key):
+            self.complete()
+        return dict.get(self, key, default)
+
+    def __contains__(self, key) -> bool:
+        if dict.__contains__(self, key):
+            return True
+        return dict.__contains__(self.complete(), key)
+
+    def __iter__(self):
+        return dict.__iter__(self.complete())
+
+    def keys(self):
+        return dict.keys(self.complete())
+
+    def values(self):
+        return dict.values(self.complete())
+
+    def items(self):
+        return dict.items(self.complete())
+
+    def __setitem__(self, key, value) -> None:
+        dict.__setitem__(self.complete(), key, value)
+
+    def __delitem__(self, key) -> None:
+        dict.__delitem__(self.complete(), key)
+
+    def setdefault(self, key, default=None):
+        return dict.setdefault(self.complete(), key, default)
+
+    def update(self, *args, **kwargs) -> None:
+        dict.update(self.complete(), *args, **kwargs)
+
+    def pop(self, key, *default):
+        return dict.pop(self.complete(), key, *default)
+
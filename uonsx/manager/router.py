@@ -1,90 +1,83 @@
 from __future__ import annotations
 
-from typing import Union
+from typing import TYPE_CHECKING, Iterator, Union
 
 from uonsx.config import NSXConfig
 from uonsx.error import (NSXInvalidPortProtocolError, NSXServiceNotFoundError,
                          NSXServicePathNotFoundError)
-from uonsx.http import HTTP
+from uonsx.manager.base import BaseManager
+from uonsx.manager.index import NSXIndex
 from uonsx.unit.router import NSXRouter
 from uonsx.util import format_table
 
+if TYPE_CHECKING:
+    from uonsx.nsx import NSX
 
-class NSXRouterManager:
+
+class NSXRouterManager(BaseManager[NSXRouter]):
     """Manager class for NSX Router"""
 
-    __instance = None
-    __data_needs_refreshed = True
+    kind = "router"
+    unit = NSXRouter
 
     @staticmethod
     def get_instance():
-        if NSXRouterManager.__instance == None:
-            raise Exception("NSXRouterManager is not initialized")
-        return NSXRouterManager.__instance
-
-    def __init__(self, cfg: NSXConfig):
-        if NSXRouterManager.__instance != None:
-            raise Exception("use the get_instance() method to use the NSXrouterManager")
-        self.debug = cfg.debug
-        self.debug.print(2, "inititializing router manager")
-        self.http = HTTP.get_instance()
-        self.data = []
-        NSXRouterManager.__instance = self
+        # the manager of the current NSX, see NSX.current()
+        from uonsx.nsx import NSX
+
+        return NSX._build_manager("router")
+
+    def __init__(self, cfg: NSXConfig, nsx: NSX = None):
+        cfg.debug.print(2, "inititializing router manager")
+        super().__init__(cfg, nsx)
         self.debug.print(2, "router manager initialized")
 
-    def _set_refresh(self, flag: bool = True) -> None:
-        self.__data_needs_refreshed = flag
+    def _new_index(self, routers: list[NSXRouter] = None) -> NSXIndex:
+        # tier-0 and tier-1 ids can collide, paths can't
+        return NSXIndex(routers, id_of=lambda r: r.path())
 
-    def _refresh_data(self, force: bool = False):
-        if self.__data_needs_refreshed or force:
-            all_tier0s = self.load_all_tier0s()
-            all_tier1s = self.load_all_tier1s()
-            self.data = all_tier0s + all_tier1s
-            self.__data_needs_refresh = False
+    def iter_all(self) -> Iterator[NSXRouter]:
+        """Query the API and yield every tier0 and then every tier1"""
+        yield from self.iter_all_tier0s()
+        yield from self.iter_all_tier1s()
 
     def get_by_path(self, path: str) -> Union[NSXRouter,str]:
         self._refresh_data()
-        for item in self.data:
-            if item.path == path:
-                return item
+        router = self._index.path(path)
+        if router:
+            return router
         return path
 
-    def load_all_tier0s(self) -> list[NSXRouter]:
-        """Query the API and return a lit of all instances of NSXrouter (tier0)"""
+    def iter_all_tier0s(self) -> Iterator[NSXRouter]:
+        """Query the API and yield instances of NSXRouter (tier0) as each page arrives"""
         self.debug.print(1, f"loading all: tier0s")
 
         endpoint = "policy/api/v1/infra/tier-0s"
 
-        resp = self.http.request(method="GET", endpoint=endpoint)
-        resp_items = resp["results"]
-
-        all_tier0s = [NSXRouter(i) for i in resp_items]
-
-        return all_tier0s
+        yield from self._paginate(endpoint)
 
-    def load_all_tier1s(self) -> list[NSXRouter]:
-        """Query the API and return a lit of all instances of NSXrouter (tier1)"""
+    def iter_all_tier1s(self) -> Iterator[NSXRouter]:
+        """Query the API and yield instances of NSXRouter (tier1) as each page arrives"""
         self.debug.print(1, f"loading all: tier1s")
 
         endpoint = "policy/api/v1/infra/tier-1s"
 
-        resp = self.http.request(method="GET", endpoint=endpoint)
-        resp_items = resp["results"]
+        yield from self._paginate(endpoint)
 
-        all_tier1s = [NSXRouter(i) for i in resp_items]
+    def load_all_tier0s(self) -> list[NSXRouter]:
+        """Query the API and return a lit of all instances of NSXrouter (tier0)"""
+        return list(self.iter_all_tier0s())
 
-        return all_tier1s
+    def load_all_tier1s(self) -> list[NSXRouter]:
+        """Query the API and return a lit of all instances of NSXrouter (tier1)"""
+        return list(self.iter_all_tier1s())
 
     def get(self, name: str) -> Union[NSXRouter, None]:
         """Query the API and return an instance of NSXrouter"""
         self._refresh_data()
         self.debug.print(1, f"getting router: {name}")
 
-        router = None
-        if self.data:
-            for r in self.data:
-                if r.name() == name:
-                    router = r
+        router = self._index.name(name)
 
         if not router:
             return None
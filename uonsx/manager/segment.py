@@ -1,76 +1,58 @@
 from __future__ import annotations
 
-from typing import Union
+from typing import TYPE_CHECKING, Iterator, Union
 
 from uonsx.config import NSXConfig
 from uonsx.error import NSXSegmentNotFoundError
-from uonsx.http import HTTP
+from uonsx.manager.base import BaseManager
 from uonsx.unit.segment import NSXSegment
 from uonsx.unit.bridge_profile import NSXBridgeProfile
 from uonsx.util import format_table
 
+if TYPE_CHECKING:
+    from uonsx.nsx import NSX
 
-class NSXSegmentManager:
+
+class NSXSegmentManager(BaseManager[NSXSegment]):
     """Manager class for NSX Segments"""
 
-    __instance = None
-    __data_needs_refreshed = True
+    kind = "segment"
+    unit = NSXSegment
 
     @staticmethod
     def get_instance():
-        if NSXSegmentManager.__instance == None:
-            raise Exception("NSXSegmentManager is not initialized")
-        return NSXSegmentManager.__instance
-
-
-    def __init__(self, cfg: NSXConfig):
-        if NSXSegmentManager.__instance != None:
-            raise Exception("Use the get_instance() method to use the NSXSegmentManager")
-        self.debug = cfg.debug
-        self.debug.print(2, "Initializing segment manager")
-        self.http = HTTP.get_instance()
-        self.data = []
-        NSXSegmentManager.__instance = self
-        self.debug.print(2, "Segment Manager initialized")
+        # the manager of the current NSX, see NSX.current()
+        from uonsx.nsx import NSX
+
+        return NSX._build_manager("segment")
 
-    def _set_refresh(self, flag: bool = True) -> None:
-        self.__data_needs_refreshed = flag
 
-    def _refresh_data(self, force: bool = False):
-        if self.__data_needs_refreshed or force:
-            all_segments = self.load_all()
-            self.data = all_segments
-            self.__data_needs_refreshed = False
+    def __init__(self, cfg: NSXConfig, nsx: NSX = None):
+        cfg.debug.print(2, "Initializing segment manager")
+        super().__init__(cfg, nsx)
+        self.debug.print(2, "Segment Manager initialized")
 
     def get_by_path(self, path: str) -> Union[NSXSegment,str]:
         self._refresh_data()
-        for item in self.data:
-            if item.path == path:
-                return item
+        segment = self._index.path(path)
+        if segment:
+            return segment
         return path
 
-    def load_all(self) -> list[NSXSegment]:
-        """Query the API and return a list of all instances of NSXSegment"""
+    def iter_all(self) -> Iterator[NSXSegment]:
+        """Query the API and yield instances of NSXSegment as each page arrives"""
         self.debug.print(1, f"loading all: segments")
 
         endpoint = "policy/api/v1/infra/segments"
 
-        resp = self.http.request(method="GET", endpoint=endpoint)
-        resp_items = resp["results"]
-
-        all_segments = [NSXSegment(i) for i in resp_items]
-
-        return all_segments
+        yield from self._paginate(endpoint)
 
     def get(self, name: str) -> Union[NSXSegment, None]:
         """Query the API and return an instance of NSXSegment"""
         self._refresh_data()
         self.debug.print(1, f"getting segment: {name}")
 
-        segment = None
-        for s in self.data:
-            if s.name() == name:
-                segment = s
+        segment = self._index.name(name)
 
         if not segment:
             raise NSXSegmentNotFoundError(name)
@@ -1,69 +1,64 @@
 from __future__ import annotations
 
-from typing import Union
+from typing import TYPE_CHECKING, Iterator, Union
 
 from uonsx.config import NSXConfig
 from uonsx.error import NSXSegmentPortNotFoundError
-from uonsx.http import HTTP
+from uonsx.manager.base import BaseManager
 from uonsx.unit.segment_port import NSXSegmentPort
 from uonsx.util import format_table
 
+if TYPE_CHECKING:
+    from uonsx.nsx import NSX
 
-class NSXSegmentPortManager:
+
+class NSXSegmentPortManager(BaseManager[NSXSegmentPort]):
     """Manager class for NSX Segments"""
 
-    __instance = None
-    __data_needs_refreshed = True
+    kind = "segment_port"
+    unit = NSXSegmentPort
 
     @staticmethod
     def get_instance():
-        if NSXSegmentPortManager.__instance == None:
-            raise Exception("NSXSegmentPortManager is not initialized")
-        return NSXSegmentPortManager.__instance
+        # the manager of the current NSX, see NSX.current()
+        from uonsx.nsx import NSX
+
+        return NSX._build_manager("segment_port")
 
 
-    def __init__(self, cfg: NSXConfig):
-        if NSXSegmentPortManager.__instance != None:
-            raise Exception("Use the get_instance() method to use the NSXSegmentPortManager")
-        self.debug = cfg.debug
-        self.debug.print(2, "Initializing segment port manager")
-        self.http = HTTP.get_instance()
+    def __init__(self, cfg: NSXConfig, nsx: NSX = None):
+        cfg.debug.print(2, "Initializing segment port manager")
+        super().__init__(cfg, nsx)
         self.segment_name = None
-        self.data = []
-        NSXSegmentPortManager.__instance = self
         self.debug.print(2, "Segment Port Manager initialized")
 
     def _set_segment_name(self, segment_name):
+        # the cache only ever holds one segment's ports
+        if segment_name != self.segment_name:
+            self.invalidate()
         self.segment_name = segment_name
 
-    def _set_refresh(self, flag: bool = True) -> None:
-        self.__data_needs_refreshed = flag
-
-    def _refresh_data(self, force: bool = False):
-        if self.__data_needs_refreshed or force:
-            all_segment_ports = self.load_all_ports()
-            self.data = all_segment_ports
-            self.__data_needs_refreshed = False
+    def iter_all(self) -> Iterator[NSXSegmentPort]:
+        return self.iter_all_ports()
 
     def get_by_path(self, path: str) -> Union[NSXSegmentPort,str]:
         self._refresh_data()
-        for item in self.data:
-            if item.path == path:
-                return item
+        port = self._index.path(path)
+        if port:
+            return port
         return path
 
-    def load_all_ports(self) -> list[NSXSegmentPort]:
-        """Query the API and return a list of all instances of NSXSegmentPort"""
+    def iter_all_ports(self) -> Iterator[NSXSegmentPort]:
+        """Query the API and yield instances of NSXSegmentPort as each page arrives"""
         self.debug.print(1, f"loading all: ports for segment {self.segment_name}")
 
         endpoint = f"policy/api/v1/infra/segments/{self.segment_name}/ports"
 
-        resp = self.http.request(method="GET", endpoint=endpoint)
-        resp_items = resp["results"]
-
-        all_segment_ports = [NSXSegmentPort(i) for i in resp_items]
+        yield from self._paginate(endpoint)
 
-        return all_segment_ports
+    def load_all_ports(self) -> list[NSXSegmentPort]:
+        """Query the API and return a list of all instances of NSXSegmentPort"""
+        return list(self.iter_all_ports())
 
     def get_all_ports(self, segment_name: str) -> list[NSXSegmentPort]:
         """Return a list of all instances of NSXSegement"""
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import json
 from pprint import pformat
-from typing import Union
+from typing import TYPE_CHECKING, Iterator, Union
 
 from typing_extensions import Literal
 from uonsx.config import NSXConfig
@@ -15,23 +15,28 @@ from uonsx.error import (
     NSXServicePathNotFoundError,
     NSXServiceRequiredError,
 )
-from uonsx.http import HTTP
+from uonsx.manager.base import DeltaManager
 from uonsx.unit.portprotocol import NSXPortProtocolParser
 from uonsx.unit.service import NSXService
 from uonsx.util import cleanse_display_name, format_table
 
+if TYPE_CHECKING:
+    from uonsx.nsx import NSX
 
-class NSXServiceManager:
+
+class NSXServiceManager(DeltaManager[NSXService]):
     """Manager class for NSX Service"""
 
-    __instance = None
-    __data_needs_refresh = True
+    kind = "service"
+    unit = NSXService
+    resource_type = "Service"
 
     @staticmethod
     def get_instance():
-        if NSXServiceManager.__instance == None:
-            raise Exception("NSXServiceManager is not initialized")
-        return NSXServiceManager.__instance
+        # the manager of the current NSX, see NSX.current()
+        from uonsx.nsx import NSX
+
+        return NSX._build_manager("service")
 
     @staticmethod
     def is_port_protocol(service_name: str) -> bool:
@@ -41,76 +46,63 @@ class NSXServiceManager:
             return True
         return False
 
-    def __init__(self, cfg: NSXConfig):
-        if NSXServiceManager.__instance != None:
-            raise Exception(
-                "use the get_instance() method to use the NSXServiceManager"
-            )
-        self.debug = cfg.debug
-        self.debug.print(2, "initializing service manager")
-        self.http = HTTP.get_instance()
-        self.data = []
-        NSXServiceManager.__instance = self
+    def __init__(self, cfg: NSXConfig, nsx: NSX = None):
+        cfg.debug.print(2, "initializing service manager")
+        super().__init__(cfg, nsx)
         self.debug.print(2, "service manager initialized")
 
-    def _set_refresh(self, flag: bool = True) -> None:
-        self.__data_needs_refresh = flag
-
-    def _refresh_data(self, force: bool = False):
-        if self.__data_needs_refresh or force:
-            all_groups = self.load_all()
-            self.data = all_groups
-            self.__data_needs_refresh = False
+    def _path_prefix(self) -> str:
+        return "/infra/services/"
 
     def _validate_service_not_exists(self, name: str) -> None:
         self._refresh_data()
-        for g in self.data:
-            if g.name() == name:
-                raise NSXServiceAlreadyExistsError(name)
+        # a snapshot may predate objects created elsewhere
+        self._apply_revalidation(wait=True)
+        if name in self._index:
+            raise NSXServiceAlreadyExistsError(name)
 
     def get_by_path(self, path: str) -> Union[NSXService, str]:
-        self._refresh_data()
-        for item in self.data:
-            if item.path() == path:
-                return item
+        if path.startswith(self._path_prefix()):
+            service = self._lookup_path(path, self._path_endpoint(path))
+        else:
+            self._refresh_data()
+            service = self._index.path(path)
+        if service:
+            return service
         return path
 
-    def load_all(self) -> list[NSXService]:
-        """Query the API and return a list of all instances of NSXService"""
+    def iter_all(self) -> Iterator[NSXService]:
+        """Query the API and yield instances of NSXService as each page arrives"""
         self.debug.print(1, f"loading all: service")
 
         endpoint = f"/policy/api/v1/infra/services"
         # TODO(lcrown): refactor endpoints into HTTP class and pull from dict
 
-        resp = self.http.request(method="GET", endpoint=endpoint)
-        resp_items = resp["results"]
+        yield from self._paginate(endpoint)
 
-        all_services = [NSXService(i) for i in resp_items]
-
-        return all_services
+    async def aload_all(self) -> list[NSXService]:
+        """Async version of `load_all`"""
+        endpoint = f"/policy/api/v1/infra/services"
+        return [NSXService(i, nsx=self.nsx) async for i in self.http.async_client().paginate(endpoint)]
 
     def get(self, name: str) -> NSXService:
         """Query the API and return an instance of NSXService, searching by Name"""
-        self._refresh_data()
         self.debug.print(1, f"getting service: {name}")
-        service = None
-        if self.data:
-            for s in self.data:
-                if s.name() == name:
-                    service = s
+        service = self._lookup_name(name)
         if not service:
             raise NSXServiceNotFoundError(name)
         return service
 
+    async def aget(self, name: str) -> NSXService:
+        """Async version of `get`, a cold cache is loaded on the request pool"""
+        if self._is_stale():
+            await self.http.async_client().run(self._refresh_data)
+        return self.get(name)
+
     def get_by_id(self, id: str) -> NSXService:
         """Query the API and return an instance of NSXService, searching by ID"""
-        self._refresh_data()
         self.debug.print(1, f"getting service: {id}")
-        service = None
-        if self.data:
-            for s in self.data:
-                if s.id() == id:
-                    service = s
+        service = self._lookup_id(id, f"/policy/api/v1/infra/services/{id}")
         if not service:
             raise NSXServiceNotFoundError(id)
         return service
@@ -154,14 +146,21 @@ class NSXServiceManager:
         _, data["service_entries"] = self._service_handler(services)
 
         self.debug.print(3, f"service data pre-creation: {data}")
-        service = NSXService(data)
+        service = NSXService(data, nsx=self.nsx)
         service = self._api_create(service)
-        self._set_refresh()
+        self._cache_add(service)
         return service
 
     def _api_create(self, service: NSXService) -> NSXService:
         """Private method to create the service using the API"""
-        self.debug.print(3, pformat(service.dump()))
+        if self.debug.debug_level >= 3:
+            self.debug.print(3, pformat(service.dump()))
+        batch = self.http.active_batch()
+        if batch is not None:
+            # no path until NSX sees it, but rules staged alongside it reference it
+            service.data.setdefault("path", self._path_prefix() + service.id())
+            batch.add_service(service)
+            return service
         endpoint = f"/policy/api/v1/infra/services/{service.id()}"
         try:
             data = self.http.request(
@@ -169,7 +168,7 @@ class NSXServiceManager:
             )
         except NSXServiceAlreadyExistsError:
             raise
-        return NSXService(data)
+        return NSXService(data, nsx=self.nsx)
 
     def delete(self, name: str) -> bool:
         """Destroy an existing NSX Service"""
@@ -179,12 +178,17 @@ class NSXServiceManager:
         service = self.get(name=name)
 
         self._api_delete(service)
-        self._set_refresh()
+        self._cache_remove(service)
         return True
 
     def _api_delete(self, service: NSXService) -> None:
         """Private method to delete the service using the API"""
-        self.debug.print(3, pformat(service.dump()))
+        if self.debug.debug_level >= 3:
+            self.debug.print(3, pformat(service.dump()))
+        batch = self.http.active_batch()
+        if batch is not None:
+            batch.add_service(service, delete=True)
+            return
         endpoint = f"/policy/api/v1/infra/services/{service.id()}"
         # group exists:
         self.http.request(method="DELETE", endpoint=endpoint, data=service.dump())
@@ -264,7 +268,7 @@ class NSXServiceManager:
 
         if self.is_port_protocol(name):
             self.debug.print(3, f"detected port_protocol: {name}")
-            return NSXPortProtocolParser(name).dump()
+            return NSXPortProtocolParser(name, nsx=self.nsx).dump()
 
         if name.upper() == "ANY":
             self.debug.print(3, f"detected ANY: {name}")
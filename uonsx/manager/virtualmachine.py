@@ -1,93 +1,139 @@
 from __future__ import annotations
 
-from typing import Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Iterator, Union
 
 from uonsx.config import NSXConfig
 from uonsx.error import NSXVirtualMachineNotFoundError
-from uonsx.http import HTTP
+from uonsx.manager.base import BaseManager
+from uonsx.manager.index import NSXIndex
+from uonsx.manager.record import NSXRecord
 from uonsx.unit.tag import NSXTag
 from uonsx.unit.virtualmachine import NSXVirtualMachine, NSXVirtualInterface
 from uonsx.unit.group import NSXGroup
 
+if TYPE_CHECKING:
+    from uonsx.nsx import NSX
 
-class NSXVirtualMachineManager:
+
+class NSXVirtualMachineManager(BaseManager[NSXVirtualMachine]):
     """Manager class for NSX Virtual Machines"""
 
-    __instance = None
-    __data_needs_refresh = True
+    kind = "vm"
+    unit = NSXVirtualMachine
+    resource_type = "VirtualMachine"
+    index_fields = ["external_id", "display_name"]
 
     @staticmethod
     def get_instance():
-        if NSXVirtualMachineManager.__instance == None:
-            raise Exception("NSXVirtualMachineManager is not initialized")
-        return NSXVirtualMachineManager.__instance
-
-    def __init__(self, cfg: NSXConfig):
-        if NSXVirtualMachineManager.__instance != None:
-            raise Exception(
-                "use the get_instance() method to use the NSXVirtualMachineManager"
-            )
-        self.debug = cfg.debug
-        self.data = []
-        self.debug.print(2, "initializing virtualmachine manager")
-        self.http = HTTP.get_instance()
-        NSXVirtualMachineManager.__instance = self
+        # the manager of the current NSX, see NSX.current()
+        from uonsx.nsx import NSX
+
+        return NSX._build_manager("vm")
+
+    def __init__(self, cfg: NSXConfig, nsx: NSX = None):
+        cfg.debug.print(2, "initializing virtualmachine manager")
+        self._vifs = []
+        self._vifs_by_owner = {}
+        self._vifs_by_ip = {}
+        # both follow the load of the vm inventory they were built for
+        self._vifs_generation = None
+        self._group_names = (None, {})
+        super().__init__(cfg, nsx)
         self.debug.print(2, "virtualmachine manager initialized")
 
-    def _set_refresh(self, flag: bool = True) -> None:
-        self.__data_needs_refresh = flag
-
-    def _refresh_data(self, force: bool = False) -> None:
-        if self.__data_needs_refresh or force:
-            all_virtualmachines = self.load_all()
-            self.data = all_virtualmachines
-            self.__data_needs_refresh = False
+    def _refresh_vifs(self, force: bool = False) -> None:
+        # vifs follow the vm inventory they were loaded for, a reload of the vms
+        # reloads them. Tag changes publish new copies of single vms and don't.
+        self._refresh_data()
+        if not force and self._vifs_generation == self._generation:
+            return
+        with self._lock:
+            if not force and self._vifs_generation == self._generation:
+                return
+            vifs = self.load_all_vifs()
+            by_owner = {}
+            by_ip = {}
+            for vif in vifs:
+                by_owner.setdefault(vif.owner_vm_id(), []).append(vif)
+                for ipaddr in vif.ip_addresses():
+                    by_ip.setdefault(ipaddr, []).append(vif)
+            self._vifs = vifs
+            self._vifs_by_owner = by_owner
+            self._vifs_by_ip = by_ip
+            self._vifs_generation = self._generation
+
+    def _new_index(self, virtualmachines: list[NSXVirtualMachine] = None) -> NSXIndex:
+        # host_id is shared by every vm on a host, external_id is the vm's own id
+        return NSXIndex(
+            virtualmachines,
+            id_of=lambda vm: vm.external_id(),
+            path_of=lambda vm: None,
+        )
+
+    def _full_document(self, record: NSXRecord) -> dict:
+        endpoint = self.http._add_query(
+            "/api/v1/fabric/virtual-machines", {"external_id": dict.__getitem__(record, "external_id")}
+        )
+        results = self.http.request(method="GET", endpoint=endpoint).get("results", [])
+        return results[0] if results else {}
 
     def _get_id(self, name: str) -> Union[str, None]:
         self._refresh_data()
         self.debug.print(2, f"getting id for virtualmachine name: {name}")
-        if self.data:
-            for item in self.data:
-                if item.name() == name:
-                    self.debug.print(2, f"found id for virtualmachine name: {name}")
-                    return item.id()
+        vm = self._index.name(name)
+        if vm:
+            self.debug.print(2, f"found id for virtualmachine name: {name}")
+            return vm.id()
         self.debug.print(2, f"did not find id for virtualmachine name: {name}")
         return None
 
-    def load_all(self) -> list[NSXVirtualMachine]:
+    def iter_all(self) -> Iterator[NSXVirtualMachine]:
         """
-        Query the API and return a list of all instances of NSXVirtualMachine
+        Query the API and yield instances of NSXVirtualMachine as each page arrives
         """
         self.debug.print(1, f"getting all: virtualmachine")
 
         endpoint = f"/api/v1/fabric/virtual-machines"
 
-        resp = self.http.request(method="GET", endpoint=endpoint)
-        resp_items = resp["results"]
+        yield from self._paginate(endpoint)
 
-        virtualmachines = [NSXVirtualMachine(i) for i in resp_items]
-
-        return virtualmachines
+    async def aload_all(self) -> list[NSXVirtualMachine]:
+        """Async version of `load_all`"""
+        endpoint = f"/api/v1/fabric/virtual-machines"
+        return [
+            NSXVirtualMachine(i, nsx=self.nsx)
+            async for i in self.http.async_client().paginate(endpoint)
+        ]
 
     def get(self, name: str) -> NSXVirtualMachine:
         """
         Query the API and return an instance of NSXVirtualMachine
         """
 
-        self._refresh_data()
         self.debug.print(1, f"getting virtualmachine: {name}")
 
         # unlike policies, virtualmachines are fully-loaded when using `get_all()`
-        virtualmachine = None
-        if self.data:
-            for vm in self.data:
-                if vm.name() == name:
-                    virtualmachine = vm
+        virtualmachine = self._lookup_name(name)
 
         if not virtualmachine:
             raise NSXVirtualMachineNotFoundError(name)
 
-        return virtualmachine
+        return self._copy(virtualmachine)
+
+    async def aget(self, name: str) -> NSXVirtualMachine:
+        """Async version of `get`, a cold cache is loaded on the request pool"""
+        if self._is_stale():
+            await self.http.async_client().run(self._refresh_data)
+        return self.get(name)
+
+    def get_by_external_id(self, external_id: str) -> NSXVirtualMachine:
+        """Return the instance of NSXVirtualMachine with the given external_id"""
+        self._refresh_data()
+        virtualmachine = self._index.id(external_id)
+        if not virtualmachine:
+            raise NSXVirtualMachineNotFoundError(external_id)
+        return self._copy(virtualmachine)
 
     def get_all(self) -> list[NSXVirtualMachine]:
         """
@@ -104,8 +150,8 @@ class NSXVirtualMachineManager:
         endpoint = f"/api/v1/fabric/virtual-machines?action=add_tags"
         data = {"external_id": virtualmachine.external_id(), "tags": [tag.tag_dict()]}
         self.http.request(method="POST", endpoint=endpoint, data=data)
-        self._set_refresh()
-
+        self._group_name_cache().pop(virtualmachine.external_id(), None)
+        self._patch_tags(virtualmachine, add=tag.tag_dict())
 
     def remove_tag(self, virtualmachine: NSXVirtualMachine, tag: NSXTag):
         self._refresh_data()
@@ -113,23 +159,118 @@ class NSXVirtualMachineManager:
         endpoint = f"/api/v1/fabric/virtual-machines?action=remove_tags"
         data = {"external_id": virtualmachine.external_id(), "tags": [tag.tag_dict()]}
         self.http.request(method="POST", endpoint=endpoint, data=data)
-        self._set_refresh()
+        self._group_name_cache().pop(virtualmachine.external_id(), None)
+        self._patch_tags(virtualmachine, remove=tag.tag_dict())
+
+    def _patch_tags(
+        self, virtualmachine: NSXVirtualMachine, add: dict = None, remove: dict = None
+    ) -> None:
+        """
+        Publishes a copy of the cached virtual machine with the tag change instead
+        of reloading every VM, the tag actions don't return the updated object
+        """
+
+        def retagged(vm: NSXVirtualMachine) -> NSXVirtualMachine:
+            tags = [t for t in vm.data.get("tags", []) if t != remove]
+            if add is not None and add not in tags:
+                tags.append(add)
+            return self._copy(vm, tags=tags)
+
+        cached = self._index.id(virtualmachine.external_id())
+        if cached is not None:
+            self._cache_replace(retagged(cached))
+        if virtualmachine is not cached:
+            virtualmachine.data = retagged(virtualmachine).data
+
+    def iter_all_vifs(self) -> Iterator[NSXVirtualInterface]:
+        """
+        Query the API and yield instances of NSXVirtualInterface as each page arrives
+        """
+        self.debug.print(1, f"loading all: vif")
+
+        endpoint = f"/api/v1/fabric/vifs"
+
+        for i in self.http.paginate(endpoint):
+            yield NSXVirtualInterface(i)
+
+    def load_all_vifs(self) -> list[NSXVirtualInterface]:
+        """
+        Query the API and return a list of all instances of NSXVirtualInterface
+        """
+        return list(self.iter_all_vifs())
 
     def all_vifs(self) -> list[NSXVirtualInterface]:
+        """Return a list of all instances of NSXVirtualInterface"""
+        self._refresh_vifs()
+        return self._vifs
+
+    def vifs(self, virtualmachine: NSXVirtualMachine) -> list[NSXVirtualInterface]:
+        """Returns the virtual interfaces owned by the VM"""
+        self._refresh_vifs()
+        return self._vifs_by_owner.get(virtualmachine.external_id(), [])
+
+    def vifs_by_ip_address(self, ip_address: str) -> list[NSXVirtualInterface]:
+        """Returns the virtual interfaces that report the given IP address"""
+        self._refresh_vifs()
+        return self._vifs_by_ip.get(ip_address, [])
+
+    def get_by_ip_address(self, ip_address: str) -> list[NSXVirtualMachine]:
+        """Returns the VMs with an interface reporting the given IP address"""
+        self._refresh_vifs()
+        out = []
+        for vif in self._vifs_by_ip.get(ip_address, []):
+            vm = self._index.id(vif.owner_vm_id())
+            if vm and vm not in out:
+                out.append(vm)
+        return out
+
+    def _group_name_cache(self) -> dict[str, list[str]]:
+        """Group associations by vm external_id, for the current vm inventory"""
         self._refresh_data()
-        endpoint = f"/api/v1/fabric/vifs"
-        return [NSXVirtualInterface(i) for i in self.http.request(method="POST", endpoint=endpoint)["results"]]
+        generation, group_names = self._group_names
+        if generation != self._generation:
+            group_names = {}
+            self._group_names = (self._generation, group_names)
+        return group_names
+
+    def _load_group_names(self, external_id: str) -> list[str]:
+        endpoint = f"/policy/api/v1/infra/virtual-machine-group-associations?vm_external_id={external_id}"
+        return [i["target_display_name"] for i in self.http.paginate(endpoint)]
 
     def group_name_list(self, virtualmachine: NSXVirtualMachine) -> list[str]:
         """Returns a list of Group names that this VM is a member of"""
-        self._refresh_data()
-        endpoint = f"/policy/api/v1/infra/virtual-machine-group-associations?vm_external_id={virtualmachine.external_id()}"
-        return [i["target_display_name"] for i in self.http.request(method="GET", endpoint=endpoint)["results"]]
+        group_names = self._group_name_cache()
+        external_id = virtualmachine.external_id()
+        if external_id not in group_names:
+            group_names[external_id] = self._load_group_names(external_id)
+        return list(group_names[external_id])
+
+    def warm_group_associations(
+        self, virtualmachines: list[NSXVirtualMachine] = None, max_workers: int = 8
+    ) -> None:
+        """
+        Load the group associations of many VMs (default: all VMs) at once,
+        with at most `max_workers` requests in flight, so later calls to
+        `group_name_list`/`group_list` are answered from the cache
+        """
+        group_names = self._group_name_cache()
+        if virtualmachines is None:
+            virtualmachines = self.data
+        external_ids = []
+        for vm in virtualmachines:
+            if vm.external_id() not in group_names and vm.external_id() not in external_ids:
+                external_ids.append(vm.external_id())
+        self.debug.print(1, f"loading group associations for {len(external_ids)} vms")
+        if not external_ids:
+            return
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = pool.map(self._load_group_names, external_ids)
+            for external_id, names in zip(external_ids, results):
+                group_names[external_id] = names
 
     def group_list(self, virtualmachine: NSXVirtualMachine) -> list[NSXGroup]:
         """Returns a list of NSXGroup objects that this VM is a member of"""
-        from uonsx.manager.group import NSXGroupManager
-        self._group_manager = NSXGroupManager.get_instance()
+        self._group_manager = self._manager("group")
         self._refresh_data()
         return [self._group_manager.get(name) for name in self.group_name_list(virtualmachine)]
 
@@ -1,24 +1,39 @@
 from __future__ import annotations
 
-from multiprocessing import Pool
+import importlib
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import Union
 
 from uonsx.config import NSXConfig
+from uonsx.error import NSXGenericError
 from uonsx.http import HTTP
-from uonsx.manager.bridge_profile import NSXBridgeProfileManager
-from uonsx.manager.expression import NSXExpressionManager
-from uonsx.manager.group import NSXGroupManager
-from uonsx.manager.policy import NSXPolicyManager
-from uonsx.manager.router import NSXRouterManager
-from uonsx.manager.segment import NSXSegmentManager
-from uonsx.manager.segment_port import NSXSegmentPortManager
-from uonsx.manager.service import NSXServiceManager
-from uonsx.manager.virtualmachine import NSXVirtualMachineManager
-from uonsx.manager.tool import NSXToolManager
 
+# the NSX selected with `NSX.use()` in this thread or task
+_active_nsx: ContextVar = ContextVar("uonsx_nsx", default=None)
 
 
 class NSX:
+    # attribute name -> (module, class) of each manager. Managers (and the unit
+    # modules they pull in) are only imported and built on first access.
+    managers = {
+        "vm": ("uonsx.manager.virtualmachine", "NSXVirtualMachineManager"),
+        "policy": ("uonsx.manager.policy", "NSXPolicyManager"),
+        "expression": ("uonsx.manager.expression", "NSXExpressionManager"),
+        "group": ("uonsx.manager.group", "NSXGroupManager"),
+        "service": ("uonsx.manager.service", "NSXServiceManager"),
+        "router": ("uonsx.manager.router", "NSXRouterManager"),
+        "segment": ("uonsx.manager.segment", "NSXSegmentManager"),
+        "segment_port": ("uonsx.manager.segment_port", "NSXSegmentPortManager"),
+        "bridge_profile": ("uonsx.manager.bridge_profile", "NSXBridgeProfileManager"),
+        "tools": ("uonsx.manager.tool", "NSXToolManager"),
+    }
+
+    # the most recently constructed NSX, what NSX.current() falls back to when
+    # no NSX was selected with use()
+    _current = None
+
     def __init__(
         self,
         server: str,
@@ -29,7 +44,25 @@ class NSX:
         enforce_convention: bool = True,
         require_ipaddress_for_groups: bool = True,
         mock: bool = False,
+        page_size: int = None,
+        pool_size: int = None,
+        max_retries: int = None,
+        keep_alive: bool = None,
+        auth_method: str = None,
+        full_reload_interval: int = None,
+        cache: bool = None,
+        cache_ttl: int = None,
+        cache_dir: str = None,
+        cache_refresh: bool = False,
+        json_codec: str = None,
+        retry_post: bool = None,
+        rate_limit: float = None,
+        rate_burst: int = None,
+        max_concurrency: int = None,
+        prefetch: Union[bool, list[str]] = False,
+        prefetch_workers: int = 4,
     ):
+        self._manager_lock = threading.RLock()
         self.cfg = NSXConfig(
             server=server,
             username=username,
@@ -39,19 +72,144 @@ class NSX:
             enforce_convention=enforce_convention,
             require_ipaddress_for_groups=require_ipaddress_for_groups,
             mock=mock,
+            page_size=page_size,
+            pool_size=pool_size,
+            max_retries=max_retries,
+            keep_alive=keep_alive,
+            auth_method=auth_method,
+            full_reload_interval=full_reload_interval,
+            cache=cache,
+            cache_ttl=cache_ttl,
+            cache_dir=cache_dir,
+            cache_refresh=cache_refresh,
+            json_codec=json_codec,
+            retry_post=retry_post,
+            rate_limit=rate_limit,
+            rate_burst=rate_burst,
+            max_concurrency=max_concurrency,
         )
         self.http = HTTP(self.cfg)
-        self.vm = NSXVirtualMachineManager(self.cfg)
-        self.policy = NSXPolicyManager(self.cfg)
-        self.expression = NSXExpressionManager(self.cfg)
-        self.group = NSXGroupManager(self.cfg)
-        self.service = NSXServiceManager(self.cfg)
-        self.router = NSXRouterManager(self.cfg)
-        self.segment = NSXSegmentManager(self.cfg)
-        self.segment_port = NSXSegmentPortManager(self.cfg)
-        self.bridge_profile = NSXBridgeProfileManager(self.cfg)
-        self.tools = NSXToolManager()
+        NSX._current = self
+        if prefetch:
+            managers = None if prefetch is True else prefetch
+            self.prefetch(managers=managers, max_workers=prefetch_workers)
+
+    # managers that can load their whole inventory without extra arguments
+    prefetchable = [
+        "group",
+        "policy",
+        "service",
+        "vm",
+        "router",
+        "segment",
+        "bridge_profile",
+    ]
+
+    def __getattr__(self, name: str):
+        # only called for attributes that don't exist yet
+        if name not in NSX.managers:
+            raise AttributeError(f"'NSX' object has no attribute '{name}'")
+        with self._manager_lock:
+            # another thread may have built it while we waited on the lock
+            if name in self.__dict__:
+                return self.__dict__[name]
+            module_name, class_name = NSX.managers[name]
+            self.cfg.debug.print(2, f"loading manager: {name}")
+            manager_class = getattr(importlib.import_module(module_name), class_name)
+            manager = manager_class() if name == "tools" else manager_class(self.cfg, nsx=self)
+            setattr(self, name, manager)
+            return manager
+
+    def batch(self):
+        """
+        Returns a batch that collects group, service, policy and rule changes made
+        inside its `with` block and sends them to NSX as a single request
+
+            with nsx.batch():
+                policy = nsx.policy.create(...)
+                for rule in rules:
+                    policy.add_rule(...)
+        """
+        from uonsx.batch import NSXBatch
+
+        return NSXBatch(self.http, nsx=self)
+
+    @staticmethod
+    def current() -> NSX:
+        """
+        Returns the NSX that code without a reference to one should use, the one
+        selected with `use()` or else the most recently constructed
+        """
+        nsx = _active_nsx.get()
+        if nsx is None:
+            nsx = NSX._current
+        if nsx is None:
+            raise NSXGenericError("no NSX connection has been created")
+        return nsx
+
+    @contextmanager
+    def use(self):
+        """
+        Makes this NSX the current one inside the `with` block, for the calling
+        thread or task only
+
+            with other_nsx.use():
+                group = NSXGroupManager.get_instance().get("nts-nms")
+        """
+        token = _active_nsx.set(self)
+        try:
+            yield self
+        finally:
+            _active_nsx.reset(token)
+
+    @staticmethod
+    def _build_manager(name: str):
+        """Returns the named manager of the current NSX, building it if needed"""
+        return getattr(NSX.current(), name)
+
+    def prefetch(self, managers: list[str] = None, max_workers: int = 4) -> None:
+        """
+        Warm the caches of the given managers (default: all prefetchable managers)
+        concurrently, so the total wait is the slowest inventory instead of the sum
+        """
+        if managers is None:
+            managers = self.prefetchable
+        for name in managers:
+            if name not in self.prefetchable:
+                raise NSXGenericError(
+                    f"manager '{name}' not in prefetchable managers: {self.prefetchable}"
+                )
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.cfg.debug.print(1, f"prefetching: {', '.join(managers)}")
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(getattr(self, name)._refresh_data) for name in managers]
+            # surface the first failure instead of leaving a cache half-warm silently
+            for future in futures:
+                future.result()
+
+    def cache_stats(self) -> dict:
+        """Returns the cache size, age and hit/miss counts of every manager built so far"""
+        return {
+            name: self.__dict__[name].cache_stats()
+            for name in NSX.managers
+            if name in self.__dict__ and hasattr(self.__dict__[name], "cache_stats")
+        }
+
+    def close(self) -> None:
+        """Writes out changed cache snapshots, ends the API session and closes the pooled connections"""
+        for name in NSX.managers:
+            manager = self.__dict__.get(name)
+            if hasattr(manager, "flush_snapshot"):
+                manager.flush_snapshot()
+        self.http.close()
+
+    def __enter__(self) -> NSX:
+        return self
 
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.close()
+        return False
 
     def __str__(self):
         return self.cfg.__str__()
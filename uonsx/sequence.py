@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right, insort
+from typing import Iterable, Union
+
+
+class NSXSequenceAllocator:
+    """
+    Picks sequence numbers for policies in a category or rules in a policy
+
+    Keeps the numbers in use sorted so a new number can be placed halfway between
+    its neighbours with a binary search. When two neighbours are adjacent there is
+    no number left between them, `make_room()` then plans the smallest renumbering
+    that opens a gap instead of respacing everything.
+    """
+
+    def __init__(self, numbers: Iterable[int] = (), padding: int = 10):
+        self.numbers = sorted(int(n) for n in numbers)
+        self.padding = padding
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def __contains__(self, n: int) -> bool:
+        i = bisect_left(self.numbers, n)
+        return i < len(self.numbers) and self.numbers[i] == n
+
+    def add(self, n: int) -> None:
+        insort(self.numbers, n)
+
+    def remove(self, n: int) -> None:
+        i = bisect_left(self.numbers, n)
+        if i < len(self.numbers) and self.numbers[i] == n:
+            del self.numbers[i]
+
+    def position(self, n: int) -> int:
+        """
+        Returns the index a new item numbered `n` would be placed at, in front of
+        every item already numbered `n`. A number can't tell tied items apart,
+        place by index to go between them.
+        """
+        return bisect_left(self.numbers, n)
+
+    def next(self) -> int:
+        """Returns a number after every number in use"""
+        if not self.numbers:
+            return self.padding
+        return self.numbers[-1] + self.padding
+
+    def gap(self, position: int) -> Union[int, None]:
+        """
+        Returns the midpoint between the numbers either side of `position`,
+        or None if they are adjacent
+        """
+        if position >= len(self.numbers):
+            return self.next()
+        lower = self.numbers[position - 1] if position > 0 else -1
+        upper = self.numbers[position]
+        mid = (lower + upper) // 2
+        return mid if lower < mid < upper else None
+
+    def before(self, n: int) -> Union[int, None]:
+        """Returns a free number directly in front of `n`, or None if there is no room"""
+        return self.gap(bisect_left(self.numbers, n))
+
+    def after(self, n: int) -> Union[int, None]:
+        """Returns a free number directly after `n`, or None if there is no room"""
+        return self.gap(bisect_right(self.numbers, n))
+
+    def make_room(self, position: int) -> tuple[int, dict[int, int]]:
+        """
+        Plans a renumbering that opens a gap at `position`
+
+        Returns the number for the new item and the new numbers for the items that
+        have to move, as {index: new number}. Only the run of tightly packed
+        numbers starting at `position` moves, spread out up to the next gap wide
+        enough to hold them (or past the end of the list).
+        """
+        gap = self.gap(position)
+        if gap is not None:
+            return gap, {}
+        lower = self.numbers[position - 1] if position > 0 else -1
+        end = position
+        while True:
+            end += 1
+            count = end - position + 1  # the moved items plus the new one
+            if end >= len(self.numbers):
+                step = self.padding
+                break
+            upper = self.numbers[end]
+            # every item needs a free number on both sides to be worth moving to
+            if upper - lower > 2 * count:
+                step = (upper - lower) // (count + 1)
+                break
+        new_numbers = [lower + step * (i + 1) for i in range(count)]
+        plan = {
+            position + i: n
+            for i, n in enumerate(new_numbers[1:])
+            if self.numbers[position + i] != n
+        }
+        return new_numbers[0], plan
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Union
+
+
+class NSXRetryPolicy:
+    """
+    Decides whether a response from NSX should be retried and how long to wait first
+
+    429 means NSX rejected the request before doing anything, so it is always
+    safe to retry. Other throttling and gateway errors are only retried for
+    idempotent methods, POST (which NSX uses for actions like add_tags) only
+    when `retry_post` is set.
+    """
+
+    # PATCH is declarative in the Policy API, sending it twice is the same as once
+    idempotent_methods = ["GET", "PUT", "PATCH", "DELETE"]
+    retry_statuses = [429, 502, 503, 504]
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        retry_post: bool = False,
+        max_retry_after: float = 120.0,
+    ):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_post = retry_post
+        self.max_retry_after = max_retry_after
+
+    def can_retry(self, method: str, status_code: int) -> bool:
+        if status_code not in self.retry_statuses:
+            return False
+        if status_code == 429:
+            return True
+        if method.upper() == "POST":
+            return self.retry_post
+        return method.upper() in self.idempotent_methods
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter, so parallel clients don't retry in lockstep"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def retry_after(self, headers: dict) -> Union[float, None]:
+        """Returns the Retry-After header in seconds (it may be a number or an HTTP date)"""
+        value = headers.get("Retry-After")
+        if value is None:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                seconds = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return min(max(0.0, seconds), self.max_retry_after)
+
+    def delay(
+        self, method: str, status_code: int, headers: dict, attempt: int
+    ) -> Union[float, None]:
+        """Returns seconds to wait before retry number `attempt`, or None to stop retrying"""
+        if attempt >= self.max_retries or not self.can_retry(method, status_code):
+            return None
+        retry_after = self.retry_after(headers)
+        if retry_after is not None:
+            return retry_after
+        return self.backoff(attempt)
+
+
+class NSXTokenBucket:
+    """
+    Client-side rate limiter, `rate` requests per second with bursts of up to `burst`
+
+    NSX Manager enforces a per-user request rate, waiting here is cheaper than
+    being answered with 429 and backing off. A rate of 0 disables the bucket.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Takes a token, sleeping until one is available. Returns the time waited."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # reserve the token now and wait for it outside the lock, callers
+            # are served in the order they arrived
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+class NSXConcurrencyLimiter:
+    """
+    Caps the number of requests in flight to NSX and adapts the cap AIMD-style
+
+    Every successful response grows the window by 1/window (about one extra
+    slot per window's worth of requests). A throttled or failed response, or one
+    much slower than the recent average, halves it, at most once per round trip
+    so a burst of 429s from one overload only counts once.
+    """
+
+    throttle_statuses = [429, 503]
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        initial_limit: int = None,
+        latency_tolerance: float = 3.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        if initial_limit is None:
+            initial_limit = max(self.min_limit, self.max_limit // 2)
+        self.limit = float(initial_limit)
+        self.latency_tolerance = latency_tolerance
+        self._clock = clock
+        self._in_flight = 0
+        self._avg_latency = None
+        self._last_decrease = None
+        self._requests = 0
+        self._throttled = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        """Blocks until a slot in the window is free"""
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, latency: float, status_code: Union[int, None]) -> None:
+        """Frees a slot and adapts the window. A status of None means the request failed."""
+        with self._cond:
+            self._in_flight -= 1
+            self._requests += 1
+            throttled = status_code is None or status_code in self.throttle_statuses
+            slow = not throttled and self._is_slow(latency)
+            if throttled:
+                self._throttled += 1
+            else:
+                self._observe_latency(latency)
+
+            if throttled or slow:
+                self._decrease()
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def _observe_latency(self, latency: float) -> None:
+        if self._avg_latency is None:
+            self._avg_latency = latency
+        else:
+            self._avg_latency = 0.9 * self._avg_latency + 0.1 * latency
+
+    def _is_slow(self, latency: float) -> bool:
+        if self._avg_latency is None:
+            return False
+        return latency > self._avg_latency * self.latency_tolerance
+
+    def _decrease(self) -> None:
+        now = self._clock()
+        round_trip = self._avg_latency or 0.0
+        if self._last_decrease is not None and now - self._last_decrease < round_trip:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit / 2)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self._in_flight,
+                "requests": self._requests,
+                "throttled": self._throttled,
+                "throttle_rate": self._throttled / self._requests if self._requests else 0.0,
+                "avg_latency": self._avg_latency or 0.0,
+            }
@@ -10,67 +10,71 @@
 #   scope for those groups
 #
 from __future__ import annotations
+
+import asyncio
 from typing import TYPE_CHECKING
 
+from uonsx.error import NSXGroupPathNotFoundError, NSXInvalidGroupError
+
 if TYPE_CHECKING:
     from uonsx import NSX
+    from uonsx.unit.group import NSXGroup
+    from uonsx.unit.policy import NSXPolicy
     from uonsx.unit.rule import NSXRule
 
 
-def site_rules(nsx: NSX) -> list[NSXRule]:
-    rules = []
-    return rules
+def _rule_group_paths(rule: NSXRule) -> list[str]:
+    return rule.source_group_paths() + rule.destination_group_paths()
 
-from pprint import pprint
 
-def rule_scope(nsx: NSX, fix: bool = False) -> None:
-    gc = {}
-    group = nsx.group.get("mem_lctest-guest1_DATA")
-    print(group.check_native())
-    # question for tomorrow:
-    # Effective Members -> IP Addresses is holding on to an old IP address
-    # how do i remove that? the host no longer has that IP
-    return
-    # group_vms = group.virtual_machines()
-    # group_ipaddrs = group.ip_addresses()
-        # figure out way to get a list of VM objects from group tag
-        # then compare those objects to the list of IPs
-        # if it all checks out, return True, otherwise as soon as somehting fails, return False
+async def _check_groups(nsx: NSX, paths: set[str]) -> dict[str, bool]:
+    """Returns {group_path: is_native} for every path, checking all groups concurrently"""
+    # one load on the request pool, a cold cache would otherwise GET each path
+    # one at a time on the event loop
+    await nsx.http.async_client().run(nsx.group.get_all)
+    groups: dict[str, NSXGroup] = {}
+    for path in paths:
+        try:
+            groups[path] = nsx.group.get_by_path(path)
+        except (NSXGroupPathNotFoundError, NSXInvalidGroupError):
+            # "ANY", bare CIDRs and unknown paths can't be native
+            continue
+    results = await asyncio.gather(*(g.acheck_native() for g in groups.values()))
+    return dict(zip(groups.keys(), results))
 
-    pprint(group.dump())
-    return
 
-    cache = {}  # group_path: {group: nsxgroup, ipaddrs: [], vms: []}
-    policies = nsx.policy.get_all()
+async def arule_scope(nsx: NSX, fix: bool = False) -> list[tuple[NSXPolicy, NSXRule]]:
+    """
+    Returns every (policy, rule) whose source and destination groups are all native,
+    setting each rule's scope to those groups when `fix` is True
+    """
+    client = nsx.http.async_client()
+    policies = await asyncio.gather(
+        *(nsx.policy.aget(p.name()) for p in await client.run(nsx.policy.get_all))
+    )
+    paths = {p for policy in policies for rule in policy.rules() for p in _rule_group_paths(rule)}
+    nsx.group.debug.print(1, f"checking {len(paths)} groups for native membership")
+    native = await _check_groups(nsx, paths)
+
+    found = []
     for policy in policies:
-        policy._reload_rules()
+        changed = []
         for rule in policy.rules():
-            # number of vms found with tag matching group
-            # has to equal the number of IP addr sources
-            # those IPs have to match the VMs in the group
-            # if "/" in any of the ip addrs, skip the group
-            all_groups = []
-            for group_path in rule.source_group_paths():
-                if group_path in cache:
-                    group = cache[group_path]
-                    all_groups.append(group)
-                    continue
-                if group_path.startswith("/"):
-                    group = nsx.group.get_by_path(group_path)
-                    all_groups.append(group)
-            for group_path in rule.destination_group_paths():
-                if group_path in cache:
-                    group = cache[group_path]
-                    all_groups.append(group)
-                    continue
-                if group_path.startswith("/"):
-                    group = nsx.group.get_by_path(group_path)
-                    all_groups.append(group)
+            rule_paths = _rule_group_paths(rule)
+            if not rule_paths or not all(native.get(p, False) for p in rule_paths):
+                continue
+            found.append((policy, rule))
+            scope = sorted(set(rule_paths))
+            if fix and sorted(rule.scope()) != scope:
+                # rules wrap the policy's own rule dicts, so this edits the policy
+                rule.data["scope"] = scope
+                changed.append(rule)
+        if changed:
+            # only the rules that changed, not the whole policy
+            await client.run(policy._save_rules, changed)
+    return found
 
-            all_native = True
-            for group in all_groups:
-                if not group.check_native():
-                    all_native = False
 
-            if all_native:
-                print(all_groups)
+def rule_scope(nsx: NSX, fix: bool = False) -> None:
+    for policy, rule in asyncio.run(arule_scope(nsx, fix)):
+        print(f"{policy.name()}: {rule.name()} -> {', '.join(sorted(set(_rule_group_paths(rule))))}")
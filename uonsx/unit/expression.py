@@ -4,17 +4,18 @@ import json
 from typing import Union
 
 from uonsx.error import NSXExpressionIPAddressNotFoundError, NSXGenericError
+from uonsx.nsx import NSX
+from uonsx.util import IPParser, IPSet
 
 
 class NSXExpression:
     """Wrapper for an NSX Expression"""
 
-    def __init__(self, data: dict):
-        from uonsx.manager.expression import NSXExpressionManager
-
+    def __init__(self, data: dict, nsx: NSX = None):
         self.data = data
-        self._expression_manager = NSXExpressionManager.get_instance()
-        self.debug = self._expression_manager.debug
+        self.nsx = nsx or NSX.current()
+        # built by the expression manager itself, so don't ask for it here
+        self.debug = self.nsx.cfg.debug
 
     def __bool__(self) -> bool:
         return True if self.data else False
@@ -40,6 +41,10 @@ class NSXExpression:
     def ip_addresses(self) -> list[str]:
         return self.data.get("ip_addresses", [])
 
+    def ipset(self) -> IPSet:
+        """Returns the expression's addresses, CIDRs and ranges as an IPSet"""
+        return IPSet(self.ip_addresses())
+
     def _is_ipaddressexpression(self) -> bool:
         if self.type() == "IPAddressExpression":
             return True
@@ -68,9 +73,15 @@ class NSXExpression:
         if isinstance(ipaddress, str):
             ipaddress = [ipaddress]
         for ipaddr in ipaddress:
-            try:
-                self.data["ip_addresses"].remove(ipaddr)
-            except:
+            # compare parsed values so "10.0.0.0/24" matches "10.0.0.0/024" etc.
+            target = IPParser.parse(ipaddr) if IPParser.is_ip(ipaddr) else ipaddr
+            for existing in self.data["ip_addresses"]:
+                if existing == ipaddr or (
+                    IPParser.is_ip(existing) and IPParser.parse(existing) == target
+                ):
+                    self.data["ip_addresses"].remove(existing)
+                    break
+            else:
                 raise NSXExpressionIPAddressNotFoundError(ipaddr)
 
     def clear_ipaddresses(self):
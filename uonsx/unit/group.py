@@ -9,11 +9,12 @@ from typing import Union
 
 from typing_extensions import Literal
 from uonsx.error import (NSXExpressionIPAddressNotFoundError,
-                         NSXExpressionsTooComplicatedError, NSXGenericError)
-from uonsx.manager.expression import NSXExpressionManager
+                         NSXExpressionsTooComplicatedError, NSXGenericError,
+                         NSXInvalidIPAddressError)
+from uonsx.nsx import NSX
 from uonsx.unit.expression import NSXExpression
 from uonsx.unit.virtualmachine import NSXVirtualMachine
-from uonsx.util import format_table
+from uonsx.util import IPParser, IPSet, format_table
 
 
 class NSXGroup:
@@ -36,12 +37,11 @@ class NSXGroup:
         "_revision":0
     }
     """
-    def __init__(self, data: dict):
+    def __init__(self, data: dict, nsx: NSX = None):
         self.data = data
-        from uonsx.manager.group import NSXGroupManager
-
-        self._group_mgr = NSXGroupManager.get_instance()
-        self._expression_mgr = NSXExpressionManager.get_instance()
+        self.nsx = nsx or NSX.current()
+        self._group_mgr = self.nsx.group
+        self._expression_mgr = self.nsx.expression
         self.http = self._group_mgr.http
         self.debug = self._group_mgr.debug
 
@@ -61,7 +61,7 @@ class NSXGroup:
         return self.data.get("expression", "")
 
     def expression_list(self) -> list[NSXExpression]:
-        return [NSXExpression(e) for e in self.expression()]
+        return [NSXExpression(e, nsx=self.nsx) for e in self.expression()]
 
     def id(self) -> str:
         return self.data.get("id", self.name())
@@ -82,9 +82,24 @@ class NSXGroup:
         return pformat(self.data)
 
     def has_ip_address(self, ip_address: str) -> bool:
-        if ip_address in self.ip_addresses():
-            return True
-        return False
+        """
+        Returns True if the address/CIDR is covered by the group's effective members,
+        so a CIDR inside a larger range of the group counts too. Strings that aren't
+        an address, CIDR or range return False.
+        """
+        try:
+            ip = IPParser.parse(ip_address)
+        except NSXInvalidIPAddressError:
+            return False
+        return ip in IPSet(self.ip_addresses())
+
+    def ipset(self) -> IPSet:
+        """Returns the addresses configured in the group's IPAddressExpressions"""
+        ipset = IPSet()
+        for e in self.expression_list():
+            if e._is_ipaddressexpression():
+                ipset = ipset | e.ipset()
+        return ipset
 
     def has_owner(self) -> bool:
         for tag in self.tags():
@@ -161,7 +176,7 @@ class NSXGroup:
         endpoint = (
             f"/policy/api/v1/infra/domains/{self.http.domain_id}/groups/{self.id()}/members/virtual-machines"
         )
-        return [NSXVirtualMachine(vm) for vm in self.http.request(method="GET", endpoint=endpoint)["results"] if vm]
+        return [NSXVirtualMachine(vm, nsx=self.nsx) for vm in self.http.request(method="GET", endpoint=endpoint)["results"] if vm]
 
     def ip_addresses(self) -> list[str]:
         """
@@ -172,6 +187,20 @@ class NSXGroup:
         )
         return [ipaddr for ipaddr in self.http.request(method="GET", endpoint=endpoint)["results"] if ipaddr]
 
+    async def avirtual_machines(self) -> list[NSXVirtualMachine]:
+        """Async version of `virtual_machines`"""
+        endpoint = (
+            f"/policy/api/v1/infra/domains/{self.http.domain_id}/groups/{self.id()}/members/virtual-machines"
+        )
+        return [NSXVirtualMachine(vm, nsx=self.nsx) async for vm in self.http.async_client().paginate(endpoint) if vm]
+
+    async def aip_addresses(self) -> list[str]:
+        """Async version of `ip_addresses`"""
+        endpoint = (
+            f"/policy/api/v1/infra/domains/{self.http.domain_id}/groups/{self.id()}/members/ip-addresses"
+        )
+        return [ipaddr async for ipaddr in self.http.async_client().paginate(endpoint) if ipaddr]
+
 
     def add_ipaddress(self, ipaddress: Union[list[str], str]) -> None:
         """
@@ -257,35 +286,65 @@ class NSXGroup:
         Save object changes to NSX
         """
         self.debug.print(1, f"saving group: {self.name()}")
-        self.debug.print(3, self.pformat())
+        if self.debug.debug_level >= 3:
+            self.debug.print(3, self.pformat())
+        self._group_mgr._invalidate_ip_index()
+        batch = self.http.active_batch()
+        if batch is not None:
+            batch.add_group(self)
+            return True
         endpoint = (
             f"/policy/api/v1/infra/domains/{self.http.domain_id}/groups/{self.id()}"
         )
-        return bool(
+        saved = bool(
             self.http.request(method="PATCH", endpoint=endpoint, data=self.dump())
         )
+        if saved:
+            self._group_mgr._cache_replace(self._group_mgr._copy(self))
+        # PATCH returns no body, pick up the new _revision on the next delta refresh
+        self._group_mgr._set_refresh()
+        return saved
 
     def check_native(self) -> bool:
         """
         Returns True if all of the following are True:
-        - No IP address contains a "/"
+        - Every IP address is a single address, not a CIDR or range
         - Number of VMs == Number of IP addresses
-        - Each IP address maps to a VM in the group
+        - Each VM's IP addresses are exactly the group's IP addresses
         """
-        group_ipaddrs = sorted(self.ip_addresses())
+        group_ipaddrs = self.ip_addresses()
+        if not self._all_single_addresses(group_ipaddrs):
+            return False
+        return self._matches_vms(group_ipaddrs, self.virtual_machines())
+
+    async def acheck_native(self) -> bool:
+        """Async version of `check_native`, fetches the ip addresses and vms concurrently"""
+        import asyncio
+
+        group_ipaddrs, vms = await asyncio.gather(
+            self.aip_addresses(), self.avirtual_machines()
+        )
+        if not self._all_single_addresses(group_ipaddrs):
+            return False
+        return self._matches_vms(group_ipaddrs, vms)
+
+    def _all_single_addresses(self, group_ipaddrs: list[str]) -> bool:
         for ip in group_ipaddrs:
-            if "/" in ip:
-                self.debug.print(2, f"ip has a slash, not a native group: '{ip}'")
+            if not IPParser.parse(ip).is_single_address():
+                self.debug.print(2, f"ip is a cidr or range, not a native group: '{ip}'")
                 return False
-        vms = self.virtual_machines()
+        return True
+
+    def _matches_vms(self, group_ipaddrs: list[str], vms: list[NSXVirtualMachine]) -> bool:
         if len(group_ipaddrs) != len(vms):
             self.debug.print(2, f"groups ip addresses is not the same length as vms ipaddresses")
             self.debug.print(4, f"group_ipaddrs ({len(group_ipaddrs)}): {group_ipaddrs}")
             self.debug.print(4, f"vms ({len(vms)}): {vms}")
             return False
+        group_ipaddrs = sorted(group_ipaddrs)
         for vm in vms:
             vm_ipaddrs = sorted(vm.ip_addresses())
-            if not vm_ipaddrs == group_ipaddrs:
+            if vm_ipaddrs != group_ipaddrs:
                 self.debug.print(2, f"vm ipaddrs not matching group ipaddrs")
                 self.debug.print(4, f"vm_ipaddrs: {vm_ipaddrs}")
                 self.debug.print(4, f"group_ipaddrs: {group_ipaddrs}")
@@ -13,6 +13,8 @@ from uonsx.error import (
     NSXRuleNotFoundError,
     NSXRuleValidationError,
 )
+from uonsx.nsx import NSX
+from uonsx.sequence import NSXSequenceAllocator
 from uonsx.unit.group import NSXGroup
 from uonsx.unit.rule import NSXRule
 from uonsx.unit.service import NSXService
@@ -50,15 +52,21 @@ class NSXPolicy:
     }
     """
 
-    def __init__(self, data: dict):
-        from uonsx.manager.group import NSXGroupManager
-        from uonsx.manager.policy import NSXPolicyManager
-        from uonsx.manager.service import NSXServiceManager
+    # rules() is built from data["rules"] once and reused until they change
+    _rules_source = None
+    _rules_cache = ()
+    _rules_by_handle = {}
+    _rules_by_id = {}
+    _rule_positions = {}
+    _rules_allocator = None
 
+    def __init__(self, data: dict, nsx: NSX = None):
         self.data = data
-        self._policy_manager = NSXPolicyManager.get_instance()
-        self._service_manager = NSXServiceManager.get_instance()
-        self._group_manager = NSXGroupManager.get_instance()
+        self._invalidate_rules()
+        self.nsx = nsx or NSX.current()
+        self._policy_manager = self.nsx.policy
+        self._service_manager = self.nsx.service
+        self._group_manager = self.nsx.group
         self.debug = self._policy_manager.debug
         self.http = self._policy_manager.http
 
@@ -71,14 +79,10 @@ class NSXPolicy:
     def _reload_rules(self) -> None:
         self.data["rules"] = [
             rule.dump()
-            for rule in sorted(self._policy_manager.get(self.name()).rules())
+            for rule in self._policy_manager.get(self.name()).rules()
         ]
-        self.data["rule_count"] = len(self.rules())
-
-    def _reload(self) -> None:
-        self._policy_manager.__data_needs_refresh = True
-        policy = self._policy_manager.get(self.name())
-        self.__init__(policy.dump())
+        self._invalidate_rules()
+        self.update_rule_count()
 
     def dump(self) -> dict:
         return self.data
@@ -101,6 +105,9 @@ class NSXPolicy:
     def id(self) -> str:
         return self.data["id"]
 
+    def path(self) -> str:
+        return self.data.get("path", "")
+
     def sequence_number(self) -> int:
         return int(self.data["sequence_number"])
 
@@ -114,35 +121,128 @@ class NSXPolicy:
         if not self.data.get("rules"):
             self.data["rules"] = []
         self.data["rules"].append(rule.dump())
+        self._invalidate_rules()
         self.update_rule_count()
 
     def _remove_rule(self, rule: NSXRule) -> None:
-        endpoint = f"/policy/api/v1/infra/domains/{self.http.domain_id}/security-policies/{self.id()}/rules/{rule.id()}"
-        self.http.request(method="DELETE", endpoint=endpoint)
-        self._policy_manager.__data_needs_refresh = True
-        self._reload()
+        batch = self.http.active_batch()
+        if batch is not None:
+            batch.delete_rule(self, rule)
+        else:
+            self.http.request(method="DELETE", endpoint=self._rule_endpoint(rule.id()))
+            self._policy_manager._set_refresh()
+        self.data["rules"] = [r for r in self.data.get("rules", []) if r["id"] != rule.id()]
+        self._invalidate_rules()
+        self.update_rule_count()
+
+    def _rule_endpoint(self, rule_id: str) -> str:
+        return f"/policy/api/v1/infra/domains/{self.http.domain_id}/security-policies/{self.id()}/rules/{rule_id}"
+
+    def _save_rule(self, rule: NSXRule) -> bool:
+        """PATCHes a single rule, the rest of the policy is left as it is on NSX"""
+        self.debug.print(1, f"saving rule: {rule.name()} in policy: {self.name()}")
+        batch = self.http.active_batch()
+        if batch is not None:
+            batch.add_rule(self, rule)
+            return True
+        saved = bool(
+            self.http.request(method="PATCH", endpoint=self._rule_endpoint(rule.id()), data=rule.dump())
+        )
+        self._policy_manager._set_refresh()
+        return saved
+
+    def _save_rules(self, rules: list[NSXRule]) -> bool:
+        """Saves several rules of this policy in one hierarchical request"""
+        from uonsx.batch import NSXBatch
+
+        batch = self.http.active_batch()
+        if batch is not None:
+            for rule in rules:
+                batch.add_rule(self, rule)
+            return True
+        batch = NSXBatch(self.http, nsx=self.nsx)
+        for rule in rules:
+            batch.add_rule(self, rule)
+        return bool(batch.commit())
+
+    def _sequence_allocator(self, padding: int = 10) -> NSXSequenceAllocator:
+        """Returns an allocator over the rule sequence numbers, built along with the rule index"""
+        self._index_rules()
+        allocator = self._rules_allocator
+        if allocator.padding != padding:
+            allocator = NSXSequenceAllocator(allocator.numbers, padding=padding)
+        return allocator
+
+    def _make_room(
+        self,
+        rule: NSXRule,
+        position: Union[int, None] = None,
+        allocator: Union[NSXSequenceAllocator, None] = None,
+    ) -> list[NSXRule]:
+        """
+        Renumbers the fewest rules needed to fit `rule` at `position`, by default in
+        front of the existing rules holding its sequence number. Returns the rules
+        that moved.
+        """
+        rules = self.rules()
+        allocator = allocator or self._sequence_allocator()
+        if position is None:
+            position = allocator.position(rule.sequence_number())
+        number, plan = allocator.make_room(position)
+        rule.set_sequence_number(number)
+        moved = []
+        for i, n in plan.items():
+            rules[i].set_sequence_number(n)
+            moved.append(rules[i])
+        self.set_rules(rules)
+        return moved
 
     def _get_rule_by_id(self, id: str) -> NSXRule:
+        self._index_rules()
+        if id in self._rules_by_id:
+            return self._rules_by_id[id]
         endpoint = f"/policy/api/v1/infra/domains/{self.http.domain_id}/security-policies/{self.id()}/rules/{id}"
         try:
             resp = self.http.request(method="GET", endpoint=endpoint)
-            return NSXRule(resp)
+            return NSXRule(resp, nsx=self.nsx)
         except:
             raise
 
     def rule_count(self) -> int:
         return self.data.get("rule_count", 0)
 
+    def _invalidate_rules(self) -> None:
+        """Called whenever data["rules"] is changed or reordered"""
+        self._rules_source = None
+
+    def _index_rules(self) -> None:
+        source = self.data.get("rules") or []
+        # the identity check also catches data["rules"] being replaced directly
+        if self._rules_source is source and len(self._rules_cache) == len(source):
+            return
+        rules = [NSXRule(r, nsx=self.nsx) for r in sorted(source, key=lambda d: d["sequence_number"])]
+        self._rules_cache = rules
+        self._rules_by_handle = {r.handle(): r for r in rules}
+        self._rules_by_id = {r.id(): r for r in rules}
+        self._rule_positions = {r.handle(): i for i, r in enumerate(rules)}
+        self._rules_allocator = NSXSequenceAllocator([r.sequence_number() for r in rules])
+        self._rules_source = source
+
     def rules(self) -> list[NSXRule]:
-        if self.data.get("rules"):
-            return [
-                NSXRule(r)
-                for r in sorted(self.data["rules"], key=lambda d: d["sequence_number"])
-            ]
-        return []
+        self._index_rules()
+        return list(self._rules_cache)
+
+    def get_rule(self, handle: int) -> NSXRule:
+        """Returns the rule with the given handle"""
+        self._index_rules()
+        rule = self._rules_by_handle.get(handle)
+        if rule is None:
+            raise NSXRuleNotFoundError(handle)
+        return rule
 
     def set_rules(self, rules: list[NSXRule]) -> None:
         self.data["rules"] = [r.dump() for r in rules]
+        self._invalidate_rules()
 
     def show_rules(
         self, format: Literal["default", "json", "pretty"] = "default"
@@ -155,7 +255,7 @@ class NSXPolicy:
             print(self.rules())
 
     def update_rule_count(self) -> None:
-        self.data["rule_count"] = len(self.rules())
+        self.data["rule_count"] = len(self.data.get("rules") or [])
 
     def set_destination_group(self, group: NSXGroup) -> None:
         self._destination_group = group
@@ -166,33 +266,18 @@ class NSXPolicy:
         """
         n = 10
         new_rules = []
-        for rule in sorted(self.rules()):
+        for rule in self.rules():
             rule.set_sequence_number(n)
             new_rules.append(rule)
             n += padding
         self.set_rules(new_rules)
 
-    def _get_sequence_number_before_handle(self, handle: int, padding: int = 2) -> int:
-        """Returns the correct sequence number to use on a rule that is before the rule with the given handle."""
-        for rule in self.rules():
-            if rule.handle() == handle:
-                return rule.sequence_number() - padding
-        raise NSXRuleNotFoundError(handle)
-
-    def _get_sequence_number_after_handle(self, handle: int, padding: int = 2) -> int:
-        """Returns the correct sequence number to use on a rule that is after the rule with the given handle."""
-        for rule in self.rules():
-            if rule.handle() == handle:
-                return rule.sequence_number() + padding
-        raise NSXRuleNotFoundError(handle)
+    def _get_rule_position(self, handle: int) -> int:
+        self.get_rule(handle)
+        return self._rule_positions[handle]
 
     def _get_next_rule_sequence_number(self, padding: int = 10) -> int:
-        highest_num = 0
-        for rule in self.rules():
-            n = rule.sequence_number()
-            if n > highest_num:
-                highest_num = n
-        return highest_num + padding
+        return self._sequence_allocator(padding=padding).next()
 
     def _logged_handler(self, logged: bool) -> bool:
         """Handles the logged parameter"""
@@ -321,6 +406,8 @@ class NSXPolicy:
         sequence_number: Union[int, None] = None,
         description: str = "",
         logged: bool = False,
+        before: Union[int, None] = None,
+        after: Union[int, None] = None,
     ) -> None:
         """
         Add a rule to an existing NSX Policy
@@ -345,10 +432,16 @@ class NSXPolicy:
             If not passed, it will inherit the destination group from the parent policy.
         sequence_number: int, optional
             Passing a sequence number allows you to insert a rule at the given position in the chain.
+            If another rule already has that sequence number, the new rule goes in front of it
+            and as few of the following rules as possible are renumbered.
             If not passed, the rule will be appended to the end of the policy.
         logged: bool, optional
             If the traffic that hits this rule is logged.
             Default: True
+        before: int, optional
+            Handle of the rule the new rule goes directly in front of, instead of a sequence number.
+        after: int, optional
+            Handle of the rule the new rule goes directly after, instead of a sequence number.
         """
 
         self.debug.print(1, f"creating new rule for policy: {self.name()}")
@@ -386,32 +479,56 @@ class NSXPolicy:
         if service_entries:
             data["service_entries"] = service_entries
 
-        rule = NSXRule(data)
+        rule = NSXRule(data, nsx=self.nsx)
+        allocator = self._sequence_allocator()
+        # a handle names one rule even when several share a sequence number
+        position = None
+        if before is not None:
+            position = self._get_rule_position(before)
+        elif after is not None:
+            position = self._get_rule_position(after) + 1
+        elif rule.sequence_number() in allocator:
+            position = allocator.position(rule.sequence_number())
+        if position is not None:
+            number = allocator.gap(position)
+            if number is None:
+                # no gap left where the rule goes, move the fewest neighbours needed
+                # and save them with the new rule in one call
+                moved = self._make_room(rule, position, allocator)
+                self._add_rule(rule)
+                self._save_rules(moved + [rule])
+                return
+            rule.set_sequence_number(number)
         self._add_rule(rule)
-        self.resequence_rules()
-        self.save()
+        self._save_rule(rule)
 
     def remove_rule(self, handle: int) -> bool:
         """Given a rule handle, remove the rule from the policy."""
         self.debug.print(1, f"removing rule {handle} from policy: {self.name()}")
-        for rule in self.rules():
-            if rule.handle() == handle:
-                self._remove_rule(rule)
-                self.resequence_rules()
-                self.save()
-                return True
-        raise NSXRuleNotFoundError(handle)
+        # removing a rule leaves the order of the others intact
+        self._remove_rule(self.get_rule(handle))
+        return True
 
     def save(self) -> bool:
         """
         Pass a valid NSXPolicy object to save changes to NSX
         """
         self.debug.print(1, f"saving security policy: {self.name()}")
-        self.debug.print(3, self.pformat())
+        if self.debug.debug_level >= 3:
+            self.debug.print(3, self.pformat())
+        batch = self.http.active_batch()
+        if batch is not None:
+            batch.add_policy(self)
+            return True
         endpoint = f"/policy/api/v1/infra/domains/{self.http.domain_id}/security-policies/{self.id()}"
-        return bool(
+        saved = bool(
             self.http.request(method="PATCH", endpoint=endpoint, data=self.dump())
         )
+        if saved:
+            self._policy_manager._cache_replace(self._policy_manager._copy(self))
+        # PATCH returns no body, pick up the new _revision on the next delta refresh
+        self._policy_manager._set_refresh()
+        return saved
 
     # ---------------------------------------------------------------------------- #
     #                                    output                                    #
@@ -420,7 +537,6 @@ class NSXPolicy:
     def output(self, format: Union[Literal["human"], Literal["json"]]) -> str:
         """Returns a string of output that represents the policy"""
         self._policy_manager.get_all()
-        self._service_manager.get_all()
         outlines = []
 
         if format == "human":
@@ -445,9 +561,13 @@ class NSXPolicy:
             "seq",
         ]
         rule_data = []
-        if not self.rules():
+        rules = self.rules()
+        if not rules:
             return "\nNo rules configured for this policy."
-        for rule in self.rules():
+        # one load each instead of a GET per path while the caches are cold
+        self._group_manager.get_all()
+        self._service_manager.get_all()
+        for rule in rules:
             source_groups = []
             for path in rule.source_group_paths():
                 try:
@@ -519,6 +639,7 @@ class NSXPolicy:
 
     def audit_invalid_rule_destinations(self) -> list[dict[str, str]]:
         self._reload_rules()
+        self._group_manager.get_all()
         invalid_rules = []
         for rule in self.rules():
             if len(rule.destination_group_paths()) > 1:
@@ -1,12 +1,12 @@
 from __future__ import annotations
 
 from uonsx.error import NSXInvalidPortProtocolError
-from uonsx.manager.policy import NSXPolicyManager
+from uonsx.nsx import NSX
 
 
 class NSXPortProtocolParser:
-    def __init__(self, port_protocol_str: str):
-        self.debug = NSXPolicyManager.get_instance().debug
+    def __init__(self, port_protocol_str: str, nsx: NSX = None):
+        self.debug = (nsx or NSX.current()).cfg.debug
         self.data = self._parse(port_protocol_str)
 
     def _check_valid_port_field(self, field) -> bool:
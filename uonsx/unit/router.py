@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import json
 
+from uonsx.nsx import NSX
+
 class NSXRouter:
     """
     Wrapper for NSX Router Information
@@ -53,11 +55,10 @@ class NSXRouter:
     }
     """
 
-    def __init__(self, data: dict):
-        from uonsx.manager.router import NSXRouterManager
-
+    def __init__(self, data: dict, nsx: NSX = None):
         self.data = data
-        self._mgr = NSXRouterManager.get_instance()
+        self.nsx = nsx or NSX.current()
+        self._mgr = self.nsx.router
 
     def __str__(self):
         return f"NSXRouter(name='{self.name()}'...)"
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import json
 
+from uonsx.nsx import NSX
 from uonsx.util import strfmt
 
 from typing import TYPE_CHECKING
@@ -37,12 +38,24 @@ class NSXRule:
     """
     valid_actions = ["ALLOW", "DROP", "REJECT", "JUMP_TO_APPLICATION"]
 
-    def __init__(self, data: dict):
-        from uonsx.manager.service import NSXServiceManager
-        self.service_manager = NSXServiceManager.get_instance()
-        from uonsx.manager.group import NSXGroupManager
-        self.group_manager = NSXGroupManager.get_instance()
+    def __init__(self, data: dict, nsx: NSX = None):
         self.data = data
+        self._nsx = nsx
+
+    # policies build a rule object per rule, only look the managers up when used
+    @property
+    def nsx(self) -> NSX:
+        if self._nsx is None:
+            self._nsx = NSX.current()
+        return self._nsx
+
+    @property
+    def service_manager(self):
+        return self.nsx.service
+
+    @property
+    def group_manager(self):
+        return self.nsx.group
 
     def __repr__(self):
         return json.dumps(self.dump())
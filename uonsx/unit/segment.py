@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import json
 
+from uonsx.nsx import NSX
+
 class NSXSegment:
     """
     Wrapper for NSX Segment Information
@@ -49,12 +51,11 @@ class NSXSegment:
     }
     """
 
-    def __init__(self, data: dict):
-        from uonsx.manager.segment import NSXSegmentManager
-        from uonsx.manager.bridge_profile import NSXBridgeProfileManager
+    def __init__(self, data: dict, nsx: NSX = None):
         self.data = data
-        self._segment_manager = NSXSegmentManager.get_instance()
-        self._bridge_profile_manager  = NSXBridgeProfileManager.get_instance()
+        self.nsx = nsx or NSX.current()
+        self._segment_manager = self.nsx.segment
+        self._bridge_profile_manager = self.nsx.bridge_profile
 
 
     def __str__(self):
@@ -75,6 +76,9 @@ class NSXSegment:
     def admin_state(self) -> str:
         return self.data['admin_state']
 
+    def path(self) -> str:
+        return self.data.get('path', "")
+
     def bridge_profiles(self) -> list[dict]:
         """bridge profiles are losely coupled mapping of a bridge profile path, vlans, and transport zone to a segment."""
         bridge_profs = []
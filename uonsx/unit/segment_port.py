@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import json
 
+from uonsx.nsx import NSX
+
 class NSXSegmentPort:
     """
     Wrapper for NSX Segement Port
@@ -34,11 +36,10 @@ class NSXSegmentPort:
         }
     """
 
-    def __init__(self, data: dict):
-        from uonsx.manager.segment_port import NSXSegmentPortManager
-
+    def __init__(self, data: dict, nsx: NSX = None):
         self.data = data
-        self._mgr = NSXSegmentPortManager.get_instance()
+        self.nsx = nsx or NSX.current()
+        self._mgr = self.nsx.segment_port
 
     def __str__(self):
         return f"NSXSegementPort(name='{self.name()}'..."
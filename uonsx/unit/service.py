@@ -5,6 +5,7 @@ from typing import Union
 
 from typing_extensions import Literal
 from uonsx.error import NSXInvalidOutputFormatError
+from uonsx.nsx import NSX
 from uonsx.util import format_table
 
 
@@ -53,11 +54,10 @@ class NSXService:
 
     """
 
-    def __init__(self, data: dict):
-        from uonsx.manager.service import NSXServiceManager
-
+    def __init__(self, data: dict, nsx: NSX = None):
         self.data = data
-        self._mgr = NSXServiceManager.get_instance()
+        self.nsx = nsx or NSX.current()
+        self._mgr = self.nsx.service
 
     def __str__(self):
         return f"NSXService(name='{self.name()}'...)"
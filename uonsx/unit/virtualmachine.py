@@ -1,13 +1,13 @@
 from __future__ import annotations
 
 import json
-import re
 from pprint import pformat
 
 from typing import Union
 from typing_extensions import Literal
+from uonsx.nsx import NSX
 from uonsx.unit.tag import NSXTag
-from uonsx.util import strfmt, format_table
+from uonsx.util import IPParser, format_table, strfmt
 
 
 class NSXVirtualInterface:
@@ -62,7 +62,10 @@ class NSXVirtualInterface:
         return self.data["device_name"]
 
     def ip_addresses(self) -> list[str]:
-        return self.data["ip_address_info"][0]["ip_addresses"]
+        ipaddrs = []
+        for info in self.data.get("ip_address_info", []):
+            ipaddrs.extend(info.get("ip_addresses", []))
+        return ipaddrs
 
     def owner_vm_id(self) -> str:
         return self.data["owner_vm_id"]
@@ -97,10 +100,9 @@ class NSXVirtualMachine:
      'type': 'REGULAR'}
     """
 
-    def __init__(self, data: dict):
-        from uonsx.manager.virtualmachine import NSXVirtualMachineManager
-
-        self._virtualmachine_manager = NSXVirtualMachineManager.get_instance()
+    def __init__(self, data: dict, nsx: NSX = None):
+        self.nsx = nsx or NSX.current()
+        self._virtualmachine_manager = self.nsx.vm
         self.debug = self._virtualmachine_manager.debug
         self.data = data
 
@@ -146,18 +148,14 @@ class NSXVirtualMachine:
         self._virtualmachine_manager.add_tag(self, tag)
 
     def vifs(self) -> list[NSXVirtualInterface]:
-        out = []
-        for vif in self._virtualmachine_manager.all_vifs():
-            if vif.owner_vm_id() == self.id():
-                out.append(vif)
-        return out
+        return self._virtualmachine_manager.vifs(self)
 
-    def ip_addresses(self) -> list[str]:
+    def ip_addresses(self, version: int = 4) -> list[str]:
+        """Returns the VM's addresses of the given IP version (4 or 6)"""
         ipaddrs = []
         for vif in self.vifs():
-            ipv4_pattern = r"((25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)([ (\[]?(\.|dot)[ )\]]?(25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)){3})"
             for ipaddr in vif.ip_addresses():
-                if re.match(ipv4_pattern, ipaddr):
+                if IPParser.version(ipaddr) == version:
                     ipaddrs.append(ipaddr)
         return ipaddrs
 
@@ -167,12 +165,13 @@ class NSXVirtualMachine:
 
     def output(self, format: Union[Literal["human"], Literal["json"]]) -> str:
         """Returns a string representation of the vm object"""
+        group_names = self._virtualmachine_manager.group_name_list(self)
         data = {
             "display_name": self.name(),
             "hostname": self.hostname(),
             "osname": self.osname(),
             "tags": [t.dump() for t in self.tags()],
-            "groups": self._virtualmachine_manager.group_name_list(self),
+            "groups": group_names,
         }
 
         if format == "json":
@@ -185,7 +184,7 @@ class NSXVirtualMachine:
             outlines.append("Hostname:  {hostname}".format(**data))
             outlines.append("OS Name:   {osname}".format(**data))
             outlines.append(self.tag_table())
-            outlines.append(self.group_table())
+            outlines.append(self.group_table(group_names))
             return "\n".join(outlines)
 
     def tag_table(self):
@@ -195,7 +194,9 @@ class NSXVirtualMachine:
             data.append([tag.name(), tag.scope()])
         return format_table(headers, data)
 
-    def group_table(self):
+    def group_table(self, group_names: list[str] = None):
         headers = ["groups"]
-        data = [[group_name] for group_name in self._virtualmachine_manager.group_name_list(self)]
+        if group_names is None:
+            group_names = self._virtualmachine_manager.group_name_list(self)
+        data = [[group_name] for group_name in group_names]
         return format_table(headers, data)
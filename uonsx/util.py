@@ -1,27 +1,39 @@
 from __future__ import annotations
 
+import bisect
+import ipaddress
 import json
 import re
-from pprint import pformat
-from typing import Union, List
-import ipaddress
+from functools import lru_cache
+from typing import Iterable, Union
 
-from colorama import Fore
-from columnar import columnar
+from uonsx.error import (
+    NSXInvalidIPAddressError,
+    NSXInvalidPathError,
+    NSXObjectHasDependenciesError,
+)
 
-from uonsx.error import NSXInvalidPathError, NSXObjectHasDependenciesError
+
+# colorama, columnar and pprint are imported where they're used, most commands
+# never print a table and `import uonsx` shouldn't pay for them
 
 
 def format_table(headers: list[str], data: list[list[str]]) -> str:
+    from columnar import columnar
+
     table = columnar(data, headers, no_borders=True)
     return table
 
 
 def strfmt(json_data: str):
+    from pprint import pformat
+
     return pformat(json.loads(json_data), indent=4)
 
 
 def colorize(msg: str, color: str = ""):
+    from colorama import Fore
+
     valid_colors = {
         "blue": Fore.BLUE,
         "red": Fore.RED,
@@ -75,53 +87,349 @@ def get_rule_id_from_path(path: str) -> str:
 
 
 class IPParser:
+    """
+    Parses the address strings NSX hands out (addresses, CIDRs and ranges)
+
+    Parsing is cached, so the same string always returns the same object.
+    """
+
     @classmethod
-    def parse(cls, ip_object: str):
-        if ":" in ip_object:
-            if "/" in ip_object:
-                return IP6Network(ip_object)
-            return IP6Address(ip_object)
-        if "/" in ip_object:
-            return IPNetwork(ip_object)
-        return IPAddress(ip_object)
+    def parse(
+        cls, ip_object: str
+    ) -> Union[IPAddress, IPNetwork, IP6Address, IP6Network, IPRange]:
+        return _parse_ip_object(ip_object.strip())
+
+    @classmethod
+    def is_ip(cls, ip_object: str) -> bool:
+        """Returns True if the string is a valid address, CIDR or range"""
+        try:
+            cls.parse(ip_object)
+        except NSXInvalidIPAddressError:
+            return False
+        return True
+
+    @classmethod
+    def version(cls, ip_object: str) -> Union[int, None]:
+        """Returns 4 or 6 for valid addresses/CIDRs/ranges, None otherwise"""
+        try:
+            return cls.parse(ip_object).version()
+        except NSXInvalidIPAddressError:
+            return None
+
+
+class _IPObject:
+    """Shared behaviour of every parsed address, network and range"""
+
+    def __init__(self, value: str):
+        self._value = value
+        self._first, self._last, self._version = self._parse(value)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}('{self}')"
+
+    def __str__(self) -> str:
+        return self._value
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, _IPObject):
+            return self.interval() == other.interval() and self.version() == other.version()
+        return NotImplemented
 
+    def __hash__(self) -> int:
+        return hash((self._version, self._first, self._last))
 
+    def __contains__(self, other: Union[str, _IPObject]) -> bool:
+        if isinstance(other, str):
+            other = IPParser.parse(other)
+        if other.version() != self.version():
+            return False
+        return self._first <= other._first and other._last <= self._last
 
-class IPAddress:
-    def __init__(self, ip: str):
-        self._ip = self._parse(ip)
+    def _parse(self, value: str) -> tuple[int, int, int]:
+        raise NotImplementedError
 
-    def __repr__(self):
-        return self._ip
+    def version(self) -> int:
+        return self._version
 
-    def _parse(self, ip: str):
-        return ipaddress.ip_address(ip)
+    def first(self) -> int:
+        """Returns the first address covered, as an integer"""
+        return self._first
 
-class IP6Address:
-    def __init__(self, ip6address: str):
-        self._ip6address = self._parse(ip6address)
+    def last(self) -> int:
+        """Returns the last address covered, as an integer"""
+        return self._last
 
-    def _parse(self, ip6address: str):
-        return ip6address
+    def interval(self) -> tuple[int, int]:
+        return (self._first, self._last)
 
-class IP6Network:
-    def __init__(self, ip6network: str):
-        self._ip6network = self._parse(ip6network)
+    def is_single_address(self) -> bool:
+        return self._first == self._last
 
-    def _parse(self, ip6network: str):
-        return ip6network
+    def overlaps(self, other: Union[str, _IPObject]) -> bool:
+        if isinstance(other, str):
+            other = IPParser.parse(other)
+        if other.version() != self.version():
+            return False
+        return self._first <= other._last and other._first <= self._last
 
 
-class IPNetwork:
-    def __init__(self, ipnetwork: str):
-        self._ipnetwork = self._parse(ipnetwork)
+class IPAddress(_IPObject):
+    def _parse(self, ip: str) -> tuple[int, int, int]:
+        n = int(ipaddress.IPv4Address(ip))
+        return n, n, 4
+
+
+class IP6Address(_IPObject):
+    def _parse(self, ip6address: str) -> tuple[int, int, int]:
+        n = int(ipaddress.IPv6Address(ip6address))
+        return n, n, 6
+
+
+class IPNetwork(_IPObject):
+    def _parse(self, ipnetwork: str) -> tuple[int, int, int]:
+        net = ipaddress.IPv4Network(ipnetwork, strict=False)
+        return int(net.network_address), int(net.broadcast_address), 4
+
+
+class IP6Network(_IPObject):
+    def _parse(self, ip6network: str) -> tuple[int, int, int]:
+        net = ipaddress.IPv6Network(ip6network, strict=False)
+        return int(net.network_address), int(net.broadcast_address), 6
+
+
+class IPRange(_IPObject):
+    """An NSX address range, such as '10.0.0.1-10.0.0.20'"""
+
+    def _parse(self, iprange: str) -> tuple[int, int, int]:
+        start, end = [ipaddress.ip_address(i.strip()) for i in iprange.split("-")]
+        if start.version != end.version or start > end:
+            raise ValueError(iprange)
+        return int(start), int(end), start.version
+
+
+@lru_cache(maxsize=65536)
+def _parse_ip_object(ip_object: str) -> _IPObject:
+    try:
+        if "-" in ip_object:
+            return IPRange(ip_object)
+        if ":" in ip_object:
+            if "/" in ip_object:
+                return IP6Network(ip_object)
+            return IP6Address(ip_object)
+        if "/" in ip_object:
+            return IPNetwork(ip_object)
+        return IPAddress(ip_object)
+    except ValueError:
+        raise NSXInvalidIPAddressError(ip_object)
+
+
+def _merge_intervals(intervals: Iterable[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Sorts intervals and merges the ones that overlap or touch"""
+    merged = []
+    for first, last in sorted(intervals):
+        if merged and first <= merged[-1][1] + 1:
+            if last > merged[-1][1]:
+                merged[-1] = (merged[-1][0], last)
+            continue
+        merged.append((first, last))
+    return merged
+
+
+def _intervals_overlap(a: list[tuple[int, int]], b: list[tuple[int, int]]) -> bool:
+    """Walks two sorted, merged interval lists and returns True on the first overlap"""
+    i = j = 0
+    while i < len(a) and j < len(b):
+        if a[i][0] <= b[j][1] and b[j][0] <= a[i][1]:
+            return True
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return False
 
-    def _parse(self, ipnetwork: str):
-        return ipnetwork
 
 class IPSet:
-    def __init__(self, ip_objects: List[Union[IPAddress, IPNetwork, IP6Address, IP6Network]]):
-        self._objects = ip_objects
+    """
+    A set of IPv4 and IPv6 addresses, stored as sorted and merged integer intervals
+    per address family, so containment is a binary search and union/overlap
+    checks are a linear merge.
+    """
+
+    def __init__(
+        self,
+        ip_objects: Iterable[Union[str, IPAddress, IPNetwork, IP6Address, IP6Network, IPRange]] = (),
+    ):
+        v4 = []
+        v6 = []
+        for ip_object in ip_objects:
+            if isinstance(ip_object, str):
+                ip_object = IPParser.parse(ip_object)
+            if ip_object.version() == 4:
+                v4.append(ip_object.interval())
+            else:
+                v6.append(ip_object.interval())
+        self._intervals = {4: _merge_intervals(v4), 6: _merge_intervals(v6)}
+
+    def __repr__(self) -> str:
+        return f"IPSet(v4={self._intervals[4]}, v6={self._intervals[6]})"
+
+    def __bool__(self) -> bool:
+        return bool(self._intervals[4] or self._intervals[6])
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, IPSet):
+            return self._intervals == other._intervals
+        return NotImplemented
+
+    def __contains__(self, item: Union[str, _IPObject]) -> bool:
+        if isinstance(item, str):
+            item = IPParser.parse(item)
+        intervals = self._intervals[item.version()]
+        i = bisect.bisect_right(intervals, (item.first(), float("inf"))) - 1
+        return i >= 0 and intervals[i][1] >= item.last()
+
+    def __or__(self, other: IPSet) -> IPSet:
+        return self.union(other)
+
+    def intervals(self, version: int) -> list[tuple[int, int]]:
+        """Returns the merged (first, last) integer intervals for an address family"""
+        return list(self._intervals[version])
+
+    def size(self) -> int:
+        """Returns the number of addresses in the set"""
+        return sum(
+            last - first + 1
+            for intervals in self._intervals.values()
+            for first, last in intervals
+        )
+
+    def union(self, other: IPSet) -> IPSet:
+        out = IPSet()
+        for version in [4, 6]:
+            out._intervals[version] = _merge_intervals(
+                self._intervals[version] + other._intervals[version]
+            )
+        return out
+
+    def overlaps(self, other: Union[IPSet, str, _IPObject]) -> bool:
+        if not isinstance(other, IPSet):
+            other = IPSet([other])
+        return any(
+            _intervals_overlap(self._intervals[v], other._intervals[v]) for v in [4, 6]
+        )
+
+
+class _IntervalTreeNode:
+    def __init__(self, center: int, intervals: list, left, right):
+        self.center = center
+        self.by_first = sorted(intervals, key=lambda i: i[0])
+        self.by_last = sorted(intervals, key=lambda i: i[1], reverse=True)
+        self.left = left
+        self.right = right
+
+
+def _build_interval_tree(intervals: list) -> Union[_IntervalTreeNode, None]:
+    """Builds a centered interval tree over (first, last, value) tuples"""
+    if not intervals:
+        return None
+    endpoints = sorted([i[0] for i in intervals] + [i[1] for i in intervals])
+    center = endpoints[len(endpoints) // 2]
+    left = [i for i in intervals if i[1] < center]
+    right = [i for i in intervals if i[0] > center]
+    here = [i for i in intervals if i[0] <= center <= i[1]]
+    return _IntervalTreeNode(
+        center, here, _build_interval_tree(left), _build_interval_tree(right)
+    )
+
+
+class IPIntervalIndex:
+    """
+    Read-only index of IP intervals mapped to arbitrary values (usually groups)
+
+    Each address family gets a centered interval tree for point queries and a
+    list sorted by start for range queries, so lookups are O(log n + k).
+    """
 
-    def _parse(self, ipaddress: str):
-        return ipaddress
+    def __init__(self, entries: Iterable[tuple[IPSet, object]] = ()):
+        intervals = {4: [], 6: []}
+        for ipset, value in entries:
+            for version in [4, 6]:
+                for first, last in ipset.intervals(version):
+                    intervals[version].append((first, last, value))
+        self._trees = {v: _build_interval_tree(intervals[v]) for v in [4, 6]}
+        self._by_first = {v: sorted(intervals[v], key=lambda i: i[0]) for v in [4, 6]}
+        self._firsts = {v: [i[0] for i in self._by_first[v]] for v in [4, 6]}
+
+    def __len__(self) -> int:
+        return len(self._by_first[4]) + len(self._by_first[6])
+
+    def _stab(self, version: int, point: int) -> list[tuple]:
+        """Returns every interval that contains the point"""
+        out = []
+        node = self._trees[version]
+        while node is not None:
+            if point < node.center:
+                for i in node.by_first:
+                    if i[0] > point:
+                        break
+                    out.append(i)
+                node = node.left
+            elif point > node.center:
+                for i in node.by_last:
+                    if i[1] < point:
+                        break
+                    out.append(i)
+                node = node.right
+            else:
+                out.extend(node.by_first)
+                break
+        return out
+
+    @staticmethod
+    def _unique_values(intervals: Iterable[tuple]) -> list:
+        seen = set()
+        out = []
+        for i in intervals:
+            if id(i[2]) not in seen:
+                seen.add(id(i[2]))
+                out.append(i[2])
+        return out
+
+    def containing(self, ip_object: Union[str, _IPObject]) -> list:
+        """Returns the values whose intervals fully contain the address/CIDR/range"""
+        if isinstance(ip_object, str):
+            ip_object = IPParser.parse(ip_object)
+        hits = self._stab(ip_object.version(), ip_object.first())
+        return self._unique_values(i for i in hits if i[1] >= ip_object.last())
+
+    def overlapping(self, ip_object: Union[str, _IPObject]) -> list:
+        """Returns the values whose intervals share at least one address with the input"""
+        if isinstance(ip_object, str):
+            ip_object = IPParser.parse(ip_object)
+        version = ip_object.version()
+        # intervals that start before the input and reach into it all contain its
+        # first address, the rest start somewhere inside it
+        hits = self._stab(version, ip_object.first())
+        lo = bisect.bisect_right(self._firsts[version], ip_object.first())
+        hi = bisect.bisect_right(self._firsts[version], ip_object.last())
+        hits.extend(self._by_first[version][lo:hi])
+        return self._unique_values(hits)
+
+    def overlapping_pairs(self) -> list[tuple]:
+        """Returns every pair of distinct values whose intervals overlap"""
+        pairs = []
+        seen = set()
+        for version in [4, 6]:
+            active = []
+            for first, last, value in self._by_first[version]:
+                active = [a for a in active if a[1] >= first]
+                for a in active:
+                    if a[2] is value:
+                        continue
+                    key = frozenset([id(a[2]), id(value)])
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    pairs.append((a[2], value))
+                active.append((first, last, value))
+        return pairs